@@ -8,10 +8,16 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, Response
 
-from .database import init_db
+from .database import init_db, close_db
+from .file_watch import file_watcher
+from .git_info import git_cache
+from .io_pool import io_pool
+from .recorder import recorder
+from .retention import compactor
+from .stats import stats_rollup
 from .config import load_settings, load_all_projects
-from .routers import projects, terminal, settings, env_editor, zeusovich
-from .workspace import sync_zeusovich_workspace
+from .routers import projects, terminal, settings, env_editor, zeusovich, mux, events, history, files
+from .workspace import workspace_sync
 
 
 @asynccontextmanager
@@ -19,23 +25,29 @@ async def lifespan(app: FastAPI):
     """Lifecycle события приложения"""
     # Startup
     await init_db()
+    recorder.start()
+    compactor.start()
+    stats_rollup.start()
     print("[OK] Database initialized")
 
-    # Sync Zeusovich workspace
-    result = sync_zeusovich_workspace()
-    print(f"[OK] Zeusovich workspace: {result['workspace_path']}")
-    print(f"     Synced {len(result['synced'])} projects")
-    if result['failed']:
-        print(f"     [WARN] Failed to sync {len(result['failed'])} projects:")
-        for f in result['failed']:
-            print(f"       - {f['name']}: {f['error']}")
+    # Sync Zeusovich workspace (в фоне, старт не ждёт)
+    workspace_sync.request(full=True)
 
     print("[OK] Airganizator started on http://127.0.0.1:6680")
     yield
     # Shutdown
     from .process_manager import process_manager
     await process_manager.stop_all()
+    await file_watcher.close()
     print("[OK] All processes stopped")
+    await workspace_sync.close()
+    await compactor.close()
+    await stats_rollup.close()
+    await recorder.close()
+    await close_db()
+    git_cache.close()
+    io_pool.close()
+    print("[OK] Database closed")
 
 
 app = FastAPI(
@@ -51,6 +63,10 @@ app.include_router(terminal.router, prefix="/api/terminal", tags=["terminal"])
 app.include_router(settings.router, prefix="/api/settings", tags=["settings"])
 app.include_router(env_editor.router, prefix="/api/env", tags=["env"])
 app.include_router(zeusovich.router, prefix="/api/zeusovich", tags=["zeusovich"])
+app.include_router(mux.router, prefix="/api/mux", tags=["mux"])
+app.include_router(events.router, prefix="/api/events", tags=["events"])
+app.include_router(history.router, prefix="/api/history", tags=["history"])
+app.include_router(files.router, prefix="/api/files", tags=["files"])
 
 # Статические файлы
 FRONTEND_DIR = Path(__file__).parent.parent / "frontend"
@@ -0,0 +1,134 @@
+"""
+Экспорт сессий в asciicast v2 (формат asciinema).
+Первая строка - JSON-заголовок, дальше события [секунды от начала, код, данные]:
+"o" - вывод, "r" - новый размер терминала "ШИРИНАxВЫСОТА". Вывод читается
+из БД порциями (replay.iter_chunks), поэтому память не растёт с длиной сессии.
+"""
+import json
+import re
+import zipfile
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from .database import get_session_resizes, list_sessions
+from .replay import iter_chunks
+
+DEFAULT_SIZE = (120, 30)  # Размер PTY сессий, записанных до сохранения resize
+ZIP_FLUSH = 64 * 1024  # Байт архива, после которых отдаём его клиенту
+
+_UNSAFE_CHARS = re.compile(r"[^\w.-]")
+
+
+async def iter_events(session_id: int) -> AsyncIterator[tuple[int, str, str]]:
+    """(мс unix, код, данные) событий сессии по времени"""
+    resizes = await get_session_resizes(session_id)
+    index = 0
+    async for at, _, text in iter_chunks(session_id):
+        while index < len(resizes) and resizes[index]["at"] <= at:
+            resize = resizes[index]
+            index += 1
+            yield resize["at"], "r", f"{resize['width']}x{resize['height']}"
+        yield at, "o", text
+    for resize in resizes[index:]:
+        yield resize["at"], "r", f"{resize['width']}x{resize['height']}"
+
+
+def _line(value) -> bytes:
+    # Одиночные суррогаты из вывода не ломают UTF-8 файла
+    return (json.dumps(value, ensure_ascii=False) + "\n").encode("utf-8", "replace")
+
+
+async def iter_asciicast(session: dict) -> AsyncIterator[bytes]:
+    """Строки файла .cast сессии"""
+    events = iter_events(session["id"])
+    first = await anext(events, None)
+    width, height = DEFAULT_SIZE
+    origin = first[0] if first else None
+    if first and first[1] == "r":
+        # Начальный размер - в заголовок
+        width, height = map(int, first[2].split("x"))
+        first = None
+
+    header = {"version": 2, "width": width, "height": height}
+    if origin is not None:
+        header["timestamp"] = origin // 1000
+    title = (session["project_id"], session["mode"], f"#{session['id']}")
+    header["title"] = " ".join(filter(None, title))
+    header["env"] = {"TERM": "xterm-256color"}
+    yield _line(header)
+
+    if first:
+        yield _line([0.0, first[1], first[2]])
+    async for at, code, data in events:
+        yield _line([round(max(0, at - origin) / 1000, 3), code, data])
+
+
+async def gzipped(lines: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Потоковое gzip-сжатие"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for line in lines:
+        data = compressor.compress(line)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def file_name(session: dict) -> str:
+    return f"{_UNSAFE_CHARS.sub('_', session['project_id'])}-{session['id']}.cast"
+
+
+def archive_name(project_id: str) -> str:
+    return f"{_UNSAFE_CHARS.sub('_', project_id)}-sessions.zip"
+
+
+class _ChunkSink:
+    """Файловый объект для ZipFile без seek: записанное забирается порциями"""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        self.size = 0
+        return data
+
+
+async def iter_project_sessions(project_id: str) -> AsyncIterator[dict]:
+    """Все сессии проекта от новых к старым (постранично)"""
+    cursor: Optional[str] = None
+    while True:
+        page = await list_sessions(project_id=project_id, limit=100, cursor=cursor)
+        for session in page["sessions"]:
+            yield session
+        cursor = page["next_cursor"]
+        if not cursor:
+            return
+
+
+async def iter_zip(sessions: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """ZIP-архив с файлом .cast на сессию, отдаётся по мере сжатия"""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        async for session in sessions:
+            started = datetime.fromisoformat(session["started_at"])
+            info = zipfile.ZipInfo(file_name(session), date_time=started.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, "w", force_zip64=True) as entry:
+                async for line in iter_asciicast(session):
+                    entry.write(line)
+                    if sink.size >= ZIP_FLUSH:
+                        yield sink.drain()
+            if sink.size:
+                yield sink.drain()
+    yield sink.drain()
@@ -1,6 +1,12 @@
 """
 Pydantic модели для конфигурации
 """
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from enum import Enum
 from pathlib import Path
 from typing import Optional
@@ -22,6 +28,12 @@ class LLMType(str, Enum):
     CUSTOM = "custom"
 
 
+class HistoryLayout(str, Enum):
+    SINGLE = "single"  # Вся история в одном файле
+    PROJECT = "project"  # Вывод и поиск - файл на проект
+    PROJECT_MONTH = "project_month"  # Файл на проект за месяц
+
+
 class ProjectConfig(BaseModel):
     """Конфигурация отдельного проекта"""
     id: str
@@ -49,12 +61,22 @@ class APIKeys(BaseModel):
     google: Optional[str] = None
 
 
+class RetentionPolicy(BaseModel):
+    """Ограничения истории сессий (None - без ограничения)"""
+    max_age_days: Optional[int] = Field(default=None, ge=1)
+    max_bytes: Optional[int] = Field(default=None, ge=0)
+    keep_last_sessions: Optional[int] = Field(default=None, ge=0)
+
+
 class GlobalSettings(BaseModel):
     """Глобальные настройки приложения"""
     base_projects_path: str = "D:/projects"
     default_llm: LLMType = LLMType.CLAUDE_CODE
     default_mode: WorkMode = WorkMode.DEVELOPMENT
     api_keys: APIKeys = Field(default_factory=APIKeys)
+    retention: RetentionPolicy = Field(default_factory=RetentionPolicy)  # На всю историю
+    project_retention: dict[str, RetentionPolicy] = Field(default_factory=dict)  # По project_id
+    history_layout: HistoryLayout = HistoryLayout.SINGLE  # Для новых сессий
 
 
 class AppConfig(BaseModel):
@@ -67,60 +89,326 @@ class AppConfig(BaseModel):
 CONFIG_DIR = Path(__file__).parent.parent / "config"
 SETTINGS_FILE = CONFIG_DIR / "settings.yaml"
 PROJECTS_DIR = CONFIG_DIR / "projects"
+CONFIG_DB = CONFIG_DIR / "config.db"  # Есть - конфиги хранятся в нём, а не в YAML
+
+# C-реализация libyaml, если pyyaml собран с ней (в разы быстрее чистого Python)
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+# Ключ версии файла: изменение mtime или размера - файл перечитывается
+FileKey = tuple[int, int]
+
+
+def _file_key(path: Path) -> Optional[FileKey]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_yaml(path: Path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=_YamlLoader) or {}
+
+
+def _write_yaml(path: Path, data: dict) -> None:
+    """Атомарная запись: временный файл рядом, fsync, os.replace"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        yaml.dump(data, f, Dumper=_YamlDumper, default_flow_style=False, allow_unicode=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ConfigStore:
+    """
+    Конфиги в памяти процесса. Каталог проектов и settings.yaml читаются
+    один раз; дальше не чаще раза в CHECK_INTERVAL сверяются mtime и размер
+    файлов и перечитываются только изменённые снаружи. Запись через store
+    сразу обновляет память. Наружу отдаются копии - их можно менять.
+    """
+
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, projects_dir: Path, settings_file: Path):
+        self.projects_dir = projects_dir
+        self.settings_file = settings_file
+        # Имя файла без .yaml -> (ключ файла, конфиг или None для невалидного)
+        self._projects: dict[str, tuple[FileKey, Optional[ProjectConfig]]] = {}
+        self._settings: Optional[tuple[Optional[FileKey], GlobalSettings]] = None
+        self._checked = 0.0
+        self._lock = threading.RLock()
+        # Счётчики
+        self.reads = 0
+
+    def invalidate(self):
+        """Сверка с диском при следующем обращении"""
+        self._checked = 0.0
+
+    def get_settings(self) -> GlobalSettings:
+        with self._lock:
+            self._refresh()
+            return self._settings[1].model_copy(deep=True)
+
+    def save_settings(self, settings: GlobalSettings) -> None:
+        with self._lock:
+            self.settings_file.parent.mkdir(parents=True, exist_ok=True)
+            _write_yaml(self.settings_file, settings.model_dump(mode='json'))
+            self._settings = (_file_key(self.settings_file), settings.model_copy(deep=True))
+
+    def get_project(self, project_id: str) -> Optional[ProjectConfig]:
+        with self._lock:
+            self._refresh()
+            entry = self._projects.get(project_id)
+            if entry is None or entry[1] is None:
+                return None
+            return entry[1].model_copy()
+
+    def list_projects(self) -> list[ProjectConfig]:
+        with self._lock:
+            self._refresh()
+            return [project.model_copy() for _, project in self._projects.values() if project is not None]
+
+    def save_project(self, project: ProjectConfig) -> None:
+        self.save_projects([project])
+
+    def save_projects(self, projects: list[ProjectConfig]) -> None:
+        """Сохранение нескольких проектов (в YAML - файл за файлом, каждый атомарно)"""
+        with self._lock:
+            self.projects_dir.mkdir(parents=True, exist_ok=True)
+            for project in projects:
+                project_file = self.projects_dir / f"{project.id}.yaml"
+                _write_yaml(project_file, project.model_dump(mode='json'))
+                self._projects[project.id] = (_file_key(project_file), project.model_copy())
+
+    def delete_project(self, project_id: str) -> bool:
+        with self._lock:
+            self._projects.pop(project_id, None)
+            project_file = self.projects_dir / f"{project_id}.yaml"
+            if project_file.exists():
+                project_file.unlink()
+                return True
+            return False
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._settings is not None and now - self._checked < self.CHECK_INTERVAL:
+            return
+        self._checked = now
+
+        key = _file_key(self.settings_file)
+        if self._settings is None or self._settings[0] != key:
+            settings = GlobalSettings(**_read_yaml(self.settings_file)) if key else GlobalSettings()
+            self._settings = (key, settings)
+            self.reads += 1
+
+        seen = set()
+        if self.projects_dir.exists():
+            with os.scandir(self.projects_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".yaml") or not entry.is_file():
+                        continue
+                    name = entry.name[:-len(".yaml")]
+                    seen.add(name)
+                    stat = entry.stat()
+                    key = (stat.st_mtime_ns, stat.st_size)
+                    cached = self._projects.get(name)
+                    if cached is None or cached[0] != key:
+                        self._projects[name] = (key, self._parse_project(Path(entry.path)))
+        for name in self._projects.keys() - seen:
+            del self._projects[name]
+
+    def _parse_project(self, path: Path) -> Optional[ProjectConfig]:
+        self.reads += 1
+        try:
+            return ProjectConfig(**_read_yaml(path))
+        except Exception:
+            return None  # Невалидный конфиг пропускаем до следующего изменения файла
+
+
+class SqliteConfigStore(ConfigStore):
+    """
+    Все конфиги в одном файле SQLite (config.db): запись - транзакция,
+    пакет проектов - одна транзакция. Изменения другими процессами
+    замечаются по PRAGMA data_version (не чаще раза в CHECK_INTERVAL).
+    """
+
+    def __init__(self, path: Path):
+        super().__init__(PROJECTS_DIR, SETTINGS_FILE)
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS projects (id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS settings (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                data TEXT NOT NULL
+            )"""
+        )
+        self._data_version: Optional[int] = None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def save_settings(self, settings: GlobalSettings) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO settings (id, data) VALUES (1, ?)",
+                (json.dumps(settings.model_dump(mode='json')),)
+            )
+            self._settings = (None, settings.model_copy(deep=True))
+
+    def save_projects(self, projects: list[ProjectConfig]) -> None:
+        """Сохранение нескольких проектов одной транзакцией"""
+        with self._lock:
+            with self._transaction():
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO projects (id, data) VALUES (?, ?)",
+                    [(project.id, json.dumps(project.model_dump(mode='json'))) for project in projects]
+                )
+            for project in projects:
+                self._projects[project.id] = (None, project.model_copy())
+
+    def delete_project(self, project_id: str) -> bool:
+        with self._lock:
+            self._projects.pop(project_id, None)
+            cursor = self._conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+            return cursor.rowcount > 0
+
+    def import_yaml(self, projects_dir: Path, settings_file: Path) -> int:
+        """Перенос конфигов из YAML одной транзакцией; возвращает число проектов"""
+        source = ConfigStore(projects_dir, settings_file)
+        projects = source.list_projects()
+        settings = source.get_settings()
+        with self._lock, self._transaction():
+            self._conn.execute("DELETE FROM projects")
+            self._conn.executemany(
+                "INSERT INTO projects (id, data) VALUES (?, ?)",
+                [(project.id, json.dumps(project.model_dump(mode='json'))) for project in projects]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO settings (id, data) VALUES (1, ?)",
+                (json.dumps(settings.model_dump(mode='json')),)
+            )
+        self.invalidate()
+        self._data_version = None
+        return len(projects)
+
+    def export_yaml(self, projects_dir: Path, settings_file: Path) -> int:
+        """Выгрузка конфигов в YAML (файл на проект); возвращает число проектов"""
+        target = ConfigStore(projects_dir, settings_file)
+        projects = self.list_projects()
+        target.save_projects(projects)
+        target.save_settings(self.get_settings())
+        return len(projects)
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._settings is not None and now - self._checked < self.CHECK_INTERVAL:
+            return
+        self._checked = now
+
+        # Меняется только при коммитах других соединений
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._settings is not None and data_version == self._data_version:
+            return
+        self._data_version = data_version
+
+        row = self._conn.execute("SELECT data FROM settings WHERE id = 1").fetchone()
+        self._settings = (None, GlobalSettings(**json.loads(row[0])) if row else GlobalSettings())
+        self._projects = {}
+        for project_id, data in self._conn.execute("SELECT id, data FROM projects ORDER BY rowid"):
+            self.reads += 1
+            try:
+                self._projects[project_id] = (None, ProjectConfig(**json.loads(data)))
+            except Exception:
+                self._projects[project_id] = (None, None)
+
+
+def create_config_store() -> ConfigStore:
+    """SQLite, если config.db создан (python -m backend.config to-sqlite), иначе YAML"""
+    if CONFIG_DB.exists():
+        return SqliteConfigStore(CONFIG_DB)
+    return ConfigStore(PROJECTS_DIR, SETTINGS_FILE)
+
+
+# Глобальный экземпляр
+config_store = create_config_store()
 
 
 def load_settings() -> GlobalSettings:
     """Загрузка глобальных настроек"""
-    if SETTINGS_FILE.exists():
-        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f) or {}
-            return GlobalSettings(**data)
-    return GlobalSettings()
+    return config_store.get_settings()
 
 
 def save_settings(settings: GlobalSettings) -> None:
     """Сохранение глобальных настроек"""
-    CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-    with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-        yaml.dump(settings.model_dump(mode='json'), f, default_flow_style=False, allow_unicode=True)
+    config_store.save_settings(settings)
 
 
 def load_project(project_id: str) -> Optional[ProjectConfig]:
     """Загрузка конфига проекта"""
-    project_file = PROJECTS_DIR / f"{project_id}.yaml"
-    if project_file.exists():
-        with open(project_file, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f) or {}
-            return ProjectConfig(**data)
-    return None
+    return config_store.get_project(project_id)
 
 
 def save_project(project: ProjectConfig) -> None:
     """Сохранение конфига проекта"""
-    PROJECTS_DIR.mkdir(parents=True, exist_ok=True)
-    project_file = PROJECTS_DIR / f"{project.id}.yaml"
-    with open(project_file, "w", encoding="utf-8") as f:
-        yaml.dump(project.model_dump(mode='json'), f, default_flow_style=False, allow_unicode=True)
+    config_store.save_project(project)
+
+
+def save_projects(projects: list[ProjectConfig]) -> None:
+    """Сохранение нескольких конфигов (в config.db - одной транзакцией)"""
+    config_store.save_projects(projects)
 
 
 def delete_project(project_id: str) -> bool:
     """Удаление конфига проекта"""
-    project_file = PROJECTS_DIR / f"{project_id}.yaml"
-    if project_file.exists():
-        project_file.unlink()
-        return True
-    return False
+    return config_store.delete_project(project_id)
 
 
 def load_all_projects() -> list[ProjectConfig]:
     """Загрузка всех проектов"""
-    projects = []
-    if PROJECTS_DIR.exists():
-        for file in PROJECTS_DIR.glob("*.yaml"):
-            with open(file, "r", encoding="utf-8") as f:
-                data = yaml.safe_load(f) or {}
-                try:
-                    projects.append(ProjectConfig(**data))
-                except Exception:
-                    pass  # Пропускаем невалидные конфиги
-    return projects
+    return config_store.list_projects()
+
+
+if __name__ == "__main__":
+    # python -m backend.config to-sqlite | to-yaml
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Перенос конфигов между YAML и config.db")
+    parser.add_argument("command", choices=["to-sqlite", "to-yaml"])
+    args = parser.parse_args()
+
+    if args.command == "to-sqlite":
+        if isinstance(config_store, SqliteConfigStore):
+            parser.exit(1, f"{CONFIG_DB} already exists\n")
+        store = SqliteConfigStore(CONFIG_DB)
+        count = store.import_yaml(PROJECTS_DIR, SETTINGS_FILE)
+        store.close()
+        print(f"Imported {count} projects into {CONFIG_DB} (YAML files are kept as a backup)")
+    else:
+        if not isinstance(config_store, SqliteConfigStore):
+            parser.exit(1, f"{CONFIG_DB} does not exist\n")
+        count = config_store.export_yaml(PROJECTS_DIR, SETTINGS_FILE)
+        config_store.close()
+        CONFIG_DB.replace(CONFIG_DB.with_suffix(".db.bak"))
+        print(f"Exported {count} projects to {PROJECTS_DIR}, {CONFIG_DB.name} renamed to config.db.bak")
@@ -1,197 +1,1232 @@
 """
 SQLite база данных для хранения истории сессий
 """
+import asyncio
+import base64
+import json
 import aiosqlite
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from pathlib import Path
-from datetime import datetime
-from typing import Optional
+from typing import Any, AsyncIterator, Optional
+
+from .config import HistoryLayout, load_settings
+from .migrations import Migration, add_column, run_migrations
+from .partitions import PartitionSet, partition_for
+from .search import MATCH_END, MATCH_START, LineSplitter, fts_query, render_snippet
+from .segments import CODEC, OpenSegment, decode_marks, decode_text
 
 DB_PATH = Path(__file__).parent.parent / "data" / "history.db"
 
+# Настройки соединений: WAL + synchronous=NORMAL (fsync только на checkpoint),
+# 16MB кеша страниц и mmap для чтения
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class Database:
+    """
+    Сервис БД: одно долгоживущее соединение на запись и пул соединений на чтение.
+    Записи всех сессий идут через очередь и коммитятся группой - одна
+    транзакция на интервал, а не на каждую вставку.
+    """
+
+    FLUSH_INTERVAL = 0.05  # Максимальная задержка записи без ожидающего результата
+    MAX_BATCH = 2000  # Операций в одной транзакции
+    READERS = 3  # Соединений на чтение
+
+    def __init__(self, path: Path, readers: int = READERS):
+        self.path = path
+        self.readers = readers
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._reader_list: list[aiosqlite.Connection] = []
+        # (sql, params, future) - future только у тех, кто ждёт результат
+        self._queue: asyncio.Queue[tuple[str, tuple, Optional[asyncio.Future]]] = asyncio.Queue()
+        self._urgent = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Счётчики
+        self.commits = 0
+        self.writes = 0
+
+    async def open(self, migrations: list[Migration]):
+        """Открытие соединений и миграция схемы до последней версии"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._writer = await aiosqlite.connect(self.path, isolation_level=None)
+        for pragma in PRAGMAS:
+            await self._writer.execute(pragma)
+        await run_migrations(self._writer, migrations)
+
+        for _ in range(self.readers):
+            reader = await aiosqlite.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+            for pragma in PRAGMAS[1:]:
+                await reader.execute(pragma)
+            reader.row_factory = aiosqlite.Row
+            self._reader_list.append(reader)
+            self._readers.put_nowait(reader)
+
+        self._task = asyncio.create_task(self._writer_loop())
+
+    async def close(self):
+        """Дописываем очередь и закрываем соединения"""
+        if self._task:
+            self._queue.put_nowait(_STOP)
+            self._urgent.set()
+            await self._task
+            self._task = None
+        if self._writer:
+            await self._writer.close()
+            self._writer = None
+        for reader in self._reader_list:
+            await reader.close()
+        self._reader_list.clear()
+        self._readers = asyncio.Queue()
+
+    def write_nowait(self, sql: str, params: tuple = ()):
+        """Запись без ожидания (попадёт в ближайший групповой коммит)"""
+        self._queue.put_nowait((sql, params, None))
+
+    async def write(self, sql: str, params: tuple = ()) -> int:
+        """Запись с ожиданием коммита; возвращает lastrowid"""
+        lastrowid, _ = await self._write(sql, params)
+        return lastrowid
+
+    async def write_rowcount(self, sql: str, params: tuple = ()) -> int:
+        """Запись с ожиданием коммита; возвращает число затронутых строк"""
+        _, rowcount = await self._write(sql, params)
+        return rowcount
+
+    async def _write(self, sql: str, params: tuple) -> tuple[int, int]:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((sql, params, future))
+        self._urgent.set()
+        return await future
+
+    async def barrier(self):
+        """Ожидание коммита всех записей, поставленных до вызова (без ускорения коммита)"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(("", (), future))
+        await future
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Соединение из пула на чтение"""
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    async def fetchall(self, sql: str, params: tuple = ()) -> list[dict]:
+        async with self.reader() as conn:
+            cursor = await conn.execute(sql, params)
+            return [dict(row) for row in await cursor.fetchall()]
+
+    async def fetchone(self, sql: str, params: tuple = ()) -> Optional[Any]:
+        async with self.reader() as conn:
+            cursor = await conn.execute(sql, params)
+            return await cursor.fetchone()
+
+    async def _writer_loop(self):
+        """Групповой коммит: всё накопленное за интервал - одной транзакцией"""
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            if not self._urgent.is_set():
+                # Даём накопиться записям других сессий
+                try:
+                    await asyncio.wait_for(self._urgent.wait(), self.FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            self._urgent.clear()
+
+            batch = [item]
+            while len(batch) < self.MAX_BATCH and not self._queue.empty():
+                queued = self._queue.get_nowait()
+                if queued is _STOP:
+                    stopping = True
+                    break
+                batch.append(queued)
+            await self._commit(batch)
+
+    async def _commit(self, batch: list[tuple[str, tuple, Optional[asyncio.Future]]]):
+        db = self._writer
+        results: list[tuple[asyncio.Future, Any]] = []
+        try:
+            await db.execute("BEGIN")
+            i = 0
+            while i < len(batch):
+                sql, params, future = batch[i]
+                if future is None:
+                    # Подряд идущие одинаковые записи без ожидания - одним executemany
+                    j = i + 1
+                    while j < len(batch) and batch[j][2] is None and batch[j][0] == sql:
+                        j += 1
+                    try:
+                        await db.executemany(sql, [item[1] for item in batch[i:j]])
+                    except Exception as e:
+                        print(f"[DB] Write failed: {e}")
+                    i = j
+                    continue
+                if not sql:
+                    results.append((future, None))  # barrier
+                    i += 1
+                    continue
+                try:
+                    cursor = await db.execute(sql, params)
+                    # Дочитываем: PRAGMA вроде incremental_vacuum работают по шагам
+                    await cursor.fetchall()
+                    results.append((future, (cursor.lastrowid, cursor.rowcount)))
+                except Exception as e:
+                    results.append((future, e))
+                i += 1
+            await db.execute("COMMIT")
+        except Exception as e:
+            print(f"[DB] Commit failed: {e}")
+            try:
+                await db.execute("ROLLBACK")
+            except Exception:
+                pass
+            results = [(future, e) for _, _, future in batch if future is not None]
+
+        self.commits += 1
+        self.writes += len(batch)
+        for future, result in results:
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+# Маркер остановки очереди записи
+_STOP = ("", (), None)
+
+
+# Базовые таблицы (как их создавал init_db до появления миграций)
+_BASE_TABLES = (
+    """CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id TEXT NOT NULL,
+        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        ended_at TIMESTAMP,
+        mode TEXT,
+        llm_type TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        role TEXT NOT NULL,  -- 'user', 'assistant', 'system'
+        content TEXT NOT NULL,
+        FOREIGN KEY (session_id) REFERENCES sessions(id)
+    )""",
+    # Вывод терминала: сжатые сегменты ~64KB (см. segments.py)
+    """CREATE TABLE IF NOT EXISTS terminal_segments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER NOT NULL,
+        seq INTEGER NOT NULL,
+        start_offset INTEGER NOT NULL,  -- в символах от начала вывода сессии
+        end_offset INTEGER NOT NULL,
+        started_at INTEGER NOT NULL,  -- мс (unix)
+        ended_at INTEGER NOT NULL,
+        codec TEXT NOT NULL,
+        data BLOB NOT NULL,
+        marks BLOB NOT NULL,
+        FOREIGN KEY (session_id) REFERENCES sessions(id),
+        UNIQUE (session_id, seq)
+    )""",
+)
+
+# Индексы под запросы этого модуля (проверка: EXPLAIN QUERY PLAN)
+_HISTORY_INDEXES = (
+    # get_project_sessions, get_stats (GROUP BY project_id)
+    "CREATE INDEX IF NOT EXISTS idx_sessions_project_started ON sessions (project_id, started_at)",
+    # get_all_sessions
+    "CREATE INDEX IF NOT EXISTS idx_sessions_started ON sessions (started_at)",
+    # get_session_history
+    "CREATE INDEX IF NOT EXISTS idx_messages_session_timestamp ON messages (session_id, timestamp)",
+    # search_messages (обход от новых к старым до LIMIT)
+    "CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp)",
+    # get_recent_terminal_output без проекта
+    "CREATE INDEX IF NOT EXISTS idx_segments_ended ON terminal_segments (ended_at)",
+    # get_recent_terminal_output по проекту
+    "CREATE INDEX IF NOT EXISTS idx_segments_session_ended ON terminal_segments (session_id, ended_at)",
+)
+
+# Перемотка воспроизведения к смещению (find_segment_by_offset)
+_SEGMENT_OFFSET_INDEX = (
+    "CREATE INDEX IF NOT EXISTS idx_segments_session_offset ON terminal_segments (session_id, end_offset)",
+)
+
+# Глобальный экземпляр
+db = Database(DB_PATH)
+
+
+async def _convert_terminal_output(conn: aiosqlite.Connection):
+    """Разовый перенос старой таблицы terminal_output в сжатые сегменты"""
+    cursor = await conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'terminal_output'"
+    )
+    if not await cursor.fetchone():
+        return
+
+    print("[DB] Converting terminal_output to compressed segments...")
+    # Секундные метки CURRENT_TIMESTAMP (UTC) -> мс
+    rows = await conn.execute(
+        """SELECT session_id, output,
+                  CAST(strftime('%s', timestamp) AS INTEGER) * 1000
+           FROM terminal_output ORDER BY session_id, id"""
+    )
+    segment: Optional[OpenSegment] = None
+    segment_session = None
+    converted = 0
+    async for session_id, output, at in rows:
+        at = at or 0
+        converted += 1
+        if segment and session_id == segment_session and not segment.full:
+            segment.append(at, output)
+            continue
+        if segment:
+            await _insert_segment(conn, segment_session, segment)
+        if segment and session_id == segment_session:
+            segment = OpenSegment(seq=segment.seq + 1, start_offset=segment.end_offset, started_at=at)
+        else:
+            segment = OpenSegment(seq=0, start_offset=0, started_at=at)
+        segment_session = session_id
+        segment.append(at, output)
+    if segment:
+        await _insert_segment(conn, segment_session, segment)
+    await conn.execute("DROP TABLE terminal_output")
+    print(f"[DB] Converted {converted} terminal_output rows")
+
+
+async def _insert_segment(conn: aiosqlite.Connection, session_id: int, segment: OpenSegment):
+    await conn.execute(SEGMENT_UPSERT, _segment_params(session_id, segment))
+
+
+# Полнотекстовый индекс: очищенный вывод терминала (kind='output', ref - смещение
+# куска в выводе сессии) и сообщения (kind='message', ref - id сообщения).
+# Текст лежит в обычной таблице search_text (индекс по сессии - для удаления),
+# FTS5 - external content поверх неё, синхронизируется триггерами
+_SEARCH_INDEX = (
+    """CREATE TABLE IF NOT EXISTS search_text (
+        id INTEGER PRIMARY KEY,
+        text TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        session_id INTEGER NOT NULL,
+        project_id TEXT NOT NULL,
+        ref INTEGER NOT NULL,
+        at INTEGER NOT NULL  -- мс (unix)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_search_text_session ON search_text (session_id)",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        text,
+        kind UNINDEXED,
+        session_id UNINDEXED,
+        project_id UNINDEXED,
+        ref UNINDEXED,
+        at UNINDEXED,
+        content = 'search_text',
+        content_rowid = 'id',
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS search_text_insert AFTER INSERT ON search_text BEGIN
+        INSERT INTO search_index (rowid, text, kind, session_id, project_id, ref, at)
+        VALUES (new.id, new.text, new.kind, new.session_id, new.project_id, new.ref, new.at);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_text_delete AFTER DELETE ON search_text BEGIN
+        INSERT INTO search_index (search_index, rowid, text, kind, session_id, project_id, ref, at)
+        VALUES ('delete', old.id, old.text, old.kind, old.session_id, old.project_id, old.ref, old.at);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_search_index AFTER INSERT ON messages BEGIN
+        INSERT INTO search_text (text, kind, session_id, project_id, ref, at)
+        SELECT new.content, 'message', new.session_id, project_id, new.id,
+               CAST(strftime('%s', new.timestamp) AS INTEGER) * 1000
+        FROM sessions WHERE id = new.session_id;
+    END""",
+)
+
+SEARCH_INSERT = """
+    INSERT INTO search_text (text, kind, session_id, project_id, ref, at)
+    SELECT ?, 'output', id, project_id, ?, ? FROM sessions WHERE id = ?
+"""
+
+
+async def _build_search_index(conn: aiosqlite.Connection):
+    """Индекс по уже сохранённой истории"""
+    for sql in _SEARCH_INDEX:
+        await conn.execute(sql)
+    cursor = await conn.execute("SELECT COUNT(*) FROM search_text")
+    if (await cursor.fetchone())[0]:
+        return
+
+    print("[DB] Building full-text search index...")
+    await conn.execute(
+        """INSERT INTO search_text (text, kind, session_id, project_id, ref, at)
+           SELECT m.content, 'message', m.session_id, s.project_id, m.id,
+                  CAST(strftime('%s', m.timestamp) AS INTEGER) * 1000
+           FROM messages m JOIN sessions s ON m.session_id = s.id"""
+    )
+    splitter = LineSplitter()
+    last_session = None
+    segments = await conn.execute(
+        """SELECT session_id, start_offset, started_at, codec, data
+           FROM terminal_segments ORDER BY session_id, seq"""
+    )
+    async for session_id, offset, at, codec, data in segments:
+        if session_id != last_session and last_session is not None:
+            # Недописанная строка предыдущей сессии - под её же id
+            for piece_offset, piece_at, text in splitter.finish(last_session):
+                await conn.execute(SEARCH_INSERT, (text, piece_offset, piece_at, last_session))
+        last_session = session_id
+        pieces = splitter.feed(session_id, offset, at, decode_text(codec, data))
+        for piece_offset, piece_at, text in pieces:
+            await conn.execute(SEARCH_INSERT, (text, piece_offset, piece_at, session_id))
+    if last_session is not None:
+        for piece_offset, piece_at, text in splitter.finish(last_session):
+            await conn.execute(SEARCH_INSERT, (text, piece_offset, piece_at, last_session))
+    await conn.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+
+
+async def _split_search_content(conn: aiosqlite.Connection):
+    """Индекс версии 4 хранил текст внутри FTS - переносим в search_text"""
+    cursor = await conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_text'"
+    )
+    if await cursor.fetchone():
+        return
+    await conn.execute(_SEARCH_INDEX[0])
+    await conn.execute(
+        """INSERT INTO search_text (id, text, kind, session_id, project_id, ref, at)
+           SELECT rowid, text, kind, session_id, project_id, ref, at FROM search_index"""
+    )
+    await conn.execute("DROP TRIGGER IF EXISTS messages_search_index")
+    await conn.execute("DROP TABLE search_index")
+    for sql in _SEARCH_INDEX:
+        await conn.execute(sql)
+    await conn.execute("INSERT INTO search_index (search_index) VALUES ('rebuild')")
+
+
+async def _add_session_aggregates(conn: aiosqlite.Connection):
+    """Хранимые итоги сессии - списки истории не пересчитывают их на каждый запрос"""
+    await add_column(conn, "sessions", "output_chars", "INTEGER NOT NULL DEFAULT 0")
+    await add_column(conn, "sessions", "duration_ms", "INTEGER")
+    await add_column(conn, "sessions", "typing_ms", "INTEGER NOT NULL DEFAULT 0")
+    await add_column(conn, "sessions", "idle_ms", "INTEGER NOT NULL DEFAULT 0")
+    await conn.execute(
+        """UPDATE sessions SET output_chars = COALESCE(
+               (SELECT MAX(end_offset) FROM terminal_segments WHERE session_id = sessions.id), 0)"""
+    )
+    # ended_at раньше писался в локальном времени - длительность берём по выводу
+    await conn.execute(
+        """UPDATE sessions SET duration_ms =
+               (SELECT MAX(ended_at) FROM terminal_segments WHERE session_id = sessions.id)
+               - CAST(strftime('%s', started_at) AS INTEGER) * 1000
+           WHERE ended_at IS NOT NULL AND duration_ms IS NULL"""
+    )
+
+
+# Итоги по проектам поддерживаются триггерами в той же транзакции, что и запись;
+# stats_daily - дневные агрегаты по дню начала сессии, их пересчитывает
+# фоновый rollup (stats.py) и они остаются после удаления сессий по retention
+_STATS_TABLES = (
+    """CREATE TABLE IF NOT EXISTS stats_projects (
+        project_id TEXT PRIMARY KEY,
+        sessions INTEGER NOT NULL DEFAULT 0,
+        messages INTEGER NOT NULL DEFAULT 0,
+        output_chars INTEGER NOT NULL DEFAULT 0,
+        output_chunks INTEGER NOT NULL DEFAULT 0,
+        typing_ms INTEGER NOT NULL DEFAULT 0,
+        idle_ms INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS stats_daily (
+        project_id TEXT NOT NULL,
+        day TEXT NOT NULL,  -- YYYY-MM-DD (UTC)
+        sessions INTEGER NOT NULL DEFAULT 0,
+        messages INTEGER NOT NULL DEFAULT 0,
+        output_chars INTEGER NOT NULL DEFAULT 0,
+        output_chunks INTEGER NOT NULL DEFAULT 0,
+        typing_ms INTEGER NOT NULL DEFAULT 0,
+        idle_ms INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (project_id, day)
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS stats_session_insert AFTER INSERT ON sessions BEGIN
+        INSERT INTO stats_projects (project_id, sessions) VALUES (new.project_id, 1)
+        ON CONFLICT (project_id) DO UPDATE SET sessions = sessions + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS stats_session_update
+    AFTER UPDATE OF output_chars, output_chunks, typing_ms, idle_ms ON sessions BEGIN
+        UPDATE stats_projects SET
+            output_chars = output_chars + new.output_chars - old.output_chars,
+            output_chunks = output_chunks + new.output_chunks - old.output_chunks,
+            typing_ms = typing_ms + new.typing_ms - old.typing_ms,
+            idle_ms = idle_ms + new.idle_ms - old.idle_ms
+        WHERE project_id = new.project_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS stats_session_delete AFTER DELETE ON sessions BEGIN
+        UPDATE stats_projects SET
+            sessions = sessions - 1,
+            output_chars = output_chars - old.output_chars,
+            output_chunks = output_chunks - old.output_chunks,
+            typing_ms = typing_ms - old.typing_ms,
+            idle_ms = idle_ms - old.idle_ms
+        WHERE project_id = old.project_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS stats_message_insert AFTER INSERT ON messages BEGIN
+        UPDATE stats_projects SET messages = messages + 1
+        WHERE project_id = (SELECT project_id FROM sessions WHERE id = new.session_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS stats_message_delete AFTER DELETE ON messages BEGIN
+        UPDATE stats_projects SET messages = messages - 1
+        WHERE project_id = (SELECT project_id FROM sessions WHERE id = old.session_id);
+    END""",
+)
+
+# Пересчёт дневных агрегатов за дни [?, ?) (по дню начала сессии)
+STATS_ROLLUP = """
+    INSERT OR REPLACE INTO stats_daily
+        (project_id, day, sessions, messages, output_chars, output_chunks, typing_ms, idle_ms)
+    SELECT s.project_id, date(s.started_at), COUNT(*),
+           SUM((SELECT COUNT(*) FROM messages WHERE session_id = s.id)),
+           SUM(s.output_chars), SUM(s.output_chunks), SUM(s.typing_ms), SUM(s.idle_ms)
+    FROM sessions s
+    WHERE s.started_at >= ? AND s.started_at < ?
+    GROUP BY s.project_id, date(s.started_at)
+"""
+
+
+async def _add_stats(conn: aiosqlite.Connection):
+    """Таблицы статистики и заполнение по уже сохранённой истории"""
+    await add_column(conn, "sessions", "output_chunks", "INTEGER NOT NULL DEFAULT 0")
+    chunks: dict[int, int] = {}
+    marks = await conn.execute("SELECT session_id, codec, marks FROM terminal_segments")
+    async for session_id, codec, encoded in marks:
+        chunks[session_id] = chunks.get(session_id, 0) + len(decode_marks(codec, encoded))
+    await conn.executemany(
+        "UPDATE sessions SET output_chunks = ? WHERE id = ?",
+        [(count, session_id) for session_id, count in chunks.items()]
+    )
+
+    for sql in _STATS_TABLES:
+        await conn.execute(sql)
+    await conn.execute("DELETE FROM stats_projects")
+    await conn.execute(
+        """INSERT INTO stats_projects
+               (project_id, sessions, messages, output_chars, output_chunks, typing_ms, idle_ms)
+           SELECT s.project_id, COUNT(*),
+                  SUM((SELECT COUNT(*) FROM messages WHERE session_id = s.id)),
+                  SUM(s.output_chars), SUM(s.output_chunks), SUM(s.typing_ms), SUM(s.idle_ms)
+           FROM sessions s GROUP BY s.project_id"""
+    )
+    await conn.execute(STATS_ROLLUP, ("0000-00-00", "9999-99-99"))
+
+
+async def _add_partitions(conn: aiosqlite.Connection):
+    """Каталог партиций; partition IS NULL - данные сессии в этой БД"""
+    await add_column(conn, "sessions", "partition", "TEXT")
+    await conn.execute(
+        """CREATE TABLE IF NOT EXISTS partitions (
+            name TEXT PRIMARY KEY,
+            project_id TEXT NOT NULL,
+            month TEXT,  -- YYYY-MM (UTC) для раскладки project_month
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )"""
+    )
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_partition ON sessions (partition)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_partitions_project ON partitions (project_id)")
+
+
+# Размер терминала сессии: начальный и каждое изменение (для экспорта asciicast)
+_TERMINAL_RESIZES = (
+    """CREATE TABLE IF NOT EXISTS terminal_resizes (
+        id INTEGER PRIMARY KEY,
+        session_id INTEGER NOT NULL,
+        at INTEGER NOT NULL,  -- мс (unix)
+        width INTEGER NOT NULL,
+        height INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_resizes_session_at ON terminal_resizes (session_id, at)",
+)
+
+
+# Только дописывать в конец; применённые миграции не менять
+MIGRATIONS = [
+    Migration(1, "base tables", _BASE_TABLES),
+    Migration(2, "terminal_output to compressed segments", _convert_terminal_output, vacuum=True),
+    Migration(3, "history indexes", _HISTORY_INDEXES),
+    Migration(4, "full-text search index", _build_search_index),
+    Migration(5, "search text outside of FTS", _split_search_content),
+    # Освобождённые страницы возвращает компактор (PRAGMA incremental_vacuum)
+    Migration(6, "incremental auto-vacuum", ("PRAGMA auto_vacuum = INCREMENTAL",), vacuum=True),
+    Migration(7, "segment offset index", _SEGMENT_OFFSET_INDEX),
+    Migration(8, "session aggregates", _add_session_aggregates),
+    Migration(9, "incremental statistics", _add_stats),
+    Migration(10, "history partitions", _add_partitions),
+    Migration(11, "terminal resizes", _TERMINAL_RESIZES),
+]
+
+# Схема файла партиции: вывод и поисковый индекс, без статистики.
+# sessions - копии строк каталога (id, project_id, started_at), чтобы
+# запросы и триггеры индекса работали как в основной БД
+PARTITION_MIGRATIONS = [
+    Migration(1, "incremental auto-vacuum", ("PRAGMA auto_vacuum = INCREMENTAL",), vacuum=True),
+    Migration(2, "base tables", _BASE_TABLES),
+    Migration(3, "history indexes", _HISTORY_INDEXES + _SEGMENT_OFFSET_INDEX),
+    Migration(4, "full-text search index", _SEARCH_INDEX),
+    Migration(5, "terminal resizes", _TERMINAL_RESIZES),
+]
+
+
+async def _open_partition(path: Path) -> Database:
+    partition = Database(path, readers=1)
+    await partition.open(PARTITION_MIGRATIONS)
+    return partition
+
+
+# Глобальный экземпляр
+partitions = PartitionSet(DB_PATH.parent / "partitions", _open_partition)
+
+# Сессии, вывод которых пишет этот процесс -> БД с их данными
+# (очереди записи не ждут поиска партиции в каталоге)
+_routes: dict[int, Database] = {}
+
 
 async def init_db():
     """Инициализация базы данных"""
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                project_id TEXT NOT NULL,
-                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                ended_at TIMESTAMP,
-                mode TEXT,
-                llm_type TEXT
-            )
-        """)
-
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id INTEGER NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                role TEXT NOT NULL,  -- 'user', 'assistant', 'system'
-                content TEXT NOT NULL,
-                FOREIGN KEY (session_id) REFERENCES sessions(id)
-            )
-        """)
-
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS terminal_output (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id INTEGER NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                output TEXT NOT NULL,
-                FOREIGN KEY (session_id) REFERENCES sessions(id)
-            )
-        """)
+    await db.open(MIGRATIONS)
+    set_history_layout(load_settings().history_layout)
+
+
+async def close_db():
+    """Запись остатка очереди и закрытие соединений"""
+    await partitions.close()
+    await db.close()
+    _routes.clear()
+
 
-        await db.commit()
+def set_history_layout(layout: HistoryLayout):
+    """Раскладка истории для новых сессий (уже записанные остаются на месте)"""
+    partitions.layout = layout
 
 
 async def create_session(project_id: str, mode: str, llm_type: str) -> int:
-    """Создание новой сессии"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
+    """Создание новой сессии (и её строки в партиции, если история разделена)"""
+    started = datetime.now(timezone.utc)
+    partition_key = partition_for(partitions.layout, project_id, started)
+    if partition_key is None:
+        return await db.write(
             "INSERT INTO sessions (project_id, mode, llm_type) VALUES (?, ?, ?)",
             (project_id, mode, llm_type)
         )
-        await db.commit()
-        return cursor.lastrowid
 
+    name, month = partition_key
+    started_at = started.strftime("%Y-%m-%d %H:%M:%S")
+    async with partitions.lock:
+        partition = await partitions.get(name)
+        db.write_nowait(
+            "INSERT OR IGNORE INTO partitions (name, project_id, month) VALUES (?, ?, ?)",
+            (name, project_id, month)
+        )
+        session_id = await db.write(
+            """INSERT INTO sessions (project_id, mode, llm_type, started_at, partition)
+               VALUES (?, ?, ?, ?, ?)""",
+            (project_id, mode, llm_type, started_at, name)
+        )
+        # Вывод сессии встанет в ту же очередь следом
+        partition.write_nowait(
+            "INSERT INTO sessions (id, project_id, mode, llm_type, started_at) VALUES (?, ?, ?, ?, ?)",
+            (session_id, project_id, mode, llm_type, started_at)
+        )
+    _routes[session_id] = partition
+    return session_id
+
+
+async def _session_db(session_id: int) -> Database:
+    """БД с выводом и поисковым индексом сессии: её партиция или основная"""
+    routed = _routes.get(session_id)
+    if routed is not None:
+        return routed
+    row = await db.fetchone("SELECT partition FROM sessions WHERE id = ?", (session_id,))
+    if row is None or row[0] is None:
+        return db
+    return await partitions.get(row[0])
 
-async def end_session(session_id: int):
-    """Завершение сессии"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE sessions SET ended_at = ? WHERE id = ?",
-            (datetime.now().isoformat(), session_id)
+
+async def _sources(project_id: Optional[str] = None) -> list[tuple[str, Database]]:
+    """(имя, БД) для запросов по всей истории: основная БД ("") и партиции (проекта)"""
+    if project_id is None:
+        rows = await db.fetchall("SELECT name FROM partitions ORDER BY name")
+    else:
+        rows = await db.fetchall(
+            "SELECT name FROM partitions WHERE project_id = ? ORDER BY name", (project_id,)
         )
-        await db.commit()
+    return [("", db)] + [(row["name"], await partitions.get(row["name"])) for row in rows]
+
+
+async def end_session(session_id: int, typing_ms: int = 0, idle_ms: int = 0):
+    """Завершение сессии (время в UTC, как started_at) с итогами по статусам LLM"""
+    await db.write(
+        """UPDATE sessions SET
+               ended_at = CURRENT_TIMESTAMP,
+               duration_ms = CAST((julianday('now') - julianday(started_at)) * 86400000 AS INTEGER),
+               typing_ms = ?,
+               idle_ms = ?
+           WHERE id = ?""",
+        (typing_ms, idle_ms, session_id)
+    )
 
 
 async def add_message(session_id: int, role: str, content: str):
     """Добавление сообщения в историю"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
-            (session_id, role, content)
-        )
-        await db.commit()
+    await db.write(
+        "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+        (session_id, role, content)
+    )
 
 
-async def add_terminal_output(session_id: int, output: str):
-    """Сохранение вывода терминала"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT INTO terminal_output (session_id, output) VALUES (?, ?)",
-            (session_id, output)
+SEGMENT_UPSERT = """
+    INSERT INTO terminal_segments
+        (session_id, seq, start_offset, end_offset, started_at, ended_at, codec, data, marks)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (session_id, seq) DO UPDATE SET
+        end_offset = excluded.end_offset,
+        ended_at = excluded.ended_at,
+        data = excluded.data,
+        marks = excluded.marks
+"""
+
+
+def _segment_params(session_id: int, segment: OpenSegment) -> tuple:
+    data, marks = segment.encode()
+    return (
+        session_id, segment.seq, segment.start_offset, segment.end_offset,
+        segment.started_at, segment.ended_at, CODEC, data, marks
+    )
+
+
+def queue_segment(session_id: int, segment: OpenSegment):
+    """Запись (перезапись) сегмента вывода в очередь (без ожидания)"""
+    _routes.get(session_id, db).write_nowait(SEGMENT_UPSERT, _segment_params(session_id, segment))
+
+
+async def get_segment_tail(session_id: int) -> tuple[int, int]:
+    """(seq, offset) для следующего сегмента сессии (дальнейшая запись пойдёт в её БД)"""
+    database = await _session_db(session_id)
+    _routes[session_id] = database
+    row = await database.fetchone(
+        "SELECT MAX(seq), MAX(end_offset) FROM terminal_segments WHERE session_id = ?",
+        (session_id,)
+    )
+    if row is None or row[0] is None:
+        return 0, 0
+    return row[0] + 1, row[1]
+
+
+def _decode_segment(row: Any, marks: bool = False) -> dict:
+    segment = dict(row)
+    codec = segment.pop("codec")
+    segment["output"] = decode_text(codec, segment.pop("data"))
+    encoded_marks = segment.pop("marks", None)
+    if marks:
+        segment["marks"] = decode_marks(codec, encoded_marks)
+    return segment
+
+
+async def iter_session_segments(
+    session_id: int, from_seq: int = 0, marks: bool = False, batch: int = 16
+) -> AsyncIterator[dict]:
+    """Сегменты сессии по порядку (с seq >= from_seq), с распакованным выводом"""
+    database = await _session_db(session_id)
+    last_seq = from_seq - 1
+    while True:
+        # Порциями, чтобы не держать соединение из пула всё время экспорта
+        rows = await database.fetchall(
+            """SELECT * FROM terminal_segments
+               WHERE session_id = ? AND seq > ?
+               ORDER BY seq LIMIT ?""",
+            (session_id, last_seq, batch)
         )
-        await db.commit()
+        if not rows:
+            return
+        for row in rows:
+            last_seq = row["seq"]
+            yield _decode_segment(row, marks)
+
+
+async def find_segment_by_offset(session_id: int, offset: int) -> Optional[int]:
+    """seq сегмента, содержащего символ offset вывода сессии"""
+    database = await _session_db(session_id)
+    row = await database.fetchone(
+        """SELECT seq FROM terminal_segments
+           WHERE session_id = ? AND end_offset > ?
+           ORDER BY end_offset LIMIT 1""",
+        (session_id, offset)
+    )
+    return row[0] if row else None
+
+
+async def find_segment_by_time(session_id: int, at: int) -> Optional[int]:
+    """seq первого сегмента, закончившегося не раньше at (мс)"""
+    database = await _session_db(session_id)
+    row = await database.fetchone(
+        """SELECT seq FROM terminal_segments
+           WHERE session_id = ? AND ended_at >= ?
+           ORDER BY ended_at LIMIT 1""",
+        (session_id, at)
+    )
+    return row[0] if row else None
+
+
+async def get_session_output(session_id: int) -> str:
+    """Полный вывод сессии"""
+    return "".join([segment["output"] async for segment in iter_session_segments(session_id)])
+
+
+def queue_output_size(session_id: int, chars: int, chunks: int):
+    """Счётчики вывода сессии (в той же групповой транзакции, что и сегменты)"""
+    db.write_nowait(
+        "UPDATE sessions SET output_chars = output_chars + ?, output_chunks = output_chunks + ? WHERE id = ?",
+        (chars, chunks, session_id)
+    )
+
+
+def queue_resize(session_id: int, at: int, width: int, height: int):
+    """Размер терминала сессии с момента at (мс) - в очередь (без ожидания)"""
+    _routes.get(session_id, db).write_nowait(
+        "INSERT INTO terminal_resizes (session_id, at, width, height) VALUES (?, ?, ?, ?)",
+        (session_id, at, width, height)
+    )
+
+
+async def get_session_resizes(session_id: int) -> list[dict]:
+    """Размеры терминала сессии по времени"""
+    database = await _session_db(session_id)
+    return await database.fetchall(
+        "SELECT at, width, height FROM terminal_resizes WHERE session_id = ? ORDER BY at, id",
+        (session_id,)
+    )
+
+
+def queue_search_text(session_id: int, offset: int, at: int, text: str):
+    """Очищенный кусок вывода - в полнотекстовый индекс (без ожидания)"""
+    _routes.get(session_id, db).write_nowait(SEARCH_INSERT, (text, offset, at, session_id))
+
+
+async def wait_for_writes():
+    """Ожидание коммита всех поставленных в очередь записей (во всех БД)"""
+    await asyncio.gather(
+        db.barrier(), *(partition.barrier() for partition in partitions.opened().values())
+    )
+
+
+async def get_session(session_id: int) -> Optional[dict]:
+    """Сессия по id"""
+    row = await db.fetchone("SELECT * FROM sessions WHERE id = ?", (session_id,))
+    return dict(row) if row else None
 
 
 async def get_session_history(session_id: int) -> list[dict]:
     """Получение истории сессии"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            "SELECT * FROM messages WHERE session_id = ? ORDER BY timestamp",
-            (session_id,)
-        )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    return await db.fetchall(
+        "SELECT * FROM messages WHERE session_id = ? ORDER BY timestamp",
+        (session_id,)
+    )
 
 
 async def get_project_sessions(project_id: str, limit: int = 10) -> list[dict]:
     """Получение последних сессий проекта"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            """SELECT * FROM sessions
-               WHERE project_id = ?
-               ORDER BY started_at DESC
-               LIMIT ?""",
-            (project_id, limit)
-        )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    return await db.fetchall(
+        """SELECT * FROM sessions
+           WHERE project_id = ?
+           ORDER BY started_at DESC
+           LIMIT ?""",
+        (project_id, limit)
+    )
+
+
+def _encode_cursor(*key: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> list:
+    """ValueError для испорченного курсора"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+async def list_sessions(
+    project_id: Optional[str] = None, limit: int = 50, cursor: Optional[str] = None
+) -> dict:
+    """Страница сессий от новых к старым (keyset по (started_at, id))"""
+    where = []
+    params: list[Any] = []
+    if project_id is not None:
+        where.append("project_id = ?")
+        params.append(project_id)
+    if cursor:
+        started_at, session_id = _decode_cursor(cursor)
+        where.append("(started_at, id) < (?, ?)")
+        params.extend((started_at, session_id))
+    params.append(limit)
+
+    rows = await db.fetchall(
+        f"""SELECT * FROM sessions
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY started_at DESC, id DESC
+            LIMIT ?""",
+        tuple(params)
+    )
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = _encode_cursor(rows[-1]["started_at"], rows[-1]["id"])
+    return {"sessions": rows, "next_cursor": next_cursor}
+
+
+async def get_output_page(session_id: int, limit: int = 4, cursor: Optional[str] = None) -> dict:
+    """Страница вывода сессии: сегменты по порядку (keyset по seq)"""
+    last_seq = _decode_cursor(cursor)[0] if cursor else -1
+    database = await _session_db(session_id)
+    rows = await database.fetchall(
+        """SELECT * FROM terminal_segments
+           WHERE session_id = ? AND seq > ?
+           ORDER BY seq LIMIT ?""",
+        (session_id, last_seq, limit)
+    )
+    segments = [_decode_segment(row) for row in rows]
+    next_cursor = _encode_cursor(rows[-1]["seq"]) if len(rows) == limit else None
+    return {"segments": segments, "next_cursor": next_cursor}
 
 
 async def get_all_sessions(limit: int = 50) -> list[dict]:
     """Получение всех последних сессий"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            """SELECT * FROM sessions
-               ORDER BY started_at DESC
-               LIMIT ?""",
-            (limit,)
-        )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    return await db.fetchall(
+        """SELECT * FROM sessions
+           ORDER BY started_at DESC
+           LIMIT ?""",
+        (limit,)
+    )
 
 
 async def get_recent_terminal_output(project_id: str = None, limit: int = 100) -> list[dict]:
-    """Получение последнего вывода терминала"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        if project_id:
-            cursor = await db.execute(
-                """SELECT t.*, s.project_id FROM terminal_output t
-                   JOIN sessions s ON t.session_id = s.id
-                   WHERE s.project_id = ?
-                   ORDER BY t.timestamp DESC
-                   LIMIT ?""",
-                (project_id, limit)
-            )
-        else:
-            cursor = await db.execute(
-                """SELECT t.*, s.project_id FROM terminal_output t
-                   JOIN sessions s ON t.session_id = s.id
-                   ORDER BY t.timestamp DESC
-                   LIMIT ?""",
-                (limit,)
-            )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    """Получение последнего вывода терминала (сегменты, от новых к старым)"""
+    if project_id:
+        sql = """SELECT t.*, s.project_id FROM terminal_segments t
+                 JOIN sessions s ON t.session_id = s.id
+                 WHERE s.project_id = ?
+                 ORDER BY t.ended_at DESC
+                 LIMIT ?"""
+        params = (project_id, limit)
+    else:
+        sql = """SELECT t.*, s.project_id FROM terminal_segments t
+                 JOIN sessions s ON t.session_id = s.id
+                 ORDER BY t.ended_at DESC
+                 LIMIT ?"""
+        params = (limit,)
+    # Первые limit каждой БД, затем общие первые limit
+    sources = await _sources(project_id)
+    found = await asyncio.gather(*(source.fetchall(sql, params) for _, source in sources))
+    rows = [row for source_rows in found for row in source_rows]
+    rows.sort(key=lambda row: row["ended_at"], reverse=True)
+    return [_decode_segment(row) for row in rows[:limit]]
 
 
 async def search_messages(query: str, limit: int = 50) -> list[dict]:
-    """Поиск по сообщениям"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            """SELECT m.*, s.project_id FROM messages m
-               JOIN sessions s ON m.session_id = s.id
-               WHERE m.content LIKE ?
-               ORDER BY m.timestamp DESC
-               LIMIT ?""",
-            (f"%{query}%", limit)
-        )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    """Поиск по сообщениям (по релевантности)"""
+    match = fts_query(query)
+    if not match:
+        return []
+    return await db.fetchall(
+        """SELECT m.*, s.project_id FROM search_index f
+           JOIN messages m ON m.id = f.ref
+           JOIN sessions s ON m.session_id = s.id
+           WHERE search_index MATCH ? AND f.kind = 'message'
+           ORDER BY f.rank
+           LIMIT ?""",
+        (match, limit)
+    )
 
 
-async def get_stats() -> dict:
-    """Получение статистики"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Всего сессий
-        cursor = await db.execute("SELECT COUNT(*) FROM sessions")
-        total_sessions = (await cursor.fetchone())[0]
-
-        # Всего сообщений
-        cursor = await db.execute("SELECT COUNT(*) FROM messages")
-        total_messages = (await cursor.fetchone())[0]
-
-        # Сессий по проектам
-        cursor = await db.execute(
-            """SELECT project_id, COUNT(*) as count
-               FROM sessions GROUP BY project_id"""
+async def search_history(
+    query: str,
+    project_id: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    kind: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None
+) -> dict:
+    """
+    Поиск по выводу терминалов и сообщениям: bm25, сниппеты, фильтры по
+    проекту, виду и времени (мс). cursor - next_cursor предыдущей страницы.
+    Страницы - смещением в выдаче, ограниченной строками на момент первой
+    страницы (bm25 меняется с каждой новой строкой индекса - ключом он быть не может).
+    """
+    match = fts_query(query)
+    if not match:
+        return {"results": [], "next_cursor": None}
+
+    where = ["search_index MATCH ?"]
+    params: list[Any] = [MATCH_START, MATCH_END, match]
+    if project_id is not None:
+        where.append("project_id = ?")
+        params.append(project_id)
+    if kind is not None:
+        where.append("kind = ?")
+        params.append(kind)
+    if since is not None:
+        where.append("at >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("at < ?")
+        params.append(until)
+    offset = 0
+    snapshot: Optional[dict] = None  # БД -> последний rowid на момент первой страницы
+    if cursor:
+        offset, snapshot = _decode_cursor(cursor)
+        if (
+            not isinstance(offset, int) or offset < 0 or not isinstance(snapshot, dict)
+            or not all(isinstance(rowid, int) for rowid in snapshot.values())
+        ):
+            raise ValueError("Invalid cursor")
+
+    async def last_rowid(source: Database) -> int:
+        row = await source.fetchone("SELECT MAX(id) FROM search_text")
+        return row[0] or 0
+
+    async def search_source(name: str, source: Database, snapshot_rowid: int) -> list[dict]:
+        # Первые offset + limit строк каждой БД - из них складывается общая страница
+        rows = await source.fetchall(
+            f"""SELECT rowid, kind, session_id, project_id, ref, at, rank,
+                       snippet(search_index, 0, ?, ?, '…', 16) AS snippet
+                FROM search_index
+                WHERE {" AND ".join(where)} AND rowid <= ?
+                ORDER BY rank, rowid
+                LIMIT ?""",
+            (*params, snapshot_rowid, offset + limit)
         )
-        sessions_by_project = {row[0]: row[1] for row in await cursor.fetchall()}
+        for row in rows:
+            row["source"] = name
+        return rows
 
-        return {
-            "total_sessions": total_sessions,
-            "total_messages": total_messages,
-            "sessions_by_project": sessions_by_project
+    # Партиции ищутся параллельно; bm25 считается по статистике своего индекса
+    sources = await _sources(project_id)
+    if snapshot is None:
+        rowids = await asyncio.gather(*(last_rowid(source) for _, source in sources))
+        snapshot = {name: rowid for (name, _), rowid in zip(sources, rowids)}
+    # Партиция, появившаяся после первой страницы, содержит только новые строки
+    found = await asyncio.gather(*(
+        search_source(name, source, snapshot.get(name, 0)) for name, source in sources
+    ))
+    rows = [row for source_rows in found for row in source_rows]
+    rows.sort(key=lambda row: (row["rank"], row["source"], row["rowid"]))
+    rows = rows[offset:offset + limit]
+    results = [
+        {
+            "kind": row["kind"],
+            "session_id": row["session_id"],
+            "project_id": row["project_id"],
+            "ref": row["ref"],
+            "at": row["at"],
+            "score": -row["rank"],
+            "snippet": render_snippet(row["snippet"]),
         }
+        for row in rows
+    ]
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = _encode_cursor(offset + limit, snapshot)
+    return {"results": results, "next_cursor": next_cursor}
+
+
+# Объём хранимой истории сессий в байтах (вывод, сообщения, индекс), от новых к старым
+_SESSION_SIZES = """
+    SELECT s.id, s.project_id, s.started_at, s.ended_at,
+           COALESCE((SELECT SUM(length(data) + length(marks))
+                     FROM terminal_segments WHERE session_id = s.id), 0)
+           + COALESCE((SELECT SUM(length(CAST(content AS BLOB)))
+                       FROM messages WHERE session_id = s.id), 0)
+           + COALESCE((SELECT SUM(length(CAST(text AS BLOB)))
+                       FROM search_text WHERE session_id = s.id), 0) AS bytes
+    FROM sessions s
+    ORDER BY s.started_at DESC, s.id DESC
+"""
+
+
+async def get_session_sizes() -> list[dict]:
+    """Сессии с объёмом хранимой истории в байтах (вывод, сообщения, индекс), от новых к старым"""
+    sources = await _sources()
+    sessions = await db.fetchall(_SESSION_SIZES)
+    if len(sources) > 1:
+        partition_bytes: dict[int, int] = {}
+        for _, partition in sources[1:]:
+            for row in await partition.fetchall(_SESSION_SIZES):
+                partition_bytes[row["id"]] = partition_bytes.get(row["id"], 0) + row["bytes"]
+        for session in sessions:
+            session["bytes"] += partition_bytes.get(session["id"], 0)
+    return sessions
+
+
+async def _page_counts(database: Database) -> tuple[int, int]:
+    """(размер страницы, свободных страниц)"""
+    async with database.reader() as conn:
+        cursor = await conn.execute("PRAGMA page_size")
+        page_size = (await cursor.fetchone())[0]
+        cursor = await conn.execute("PRAGMA freelist_count")
+        return page_size, (await cursor.fetchone())[0]
+
+
+def _file_bytes(database: Database) -> int:
+    wal_path = database.path.with_name(database.path.name + "-wal")
+    return database.path.stat().st_size + (wal_path.stat().st_size if wal_path.exists() else 0)
+
+
+async def get_history_size() -> dict:
+    """Размер файлов БД, свободное место и объём истории по проектам и партициям"""
+    projects: dict[str, dict] = {}
+    for session in await get_session_sizes():
+        project = projects.setdefault(session["project_id"], {"sessions": 0, "bytes": 0})
+        project["sessions"] += 1
+        project["bytes"] += session["bytes"]
+
+    file_bytes = 0
+    free_bytes = 0
+    partition_bytes = {}
+    for name, source in await _sources():
+        page_size, free_pages = await _page_counts(source)
+        size = _file_bytes(source)
+        file_bytes += size
+        free_bytes += page_size * free_pages
+        if name:
+            partition_bytes[name] = size
+    return {
+        "file_bytes": file_bytes,
+        "free_bytes": free_bytes,
+        "history_bytes": sum(project["bytes"] for project in projects.values()),
+        "projects": projects,
+        "partitions": partition_bytes,
+    }
+
+
+async def delete_session_batch(session_id: int, batch: int) -> bool:
+    """
+    Удаление порции данных сессии (не больше batch строк из каждой таблицы).
+    True - сессия удалена целиком.
+    """
+    data = await _session_db(session_id)
+    tables = [
+        (data, "search_text"), (data, "terminal_segments"), (data, "terminal_resizes"), (db, "messages")
+    ]
+    if data is not db:
+        tables.append((db, "search_text"))  # Индекс сообщений - в каталоге
+    remaining = False
+    for database, table in tables:
+        deleted = await database.write_rowcount(
+            f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE session_id = ? LIMIT ?)",
+            (session_id, batch)
+        )
+        remaining = remaining or deleted == batch
+    if remaining:
+        return False
+    if data is not db:
+        await data.write("DELETE FROM sessions WHERE id = ?", (session_id,))
+    await db.write("DELETE FROM sessions WHERE id = ?", (session_id,))
+    _routes.pop(session_id, None)
+    return True
+
+
+async def get_partition_sessions() -> dict[str, set[int]]:
+    """Партиции и id их сессий (в т.ч. партиции без сессий)"""
+    rows = await db.fetchall(
+        "SELECT p.name, s.id FROM partitions p LEFT JOIN sessions s ON s.partition = p.name"
+    )
+    result: dict[str, set[int]] = {}
+    for row in rows:
+        session_ids = result.setdefault(row["name"], set())
+        if row["id"] is not None:
+            session_ids.add(row["id"])
+    return result
+
+
+async def drop_partition(name: str, session_ids: set[int]) -> bool:
+    """
+    Удаление партиции целиком: строки сессий в каталоге и файл партиции.
+    False - в партиции есть сессии кроме session_ids (появились после выбора).
+    """
+    async with partitions.lock:
+        rows = await db.fetchall("SELECT id FROM sessions WHERE partition = ?", (name,))
+        if {row["id"] for row in rows} - session_ids:
+            return False
+        for table in ("search_text", "messages"):
+            db.write_nowait(
+                f"DELETE FROM {table} WHERE session_id IN (SELECT id FROM sessions WHERE partition = ?)",
+                (name,)
+            )
+        db.write_nowait("DELETE FROM sessions WHERE partition = ?", (name,))
+        await db.write("DELETE FROM partitions WHERE name = ?", (name,))
+        for session_id in session_ids:
+            _routes.pop(session_id, None)
+        await partitions.drop(name)
+    return True
+
+
+async def get_free_pages() -> int:
+    """Свободных страниц во всех БД истории"""
+    free = 0
+    for _, source in await _sources():
+        free += (await _page_counts(source))[1]
+    return free
+
+
+async def incremental_vacuum(pages: int):
+    """Возврат до pages свободных страниц каждой БД файловой системе"""
+    for _, source in await _sources():
+        if (await _page_counts(source))[1]:
+            await source.write(f"PRAGMA incremental_vacuum({int(pages)})")
+
+
+async def get_stats() -> dict:
+    """Получение статистики (O(проектов) - по счётчикам stats_projects)"""
+    rows = await db.fetchall("SELECT project_id, sessions, messages FROM stats_projects")
+    return {
+        "total_sessions": sum(row["sessions"] for row in rows),
+        "total_messages": sum(row["messages"] for row in rows),
+        "sessions_by_project": {row["project_id"]: row["sessions"] for row in rows if row["sessions"]}
+    }
+
+
+async def get_project_stats() -> list[dict]:
+    """Итоги по всем проектам"""
+    return await db.fetchall("SELECT * FROM stats_projects WHERE sessions > 0 ORDER BY project_id")
+
+
+async def get_project_daily_stats(project_id: str, since_day: str) -> dict:
+    """Итоги проекта и дневные агрегаты с since_day (YYYY-MM-DD)"""
+    totals = await db.fetchone("SELECT * FROM stats_projects WHERE project_id = ?", (project_id,))
+    days = await db.fetchall(
+        """SELECT * FROM stats_daily
+           WHERE project_id = ? AND day >= ?
+           ORDER BY day""",
+        (project_id, since_day)
+    )
+    return {"totals": dict(totals) if totals else None, "days": days}
+
+
+async def rollup_daily_stats(from_day: str, to_day: str):
+    """Пересчёт stats_daily за дни [from_day, to_day)"""
+    await db.write(STATS_ROLLUP, (from_day, to_day))
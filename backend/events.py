@@ -0,0 +1,76 @@
+"""
+Шина событий статуса сессий.
+ProcessManager публикует started/stopped/typing/idle/attention,
+подписчики (SSE) получают их через собственные очереди.
+"""
+import asyncio
+import json
+from typing import AsyncIterator, Callable, Optional
+
+
+# Маркер в очереди подписчика: события потеряны, нужен новый снимок
+RESYNC = None
+
+KEEPALIVE_INTERVAL = 15.0  # Комментарий-пинг, чтобы прокси не закрывали поток
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+class EventBus:
+    """Рассылка событий подписчикам без ожидания (publish не блокирует)"""
+
+    QUEUE_SIZE = 256
+
+    def __init__(self):
+        self._subscribers: set[asyncio.Queue] = set()
+
+    def subscribe(self) -> asyncio.Queue:
+        """Новая очередь подписчика"""
+        queue: asyncio.Queue[Optional[dict]] = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: dict):
+        """Отправка события всем подписчикам"""
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Подписчик отстал - вместо накопленных событий он получит снимок
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+
+def sse(message: dict) -> str:
+    return f"data: {json.dumps(message)}\n\n"
+
+
+async def sse_stream(
+    bus: EventBus,
+    snapshot: Callable[[], dict],
+    accept: Optional[Callable[[dict], bool]] = None
+) -> AsyncIterator[str]:
+    """Поток SSE: снимок при подключении (и после RESYNC), затем события шины"""
+    # Подписываемся до снимка - события между ними не потеряются
+    queue = bus.subscribe()
+    try:
+        yield "retry: 2000\n\n"
+        yield sse(snapshot())
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event is RESYNC:
+                yield sse(snapshot())
+            elif accept is None or accept(event):
+                yield sse(event)
+    finally:
+        bus.unsubscribe(queue)
@@ -0,0 +1,158 @@
+"""
+Лента изменений файлов запущенных проектов.
+Наблюдатель (inotify / ReadDirectoryChangesW через watchfiles) запускается
+вместе с процессом проекта и останавливается с ним. Изменения приходят
+пачками после паузы DEBOUNCE_MS, файлы из .gitignore отбрасываются.
+"""
+import asyncio
+import subprocess
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from watchfiles import DefaultFilter, awatch
+
+from .events import EventBus
+
+DEBOUNCE_MS = 500  # Пауза, после которой накопленные изменения уходят пачкой
+MAX_SESSION_FILES = 5000  # Файлов в списке изменённых за сессию
+GIT_TIMEOUT = 5.0
+_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)  # Без окна консоли на Windows
+
+
+def ignored_by_git(project_path: str, paths: list[str]) -> set[str]:
+    """Пути из paths, игнорируемые git (все .gitignore, info/exclude, глобальный excludesfile)"""
+    if not paths or not (Path(project_path) / ".git").exists():
+        return set()
+    try:
+        result = subprocess.run(
+            ["git", "check-ignore", "-z", "--stdin"], cwd=project_path,
+            input="\0".join(paths).encode("utf-8", "surrogateescape"), capture_output=True,
+            timeout=GIT_TIMEOUT, creationflags=_NO_WINDOW
+        )
+    except (OSError, subprocess.SubprocessError):
+        return set()
+    # 1 - ничего не игнорируется, 128 - ошибка (git не нашёл репозиторий)
+    if result.returncode != 0:
+        return set()
+    return set(result.stdout.decode("utf-8", "surrogateescape").split("\0")) - {""}
+
+
+@dataclass
+class ProjectWatcher:
+    """Наблюдатель одного проекта и файлы, изменённые за текущую сессию"""
+    project_id: str
+    path: str
+    session_id: int
+    files: dict[str, dict] = field(default_factory=dict)  # Путь -> change, at
+    batches: int = 0
+    _stop: asyncio.Event = field(default_factory=asyncio.Event)
+    _task: Optional[asyncio.Task] = None
+
+    def record(self, changes: list[dict]):
+        for change in changes:
+            # Последнее изменение файла - в конец порядка
+            self.files.pop(change["path"], None)
+            self.files[change["path"]] = {"change": change["change"], "at": change["at"]}
+        while len(self.files) > MAX_SESSION_FILES:
+            del self.files[next(iter(self.files))]
+
+    def snapshot(self) -> dict:
+        return {
+            "project_id": self.project_id,
+            "session_id": self.session_id,
+            "running": self._task is not None,
+            "files": [{"path": path, **info} for path, info in self.files.items()],
+        }
+
+
+class FileWatcher:
+    """
+    Наблюдатели запущенных проектов. Файлы сессии остаются доступны после
+    остановки процесса - до следующего запуска проекта.
+    """
+
+    def __init__(self):
+        self.events = EventBus()  # Пачки изменений всех проектов
+        self._watchers: dict[str, ProjectWatcher] = {}
+        # Счётчики
+        self.batches = 0
+        self.ignored = 0
+
+    def watch(self, project_id: str, path: str, session_id: int):
+        """Процесс проекта запущен - наблюдаем его папку для новой сессии"""
+        self.unwatch(project_id)
+        watcher = ProjectWatcher(project_id, path, session_id)
+        watcher._task = asyncio.create_task(self._run(watcher))
+        self._watchers[project_id] = watcher
+
+    def unwatch(self, project_id: str):
+        """Процесс остановлен - наблюдатель закрывается, список файлов сохраняется"""
+        watcher = self._watchers.get(project_id)
+        if watcher is not None and watcher._task is not None:
+            watcher._stop.set()
+            watcher._task = None
+
+    def forget(self, project_id: str):
+        self.unwatch(project_id)
+        self._watchers.pop(project_id, None)
+
+    def get(self, project_id: str) -> Optional[ProjectWatcher]:
+        return self._watchers.get(project_id)
+
+    def snapshot(self, project_id: Optional[str] = None) -> list[dict]:
+        """Файлы сессий всех проектов (или одного)"""
+        if project_id:
+            watcher = self._watchers.get(project_id)
+            return [watcher.snapshot()] if watcher else []
+        return [watcher.snapshot() for watcher in self._watchers.values()]
+
+    def active(self) -> int:
+        return sum(1 for watcher in self._watchers.values() if watcher._task is not None)
+
+    async def close(self):
+        tasks = [watcher._task for watcher in self._watchers.values() if watcher._task]
+        for project_id in list(self._watchers):
+            self.unwatch(project_id)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, watcher: ProjectWatcher):
+        root = Path(watcher.path)
+        try:
+            async for batch in awatch(
+                root, watch_filter=DefaultFilter(), debounce=DEBOUNCE_MS,
+                stop_event=watcher._stop, ignore_permission_denied=True
+            ):
+                at = int(time.time() * 1000)
+                changes = {}
+                for change, path in batch:
+                    try:
+                        relative = Path(path).relative_to(root).as_posix()
+                    except ValueError:
+                        continue
+                    changes[relative] = change.name  # added / modified / deleted
+                ignored = await asyncio.to_thread(ignored_by_git, watcher.path, list(changes))
+                self.ignored += len(ignored)
+                items = [
+                    {"path": path, "change": change, "at": at}
+                    for path, change in sorted(changes.items()) if path not in ignored
+                ]
+                if not items:
+                    continue
+                watcher.record(items)
+                watcher.batches += 1
+                self.batches += 1
+                self.events.publish({
+                    "type": "files",
+                    "project_id": watcher.project_id,
+                    "session_id": watcher.session_id,
+                    "changes": items,
+                })
+        except Exception as e:
+            # Папки нет или исчерпан лимит inotify - процесс проекта работает и без ленты
+            print(f"[Files] Watcher for {watcher.path} failed: {e}")
+
+
+# Глобальный экземпляр
+file_watcher = FileWatcher()
@@ -0,0 +1,346 @@
+"""
+Информация о git-репозиториях проектов для карточек.
+Файлы .git читаются и git вызывается в пуле потоков; API отдаёт кэш сразу,
+а обновлённые данные рассылаются событием "git" через шину статусов.
+"""
+import asyncio
+import re
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from .events import EventBus
+from .process_manager import process_manager
+
+GIT_TIMEOUT = 5.0  # Секунд на вызов git
+_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)  # Без окна консоли на Windows
+
+_REMOTE_SECTION = re.compile(r'^\s*\[remote\s+"([^"]+)"\]\s*$')
+_BRANCH_SECTION = re.compile(r'^\s*\[branch\s+"([^"]+)"\]\s*$')
+_SECTION = re.compile(r"^\s*\[")
+_KEY_VALUE = re.compile(r"^\s*(\w+)\s*=\s*(.*?)\s*$")
+
+
+def convert_to_web_url(git_url: str) -> Optional[str]:
+    """Конвертирует git URL в web URL"""
+    if not git_url:
+        return None
+
+    # SSH формат: git@github.com:user/repo.git
+    ssh_match = re.match(r'git@([^:]+):(.+?)(?:\.git)?$', git_url)
+    if ssh_match:
+        host = ssh_match.group(1)
+        path = ssh_match.group(2)
+        return f"https://{host}/{path}"
+
+    # HTTPS формат: https://github.com/user/repo.git
+    https_match = re.match(r'https?://([^/]+)/(.+?)(?:\.git)?$', git_url)
+    if https_match:
+        host = https_match.group(1)
+        path = https_match.group(2)
+        return f"https://{host}/{path}"
+
+    # Git протокол: git://github.com/user/repo.git
+    git_match = re.match(r'git://([^/]+)/(.+?)(?:\.git)?$', git_url)
+    if git_match:
+        host = git_match.group(1)
+        path = git_match.group(2)
+        return f"https://{host}/{path}"
+
+    return git_url
+
+
+def find_git_dirs(project_path: str) -> Optional[tuple[Path, Path]]:
+    """
+    (git_dir, common_dir) репозитория проекта. В worktree и подмодуле .git -
+    файл "gitdir: ...", а config и refs лежат в общем каталоге (commondir).
+    """
+    dot_git = Path(project_path) / ".git"
+    try:
+        if dot_git.is_file():
+            content = dot_git.read_text(encoding="utf-8").strip()
+            if not content.startswith("gitdir:"):
+                return None
+            git_dir = Path(content[len("gitdir:"):].strip())
+            if not git_dir.is_absolute():
+                git_dir = dot_git.parent / git_dir
+        elif dot_git.is_dir():
+            git_dir = dot_git
+        else:
+            return None
+        common_dir = git_dir
+        commondir_file = git_dir / "commondir"
+        if commondir_file.is_file():
+            common = Path(commondir_file.read_text(encoding="utf-8").strip())
+            common_dir = common if common.is_absolute() else git_dir / common
+    except OSError:
+        return None
+    return git_dir, common_dir
+
+
+def _parse_config(content: str) -> tuple[dict[str, str], dict[str, dict[str, str]]]:
+    """(remote -> url, branch -> {remote, merge}) из .git/config"""
+    remotes: dict[str, str] = {}
+    branches: dict[str, dict[str, str]] = {}
+    remote = branch = None
+    for line in content.splitlines():
+        if _SECTION.match(line):
+            remote_match = _REMOTE_SECTION.match(line)
+            branch_match = _BRANCH_SECTION.match(line)
+            remote = remote_match.group(1) if remote_match else None
+            branch = branch_match.group(1) if branch_match else None
+            continue
+        pair = _KEY_VALUE.match(line)
+        if not pair:
+            continue
+        key, value = pair.group(1).lower(), pair.group(2)
+        if remote and key == "url":
+            remotes.setdefault(remote, value)
+        elif branch and key in ("remote", "merge"):
+            branches.setdefault(branch, {})[key] = value
+    return remotes, branches
+
+
+def _read_ref(git_dir: Path, common_dir: Path, ref: str) -> Optional[str]:
+    """Хэш ссылки: файл в refs/ или строка packed-refs"""
+    for base in (git_dir, common_dir):
+        try:
+            return (base / ref).read_text(encoding="utf-8").strip() or None
+        except OSError:
+            continue
+    try:
+        with open(common_dir / "packed-refs", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+    except OSError:
+        pass
+    return None
+
+
+def _mtime(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+def get_git_info(project_path: str) -> dict:
+    """Извлекает информацию о git репозитории из файлов .git (без вызова git)"""
+    result = {
+        "has_git": False,
+        "remote_url": None,
+        "remote_name": None,
+        "web_url": None,
+        "branch": None,
+        "detached": False,
+        "head": None,
+        "upstream": None,
+    }
+
+    dirs = find_git_dirs(project_path)
+    if dirs is None:
+        return result
+    git_dir, common_dir = dirs
+    result["has_git"] = True
+
+    # Текущая ветка или коммит (detached HEAD)
+    try:
+        head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+    except OSError:
+        head = ""
+    if head.startswith("ref: refs/heads/"):
+        result["branch"] = head[len("ref: refs/heads/"):]
+        result["head"] = _read_ref(git_dir, common_dir, head[len("ref: "):])
+    elif head:
+        result["detached"] = True
+        result["head"] = head
+
+    try:
+        content = (common_dir / "config").read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return result
+    remotes, branches = _parse_config(content)
+
+    tracking = branches.get(result["branch"] or "", {})
+    remote_name = tracking.get("remote")
+    if remote_name not in remotes:
+        remote_name = "origin" if "origin" in remotes else next(iter(remotes), None)
+    if remote_name:
+        result["remote_name"] = remote_name
+        result["remote_url"] = remotes[remote_name]
+        # Конвертируем в web URL
+        result["web_url"] = convert_to_web_url(remotes[remote_name])
+
+    merge = tracking.get("merge", "")
+    if tracking.get("remote") in remotes and merge.startswith("refs/heads/"):
+        result["upstream"] = f"{tracking['remote']}/{merge[len('refs/heads/'):]}"
+    return result
+
+
+def git_state_key(project_path: str) -> Optional[tuple]:
+    """
+    Отпечаток состояния репозитория по mtime HEAD, config, packed-refs,
+    индекса и ссылок текущей ветки и её upstream. None - репозитория нет.
+    """
+    dirs = find_git_dirs(project_path)
+    if dirs is None:
+        return None
+    git_dir, common_dir = dirs
+    paths = [
+        git_dir / "HEAD", git_dir / "index", common_dir / "config",
+        common_dir / "packed-refs", common_dir / "refs" / "heads", common_dir / "refs" / "remotes",
+    ]
+    try:
+        head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+    except OSError:
+        head = ""
+    if head.startswith("ref: refs/heads/"):
+        paths.append(common_dir / head[len("ref: "):])
+        branch = head[len("ref: refs/heads/"):]
+        # Ссылка upstream обновляется при fetch - ahead/behind меняются
+        paths.extend((common_dir / "refs" / "remotes").glob(f"*/{branch}"))
+    return (str(git_dir), head) + tuple(_mtime(path) for path in paths)
+
+
+def _run_git(project_path: str, *args: str) -> Optional[str]:
+    """stdout git или None при ошибке"""
+    try:
+        result = subprocess.run(
+            ["git", *args], cwd=project_path, capture_output=True, text=True,
+            encoding="utf-8", errors="replace", timeout=GIT_TIMEOUT, creationflags=_NO_WINDOW
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout
+
+
+def get_git_status(project_path: str, info: dict) -> dict:
+    """Изменения в рабочей копии, ahead/behind и последний коммит (через git)"""
+    status = {"dirty": None, "changes": None, "ahead": None, "behind": None,
+              "last_commit": None, "last_commit_at": None}
+    if shutil.which("git") is None or not info["head"]:
+        return status
+
+    porcelain = _run_git(project_path, "status", "--porcelain", "--ignore-submodules=dirty")
+    if porcelain is not None:
+        changes = len(porcelain.splitlines())
+        status["dirty"] = changes > 0
+        status["changes"] = changes
+
+    if info["upstream"]:
+        counts = _run_git(project_path, "rev-list", "--left-right", "--count", "HEAD...@{upstream}")
+        if counts and len(counts.split()) == 2:
+            status["ahead"], status["behind"] = map(int, counts.split())
+
+    commit = _run_git(project_path, "log", "-1", "--format=%ct%x00%s")
+    if commit and "\x00" in commit:
+        at, subject = commit.rstrip("\n").split("\x00", 1)
+        status["last_commit"] = subject
+        status["last_commit_at"] = int(at) * 1000
+    return status
+
+
+class GitInfoCache:
+    """
+    Кэш git-информации по проектам. Обращение не ждёт: отдаёт последнее
+    известное и при необходимости ставит обновление в пул (не больше
+    MAX_WORKERS одновременно). Файлы .git перечитываются, только если
+    изменился отпечаток mtime; git status - ещё и раз в STATUS_TTL, так как
+    правки в рабочей копии по .git не видны.
+    """
+
+    MAX_WORKERS = 4
+    CHECK_INTERVAL = 5.0  # Не чаще проверяем отпечаток проекта
+    STATUS_TTL = 30.0  # Максимальный возраст dirty/ahead/behind
+
+    def __init__(self, events: EventBus):
+        self.events = events
+        self._entries: dict[str, dict] = {}  # project_id -> path, key, info, checked, status_at
+        self._pending: dict[str, asyncio.Future] = {}
+        self._forgotten: set[str] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Счётчики
+        self.refreshes = 0
+
+    def get(self, project_id: str, path: str) -> Optional[dict]:
+        """Закэшированная информация (None - ещё не загружена); устаревшая обновляется в фоне"""
+        entry = self._entries.get(project_id)
+        if entry is None or entry["path"] != path:
+            self._schedule(project_id, path)
+            return None
+        if time.monotonic() - entry["checked"] >= self.CHECK_INTERVAL:
+            self._schedule(project_id, path)
+        return entry["info"]
+
+    async def fetch(self, project_id: str, path: str) -> dict:
+        """Информация проекта; если её ещё нет - дожидаемся загрузки"""
+        info = self.get(project_id, path)
+        if info is not None:
+            return info
+        try:
+            await asyncio.shield(self._pending[project_id])
+        except Exception:
+            pass
+        entry = self._entries.get(project_id)
+        return entry["info"] if entry else get_git_info(path)
+
+    def forget(self, project_id: str):
+        """Проект удалён (обновление в пуле, если есть, отбрасывается)"""
+        self._entries.pop(project_id, None)
+        if project_id in self._pending:
+            self._forgotten.add(project_id)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _schedule(self, project_id: str, path: str):
+        if project_id in self._pending:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.MAX_WORKERS, thread_name_prefix="git-info")
+        entry = self._entries.get(project_id)
+        previous = entry if entry is not None and entry["path"] == path else None
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._load, path, previous)
+        self._pending[project_id] = future
+        future.add_done_callback(lambda done: self._loaded(project_id, path, done))
+
+    def _load(self, path: str, previous: Optional[dict]) -> dict:
+        """Новая запись кэша (в потоке пула)"""
+        now = time.monotonic()
+        key = git_state_key(path)
+        if previous is not None and key == previous["key"] and now - previous["status_at"] < self.STATUS_TTL:
+            return {**previous, "checked": now}
+
+        info = get_git_info(path)
+        if info["has_git"]:
+            info.update(get_git_status(path, info))
+        return {"path": path, "key": key, "info": info, "checked": now, "status_at": now}
+
+    def _loaded(self, project_id: str, path: str, future: asyncio.Future):
+        del self._pending[project_id]
+        if future.cancelled() or project_id in self._forgotten:
+            self._forgotten.discard(project_id)
+            return
+        if future.exception() is not None:
+            print(f"[Git] Refresh of {path} failed: {future.exception()}")
+            return
+        entry = future.result()
+        previous = self._entries.get(project_id)
+        self._entries[project_id] = entry
+        if previous is None or previous["info"] != entry["info"]:
+            self.refreshes += 1
+            self.events.publish({"type": "git", "kind": "project", "id": project_id, "git": entry["info"]})
+
+
+# Глобальный экземпляр
+git_cache = GitInfoCache(process_manager.events)
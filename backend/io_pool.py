@@ -0,0 +1,55 @@
+"""
+Блокирующий файловый ввод-вывод роутеров вне event loop.
+Тот же цикл качает все PTY и WebSocket, поэтому чтение .env или YAML с
+медленного (сетевого) диска выполняется в ограниченном пуле потоков.
+Записи одного файла сериализуются блокировкой пути.
+"""
+import asyncio
+import functools
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional, TypeVar, Union
+
+T = TypeVar("T")
+
+
+class IOPool:
+    """Пул потоков для файловых операций + asyncio-блокировки по путям"""
+
+    MAX_WORKERS = 8
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Блокировка живёт, пока её кто-то держит или ждёт
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        # Счётчики
+        self.calls = 0
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Вызов func в пуле"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="io")
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def lock(self, path: Union[str, Path]) -> asyncio.Lock:
+        """Блокировка файла: чтение-изменение-запись одного пути не пересекаются"""
+        key = os.path.normcase(os.path.abspath(path))
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+        return lock
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# Глобальный экземпляр
+io_pool = IOPool()
@@ -0,0 +1,187 @@
+"""
+Потоковый анализ состояния LLM CLI (typing / idle / attention)
+"""
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from .config import LLMType
+
+
+# Полные escape-последовательности (CSI, OSC, DCS/PM/APC, двухсимвольные ESC)
+# и одиночные управляющие символы, кроме \t \n \r
+ANSI_ESCAPE_REGEX = re.compile(
+    r'\x1b(?:\[[0-?]*[ -/]*[@-~]'
+    r'|\][^\x07\x1b]*(?:\x07|\x1b\\)'
+    r'|[PX^_][^\x1b]*\x1b\\'
+    r'|[ -/]*[0-~])'
+    r'|[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]'
+)
+
+# Незавершённая последовательность в конце куска - продолжение придёт в следующем
+ANSI_PARTIAL_REGEX = re.compile(
+    r'\x1b(?:\[[0-?]*[ -/]*'
+    r'|\][^\x07\x1b]*\x1b?'
+    r'|[PX^_][^\x1b]*\x1b?'
+    r'|[ -/]*)\Z'
+)
+
+# Ошибки - требуют внимания для любого CLI (без учёта регистра, как и attention)
+ERROR_PATTERNS = [
+    r'Permission denied',
+    r'Error',
+    r'Failed',
+    r'denied',
+    r'Cannot',
+    r'Not found',
+]
+
+
+@dataclass(frozen=True)
+class LLMProfile:
+    """Набор паттернов для конкретного CLI (компилируется один раз)"""
+    attention: re.Pattern
+    prompt: re.Pattern
+
+
+def _profile(attention: list[str], prompt: list[str]) -> LLMProfile:
+    # attention без учёта регистра: паттерны приводим к нижнему регистру и ищем
+    # по text.lower() - в разы быстрее re.IGNORECASE на длинной альтернативе
+    # (поэтому в attention нельзя использовать \S, \W, \D, \Z)
+    return LLMProfile(
+        attention=re.compile('|'.join(p.lower() for p in attention + ERROR_PATTERNS)),
+        prompt=re.compile('|'.join(prompt), re.MULTILINE),
+    )
+
+
+# attention - требует внимания пользователя (вопрос, подтверждение)
+# prompt - CLI ждёт ввода
+PROFILES: dict[LLMType, LLMProfile] = {
+    LLMType.CLAUDE_CODE: _profile(
+        attention=[
+            r'Do you want to',
+            r'Would you like to',
+            r'❯\s*1\.\s*Yes',
+            r'\([yY]/[nN]\)',
+        ],
+        prompt=[
+            r'[❯>]\s*$',
+            r'\? for shortcuts',
+        ],
+    ),
+    LLMType.CODEX: _profile(
+        attention=[
+            r'Allow command\?',
+            r'Yes, proceed',
+            r'Approve',
+            r'\[[yY]/[nN]\]',
+        ],
+        prompt=[
+            r'⏎ send',
+            r'▌\s*$',
+        ],
+    ),
+    LLMType.GEMINI: _profile(
+        attention=[
+            r'Allow execution',
+            r'Apply this change\?',
+            r'Waiting for user confirmation',
+        ],
+        prompt=[
+            r'Type your message',
+            r'^\s*>\s*$',
+        ],
+    ),
+    LLMType.AIDER: _profile(
+        attention=[
+            r'\(Y\)es/\(N\)o',
+            r'Add .+ to the chat\?',
+            r'Create new file\?',
+            r'Run shell commands?\?',
+        ],
+        prompt=[
+            r'^(?:\w+ )?>\s*$',
+        ],
+    ),
+    LLMType.CUSTOM: _profile(
+        attention=[
+            r'\(y/n\)',
+            r'\[Y/n\]',
+            r'\[y/N\]',
+            r'Do you want to',
+            r'Would you like to',
+            r'Proceed\?',
+            r'Continue\?',
+        ],
+        prompt=[
+            r'[❯>]\s*$',
+        ],
+    ),
+}
+
+
+class LLMStateAnalyzer:
+    """
+    Анализатор, получающий вывод по кускам.
+    Чистит ANSI инкрементально, держит короткий хвост и вердикт по attention,
+    поэтому state() при переходе в idle стоит O(1).
+    """
+
+    TAIL_SIZE = 500  # Окно анализа (символов очищенного вывода)
+    PROMPT_WINDOW = 200  # Промпт ищем только в самом конце
+    MAX_PENDING = 4096  # Ограничение на недописанную escape-последовательность
+    MATCH_OVERLAP = 64  # Перекрытие при поиске attention на стыке кусков
+
+    def __init__(self, llm: LLMType = LLMType.CUSTOM):
+        self.profile = PROFILES.get(llm, PROFILES[LLMType.CUSTOM])
+        self.reset()
+
+    def reset(self):
+        self.tail = ""
+        self._pending = ""  # Начало escape-последовательности из прошлого куска
+        self._total = 0  # Сколько очищенных символов видели всего
+        self._attention_at: Optional[int] = None  # Позиция последнего attention-совпадения
+        self._prompt: Optional[bool] = None  # Кеш вердикта по промпту
+
+    def feed(self, data: str):
+        """Обработка очередного куска вывода"""
+        text = self._pending + data if self._pending else data
+        self._pending = ""
+
+        partial = ANSI_PARTIAL_REGEX.search(text)
+        if partial and len(text) - partial.start() <= self.MAX_PENDING:
+            self._pending = text[partial.start():]
+            text = text[:partial.start()]
+
+        clean = ANSI_ESCAPE_REGEX.sub('', text)
+        if not clean:
+            return
+
+        # Ищем attention только в новом тексте (+ стык с предыдущим хвостом)
+        overlap = min(len(self.tail), self.MATCH_OVERLAP)
+        window = self.tail[-overlap:] + clean if overlap else clean
+        base = self._total - overlap
+        for match in self.profile.attention.finditer(window.lower()):
+            self._attention_at = base + match.start()
+
+        self._total += len(clean)
+        self.tail = (self.tail + clean)[-self.TAIL_SIZE:]
+        self._prompt = None
+
+    def state(self) -> str:
+        """
+        Текущее состояние: 'attention', 'idle', 'typing'
+        """
+        if not self._total:
+            return 'idle'
+
+        # Совпадение ещё в окне анализа
+        if self._attention_at is not None and self._attention_at >= self._total - self.TAIL_SIZE:
+            return 'attention'
+
+        if self._prompt is None:
+            self._prompt = self.profile.prompt.search(self.tail[-self.PROMPT_WINDOW:]) is not None
+        if self._prompt:
+            return 'idle'
+
+        return 'typing'
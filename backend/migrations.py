@@ -0,0 +1,67 @@
+"""
+Версионированные миграции схемы SQLite.
+Применённые версии хранятся в schema_version; каждая миграция выполняется
+в своей транзакции и пишется идемпотентно (IF NOT EXISTS и т.п.), чтобы
+база, созданная до появления миграций, проходила их без ошибок.
+"""
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Union
+
+import aiosqlite
+
+Step = Union[tuple[str, ...], Callable[[aiosqlite.Connection], Awaitable[None]]]
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    step: Step  # SQL-операторы по порядку или функция от соединения
+    vacuum: bool = False  # VACUUM после коммита (вне транзакции)
+
+
+async def current_version(conn: aiosqlite.Connection) -> int:
+    await conn.execute(
+        """CREATE TABLE IF NOT EXISTS schema_version (
+               version INTEGER PRIMARY KEY,
+               name TEXT NOT NULL,
+               applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )"""
+    )
+    cursor = await conn.execute("SELECT MAX(version) FROM schema_version")
+    row = await cursor.fetchone()
+    return row[0] or 0
+
+
+async def run_migrations(conn: aiosqlite.Connection, migrations: list[Migration]):
+    """Применение ещё не применённых миграций по возрастанию версии"""
+    applied = await current_version(conn)
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version <= applied:
+            continue
+        await conn.execute("BEGIN")
+        try:
+            if callable(migration.step):
+                await migration.step(conn)
+            else:
+                for sql in migration.step:
+                    await conn.execute(sql)
+            await conn.execute(
+                "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                (migration.version, migration.name)
+            )
+            await conn.execute("COMMIT")
+        except Exception:
+            await conn.execute("ROLLBACK")
+            raise
+        if migration.vacuum:
+            await conn.execute("VACUUM")
+        print(f"[DB] Migration {migration.version} applied: {migration.name}")
+
+
+async def add_column(conn: aiosqlite.Connection, table: str, column: str, definition: str):
+    """ALTER TABLE ADD COLUMN, если колонки ещё нет"""
+    cursor = await conn.execute(f"PRAGMA table_info({table})")
+    if any(row[1] == column for row in await cursor.fetchall()):
+        return
+    await conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
@@ -0,0 +1,132 @@
+"""
+Кольцевой буфер истории вывода терминала
+"""
+from collections import deque
+from typing import Iterator, Optional
+
+
+class OutputBuffer:
+    """
+    Буфер последних max_size символов вывода.
+    Хранит куски в deque: append амортизированно O(1), старые куски
+    вытесняются целиком, начало первого куска отсекается смещением.
+    """
+
+    # Мелкие куски (эхо клавиш, спиннеры) склеиваются до этого размера
+    CHUNK_SIZE = 4096
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # Склеенный кусок не больше всего буфера - иначе мелкий вывод копится сверх max_size
+        self._chunk_size = max(1, min(self.CHUNK_SIZE, max_size))
+        self._chunks: deque[str] = deque()
+        self._head = 0  # Смещение начала данных в первом куске
+        self._size = 0  # Полный размер кусков (включая отсечённое начало)
+        self._pending: list[str] = []  # Мелкие куски, ещё не склеенные
+        self._pending_size = 0
+        self._snapshot: Optional[str] = None
+
+    def __len__(self) -> int:
+        return self._size - self._head + self._pending_size
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __str__(self) -> str:
+        return self.snapshot()
+
+    def append(self, data: str):
+        """Добавление вывода"""
+        if not data:
+            return
+        self._snapshot = None
+
+        if len(data) >= self._chunk_size:
+            self._flush_pending()
+            if len(data) > self.max_size:
+                data = data[-self.max_size:]
+            self._push(data)
+        else:
+            self._pending.append(data)
+            self._pending_size += len(data)
+            if self._pending_size >= self._chunk_size:
+                self._flush_pending()
+
+        if self._size - self._head + self._pending_size > self.max_size:
+            self._evict()
+
+    def clear(self):
+        """Очистка буфера"""
+        self._chunks.clear()
+        self._pending.clear()
+        self._head = self._size = self._pending_size = 0
+        self._snapshot = None
+
+    def chunks(self) -> Iterator[str]:
+        """Итерация по кускам без склейки (первый кусок может быть срезан)"""
+        for i, chunk in enumerate(self._chunks):
+            yield chunk[self._head:] if i == 0 and self._head else chunk
+        yield from self._pending
+
+    def snapshot(self) -> str:
+        """Всё содержимое одной строкой (кешируется до следующего append)"""
+        if self._snapshot is None:
+            self._snapshot = "".join(self.chunks())
+        return self._snapshot
+
+    def tail(self, size: int) -> str:
+        """Последние size символов - склеиваются только нужные куски"""
+        if size <= 0:
+            return ""
+        if self._snapshot is not None:
+            return self._snapshot[-size:]
+
+        # Несклеенные куски мелкие (в сумме < _chunk_size) - одна склейка в C дешевле цикла по ним
+        pending = "".join(self._pending)
+        if len(pending) >= size:
+            return pending[-size:]
+        parts = [pending]
+        need = size - len(pending)
+        for i in range(len(self._chunks) - 1, -1, -1):
+            chunk = self._chunks[i]
+            start = self._head if i == 0 else 0
+            if len(chunk) - start >= need:
+                parts.append(chunk[len(chunk) - need:])
+                break
+            parts.append(chunk[start:] if start else chunk)
+            need -= len(chunk) - start
+        parts.reverse()
+        return "".join(parts)
+
+    def _push(self, chunk: str):
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+
+    def _flush_pending(self):
+        """Склейка мелких кусков в один (стоимость ограничена CHUNK_SIZE)"""
+        if self._pending:
+            self._push("".join(self._pending))
+            self._pending.clear()
+            self._pending_size = 0
+
+    def _evict(self):
+        """
+        Вытеснение старых данных сверх max_size. Несклеенные куски тоже в счёт:
+        их меньше _chunk_size <= max_size, поэтому хватает склеенных.
+        """
+        excess = len(self) - self.max_size
+        while excess > 0 and self._chunks:
+            first = len(self._chunks[0]) - self._head
+            if first <= excess:
+                self._chunks.popleft()
+                self._size -= first + self._head
+                self._head = 0
+                excess -= first
+            else:
+                self._head += excess
+                excess = 0
+                # Не держим в памяти давно отсечённое начало большого куска
+                if self._head >= self._chunk_size:
+                    self._chunks[0] = self._chunks[0][self._head:]
+                    self._size -= self._head
+                    self._head = 0
@@ -0,0 +1,86 @@
+"""
+Раздельное хранение истории по файлам SQLite (партициям).
+Вывод терминалов и поисковый индекс сессий лежат в файле проекта или
+проекта за месяц; основная БД остаётся каталогом: сессии (с именем
+партиции), сообщения и статистика. Старые данные удаляются вместе с файлом.
+"""
+import asyncio
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+
+from .config import HistoryLayout
+
+if TYPE_CHECKING:
+    from .database import Database
+
+_UNSAFE_CHARS = re.compile(r"[^\w-]")
+
+
+def partition_for(
+    layout: HistoryLayout, project_id: str, started: datetime
+) -> Optional[tuple[str, Optional[str]]]:
+    """(имя, месяц YYYY-MM) партиции новой сессии; None - данные в основной БД"""
+    if layout == HistoryLayout.SINGLE:
+        return None
+    name = _UNSAFE_CHARS.sub("_", project_id)
+    if layout == HistoryLayout.PROJECT_MONTH:
+        month = started.strftime("%Y-%m")
+        return f"{name}-{month}", month
+    return name, None
+
+
+class PartitionSet:
+    """
+    Партиции, открытые этим процессом: каждая - отдельный Database со своей
+    очередью записи. Открываются при первом обращении.
+    """
+
+    def __init__(self, directory: Path, open_partition: Callable[[Path], Awaitable["Database"]]):
+        self.directory = directory
+        self.layout = HistoryLayout.SINGLE  # Для новых сессий
+        # Создание сессии в партиции и удаление партиции не пересекаются
+        self.lock = asyncio.Lock()
+        self._open_partition = open_partition
+        self._open: dict[str, "Database"] = {}
+        self._opening: dict[str, asyncio.Task] = {}
+
+    def path(self, name: str) -> Path:
+        return self.directory / f"{name}.db"
+
+    def opened(self) -> dict[str, "Database"]:
+        return dict(self._open)
+
+    async def get(self, name: str) -> "Database":
+        """Партиция по имени (файл и схема создаются при первом открытии)"""
+        partition = self._open.get(name)
+        if partition is not None:
+            return partition
+        task = self._opening.get(name)
+        if task is None:
+            task = asyncio.create_task(self._open_partition(self.path(name)))
+            self._opening[name] = task
+        try:
+            partition = await asyncio.shield(task)
+        finally:
+            if self._opening.get(name) is task:
+                del self._opening[name]
+        self._open[name] = partition
+        return partition
+
+    async def drop(self, name: str):
+        """Закрытие партиции и удаление её файлов"""
+        partition = self._open.pop(name, None)
+        if partition is not None:
+            await partition.close()
+        path = self.path(name)
+        for suffix in ("", "-wal", "-shm"):
+            path.with_name(path.name + suffix).unlink(missing_ok=True)
+
+    async def close(self):
+        """Дописываем очереди и закрываем все партиции"""
+        partitions = self._open
+        self._open = {}
+        for partition in partitions.values():
+            await partition.close()
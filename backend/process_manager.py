@@ -2,122 +2,88 @@
 Process Manager - управление PTY процессами CLI LLM
 """
 import asyncio
-import re
+import os
 import time
 from dataclasses import dataclass, field
 from typing import Optional, Callable, Awaitable
-import winpty
-
-from .config import ProjectConfig, WorkMode
-from .database import create_session, end_session, add_terminal_output
-
-
-# Паттерны для определения состояния LLM CLI
-# attention - требует внимания пользователя (вопрос, ошибка)
-ATTENTION_PATTERNS = [
-    r'\(y/n\)',
-    r'\[Y/n\]',
-    r'\[y/N\]',
-    r'\? \(Y/n\)',
-    r'\? \(y/N\)',
-    r'Do you want to',
-    r'Would you like to',
-    r'Proceed\?',
-    r'Continue\?',
-    r'Permission denied',
-    r'Error:',
-    r'error:',
-    r'ERROR',
-    r'failed',
-    r'Failed',
-    r'FAILED',
-    r'denied',
-    r'Cannot',
-    r'cannot',
-    r'not found',
-    r'Not found',
-]
-ATTENTION_REGEX = re.compile('|'.join(ATTENTION_PATTERNS), re.IGNORECASE)
-
-# Паттерны промпта - LLM ждёт ввода
-PROMPT_PATTERNS = [
-    r'[❯>]\s*$',           # Промпт в конце строки
-    r'^\s*>\s*$',          # Просто > на строке
-    r'\n>\s*$',            # > после переноса
-    r'[❯]\s*$',            # Unicode промпт
-]
-PROMPT_REGEX = re.compile('|'.join(PROMPT_PATTERNS), re.MULTILINE)
-
-
-def analyze_llm_state(output: str) -> str:
-    """
-    Анализ состояния LLM на основе вывода.
-    Возвращает: 'attention', 'idle', 'typing'
-    """
-    if not output:
-        return 'idle'
-
-    # Берём последние 500 символов для анализа
-    recent = output[-500:] if len(output) > 500 else output
-
-    # Убираем ANSI escape-последовательности для чистого анализа
-    ansi_escape = re.compile(r'\x1b\[[0-9;]*[a-zA-Z]')
-    clean = ansi_escape.sub('', recent)
-
-    # Проверяем на паттерны требующие внимания
-    if ATTENTION_REGEX.search(clean):
-        return 'attention'
-
-    # Проверяем на промпт (ждёт ввода)
-    if PROMPT_REGEX.search(clean):
-        return 'idle'
-
-    # По умолчанию - typing (работает)
-    return 'typing'
+
+from .config import ProjectConfig, WorkMode, LLMType
+from .database import create_session, end_session
+from .events import EventBus
+from .file_watch import file_watcher
+from .llm_state import LLMStateAnalyzer
+from .output_buffer import OutputBuffer
+from .pty_backend import PTYBackend, create_pty
+from .recorder import recorder
+from .vt_screen import VTScreen
 
 
 @dataclass
 class ProcessSession:
     """Активная сессия процесса"""
     project_id: str
-    process: winpty.PTY
+    process: PTYBackend
     session_id: int
     mode: WorkMode
+    llm: LLMType = LLMType.CLAUDE_CODE
     running: bool = True
     output_callbacks: list[Callable[[str], Awaitable[None]]] = field(default_factory=list)
     status_callbacks: list[Callable[[str], Awaitable[None]]] = field(default_factory=list)
-    output_history: str = ""  # Буфер истории вывода
+    output_history: OutputBuffer = field(init=False)  # Буфер истории вывода
+    analyzer: LLMStateAnalyzer = field(init=False)  # Потоковый анализ состояния
+    screen: VTScreen = field(init=False)  # Текущий экран для переподключения
     last_output_time: float = 0  # Время последнего вывода
     is_typing: bool = False  # LLM печатает
+    llm_status: str = "idle"  # Последний опубликованный статус (typing/idle/attention)
+    status_since: float = field(default_factory=time.time)  # Когда установлен llm_status
+    status_ms: dict[str, int] = field(default_factory=dict)  # Время в каждом статусе
     _read_task: Optional[asyncio.Task] = None
-    _idle_task: Optional[asyncio.Task] = None
+    _idle_timer: Optional[asyncio.TimerHandle] = None
     MAX_HISTORY_SIZE: int = 50000  # ~50KB истории
     IDLE_TIMEOUT: float = 2.0  # Секунд без вывода = idle
 
+    def __post_init__(self):
+        self.output_history = OutputBuffer(self.MAX_HISTORY_SIZE)
+        self.analyzer = LLMStateAnalyzer(self.llm)
+        self.screen = VTScreen(self.process.cols, self.process.rows)
+
 
 @dataclass
 class ConsoleSession:
     """Сессия консоли (обычный шелл)"""
     project_id: str
-    process: winpty.PTY
+    process: PTYBackend
+    session_id: int
     running: bool = True
     output_callbacks: list[Callable[[str], Awaitable[None]]] = field(default_factory=list)
-    output_history: str = ""
+    output_history: OutputBuffer = field(init=False)
+    screen: VTScreen = field(init=False)
     _read_task: Optional[asyncio.Task] = None
     MAX_HISTORY_SIZE: int = 50000
 
+    def __post_init__(self):
+        self.output_history = OutputBuffer(self.MAX_HISTORY_SIZE)
+        self.screen = VTScreen(self.process.cols, self.process.rows)
+
 
 @dataclass
 class ZeusovichSession:
     """Сессия Zeusovich - глобальный CLI с доступом ко всем проектам"""
-    process: winpty.PTY
+    process: PTYBackend
+    session_id: int
     running: bool = True
     output_callbacks: list[Callable[[str], Awaitable[None]]] = field(default_factory=list)
-    output_history: str = ""
+    output_history: OutputBuffer = field(init=False)
+    screen: VTScreen = field(init=False)
     _read_task: Optional[asyncio.Task] = None
     MAX_HISTORY_SIZE: int = 100000  # Больше истории для Zeusovich
+    SCROLLBACK_LINES: int = 2000
     started_project_ids: set[str] = field(default_factory=set)  # ID проектов при запуске
 
+    def __post_init__(self):
+        self.output_history = OutputBuffer(self.MAX_HISTORY_SIZE)
+        self.screen = VTScreen(self.process.cols, self.process.rows, self.SCROLLBACK_LINES)
+
 
 class ProcessManager:
     """Менеджер процессов для всех проектов"""
@@ -129,13 +95,23 @@ class ProcessManager:
         self.pending_callbacks: dict[str, list[Callable[[str], Awaitable[None]]]] = {}
         self.pending_console_callbacks: dict[str, list[Callable[[str], Awaitable[None]]]] = {}
         self.pending_zeusovich_callbacks: list[Callable[[str], Awaitable[None]]] = []
+        self.events = EventBus()  # started/stopped/typing/idle/attention для всех сессий
         self._lock = asyncio.Lock()
 
     def _build_command(self, project: ProjectConfig) -> str:
         """Построение команды запуска LLM CLI"""
         cmd = project.get_llm_command()
         # Просто запускаем CLI в директории проекта
-        return f'cmd.exe /k "cd /d {project.path} && {cmd}"'
+        if os.name == 'nt':
+            return f'cmd.exe /k "cd /d {project.path} && {cmd}"'
+        # POSIX: после выхода из CLI остаёмся в интерактивном шелле (аналог cmd /k)
+        return f'{cmd}; exec "${{SHELL:-/bin/sh}}" -i'
+
+    def _build_console_command(self, project_path: str) -> str:
+        """Построение команды запуска консоли"""
+        if os.name == 'nt':
+            return f'powershell.exe -NoLogo -NoExit -Command "cd \'{project_path}\'"'
+        return 'exec "${SHELL:-/bin/sh}" -i'
 
     async def start_process(self, project: ProjectConfig) -> ProcessSession:
         """Запуск нового процесса для проекта"""
@@ -155,16 +131,18 @@ class ProcessManager:
             cmd = self._build_command(project)
             print(f"[DEBUG] Command: {cmd}")
 
-            pty = winpty.PTY(120, 30)
+            pty = create_pty(120, 30)
+            recorder.resize(session_id, pty.cols, pty.rows)
             print(f"[DEBUG] PTY created, spawning...")
-            pty.spawn(cmd)
+            pty.spawn(cmd, cwd=project.path)
             print(f"[DEBUG] Process spawned!")
 
             session = ProcessSession(
                 project_id=project.id,
                 process=pty,
                 session_id=session_id,
-                mode=project.mode
+                mode=project.mode,
+                llm=project.llm
             )
 
             # Добавляем pending callbacks
@@ -173,6 +151,8 @@ class ProcessManager:
                 print(f"[DEBUG] Added {len(self.pending_callbacks[project.id])} pending callbacks")
 
             self.sessions[project.id] = session
+            self._publish("started", "project", project.id)
+            file_watcher.watch(project.id, project.path, session_id)
 
             # Запускаем асинхронное чтение вывода
             session._read_task = asyncio.create_task(
@@ -181,8 +161,46 @@ class ProcessManager:
 
             return session
 
+    def _publish(self, event: str, kind: str, session_id: Optional[str] = None):
+        """Публикация события в шину (kind: project / console / zeusovich)"""
+        self.events.publish({"type": event, "kind": kind, "id": session_id})
+
+    def live_session_ids(self) -> set[int]:
+        """id сессий истории всех живых процессов (проекты, консоли, Zeusovich)"""
+        ids = {session.session_id for session in self.sessions.values()}
+        ids.update(session.session_id for session in self.console_sessions.values())
+        if self.zeusovich_session:
+            ids.add(self.zeusovich_session.session_id)
+        return ids
+
+    def status_snapshot(self) -> list[dict]:
+        """Полное состояние всех сессий (для новых подписчиков шины)"""
+        snapshot = [
+            {"kind": "project", "id": pid, "running": session.running, "status": session.llm_status}
+            for pid, session in self.sessions.items()
+        ]
+        snapshot.extend(
+            {"kind": "console", "id": pid, "running": session.running}
+            for pid, session in self.console_sessions.items()
+        )
+        if self.zeusovich_session:
+            snapshot.append({"kind": "zeusovich", "id": None, "running": self.zeusovich_session.running})
+        return snapshot
+
+    @staticmethod
+    def _account_status(session: ProcessSession):
+        """Время с прошлой смены статуса - в итог текущего статуса"""
+        now = time.time()
+        elapsed = int((now - session.status_since) * 1000)
+        session.status_ms[session.llm_status] = session.status_ms.get(session.llm_status, 0) + elapsed
+        session.status_since = now
+
     async def _notify_status(self, session: ProcessSession, status: str):
         """Уведомление о смене статуса (typing/idle)"""
+        if status != session.llm_status:
+            self._account_status(session)
+            session.llm_status = status
+            self._publish(status, "project", session.project_id)
         # Copy list to prevent modification during iteration
         for callback in list(session.status_callbacks):
             try:
@@ -190,58 +208,64 @@ class ProcessManager:
             except Exception:
                 pass
 
+    def _schedule_idle_check(self, session: ProcessSession, delay: float):
+        """Таймер проверки idle (вместо опроса в цикле чтения)"""
+        loop = asyncio.get_running_loop()
+        session._idle_timer = loop.call_later(delay, self._check_idle, session)
+
+    def _check_idle(self, session: ProcessSession):
+        """Срабатывание таймера idle: переносим его, если вывод ещё шёл"""
+        session._idle_timer = None
+        if not session.running or not session.is_typing:
+            return
+        remaining = session.last_output_time + session.IDLE_TIMEOUT - time.time()
+        if remaining > 0:
+            self._schedule_idle_check(session, remaining)
+            return
+        session.is_typing = False
+        # Вердикт уже посчитан по мере поступления вывода
+        state = session.analyzer.state()
+        asyncio.create_task(self._notify_status(session, state))
+
     async def _read_output(self, session: ProcessSession):
         """Асинхронное чтение вывода из PTY"""
-        buffer = ""
-        read_count = 0
         while session.running:
             try:
-                # Читаем данные из PTY
-                data = session.process.read(blocking=False)
-                if data:
-                    read_count += 1
-                    buffer += data
-                    session.last_output_time = time.time()
-
-                    # Отмечаем что LLM печатает
-                    if not session.is_typing:
-                        session.is_typing = True
-                        await self._notify_status(session, "typing")
-
-                    # Сохраняем в историю сессии
-                    session.output_history += data
-                    if len(session.output_history) > session.MAX_HISTORY_SIZE:
-                        session.output_history = session.output_history[-session.MAX_HISTORY_SIZE:]
-
-                    # Сохраняем в БД (батчим)
-                    if len(buffer) > 512:
-                        await add_terminal_output(session.session_id, buffer)
-                        buffer = ""
-
-                    # Отправляем всем подписчикам (copy list to prevent modification during iteration)
-                    for callback in list(session.output_callbacks):
-                        try:
-                            await callback(data)
-                        except Exception:
-                            pass
-                else:
-                    # Проверяем idle состояние
-                    if session.is_typing and session.last_output_time > 0:
-                        if time.time() - session.last_output_time > session.IDLE_TIMEOUT:
-                            session.is_typing = False
-                            # Анализируем состояние на основе вывода
-                            state = analyze_llm_state(session.output_history)
-                            await self._notify_status(session, state)
-                    await asyncio.sleep(0.05)  # 50ms пауза если нет данных
+                # Ждём данные из PTY (без опроса - по готовности)
+                data = await session.process.read()
+                if not data:
+                    break  # Процесс завершился
+
+                session.last_output_time = time.time()
+
+                # Отмечаем что LLM печатает
+                if not session.is_typing:
+                    session.is_typing = True
+                    if session._idle_timer is None:
+                        self._schedule_idle_check(session, session.IDLE_TIMEOUT)
+                    await self._notify_status(session, "typing")
+
+                # Сохраняем в историю сессии
+                session.output_history.append(data)
+                session.analyzer.feed(data)
+                session.screen.feed(data)
+
+                # Запись в БД - в фоне, без ожидания
+                recorder.record(session.session_id, data)
+
+                # Отправляем всем подписчикам (copy list to prevent modification during iteration)
+                for callback in list(session.output_callbacks):
+                    try:
+                        await callback(data)
+                    except Exception:
+                        pass
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 if session.running:
                     print(f"Error reading from PTY: {e}")
                 break
 
-        # Сохраняем остаток буфера
-        if buffer:
-            await add_terminal_output(session.session_id, buffer)
-
     async def write_to_process(self, project_id: str, data: str) -> bool:
         """Отправка данных в процесс"""
         session = self.sessions.get(project_id)
@@ -258,7 +282,11 @@ class ProcessManager:
         session = self.sessions.get(project_id)
         if session and session.running:
             try:
+                changed = (cols, rows) != (session.process.cols, session.process.rows)
                 session.process.set_size(cols, rows)
+                session.screen.resize(cols, rows)
+                if changed:
+                    recorder.resize(session.session_id, cols, rows)
                 return True
             except Exception:
                 pass
@@ -320,6 +348,8 @@ class ProcessManager:
         session = self.sessions.get(project_id)
         if session:
             session.running = False
+            if session._idle_timer:
+                session._idle_timer.cancel()
 
             # Отменяем задачу чтения
             if session._read_task:
@@ -335,10 +365,18 @@ class ProcessManager:
             except Exception:
                 pass
 
-            # Завершаем сессию в БД
-            await end_session(session.session_id)
+            # Завершаем сессию в БД (attention - тоже ожидание пользователя)
+            self._account_status(session)
+            recorder.end_session(session.session_id)
+            await end_session(
+                session.session_id,
+                typing_ms=session.status_ms.get("typing", 0),
+                idle_ms=session.status_ms.get("idle", 0) + session.status_ms.get("attention", 0)
+            )
 
             del self.sessions[project_id]
+            file_watcher.unwatch(project_id)
+            self._publish("stopped", "project", project_id)
 
     async def stop_process(self, project_id: str) -> bool:
         """Остановка процесса проекта"""
@@ -349,10 +387,14 @@ class ProcessManager:
             return False
 
     async def stop_all(self):
-        """Остановка всех процессов"""
+        """Остановка всех процессов (и консолей, и Zeusovich - их сессии истории тоже закрываются)"""
         async with self._lock:
             for project_id in list(self.sessions.keys()):
                 await self._stop_session(project_id)
+            for project_id in list(self.console_sessions.keys()):
+                await self._stop_console_session(project_id)
+            if self.zeusovich_session:
+                await self._stop_zeusovich_session()
 
     def get_session(self, project_id: str) -> Optional[ProcessSession]:
         """Получение сессии по ID проекта"""
@@ -362,7 +404,14 @@ class ProcessManager:
         """Получение истории вывода"""
         session = self.sessions.get(project_id)
         if session:
-            return session.output_history
+            return session.output_history.snapshot()
+        return ""
+
+    def get_output_snapshot(self, project_id: str) -> str:
+        """Снимок текущего экрана (вместо полной истории)"""
+        session = self.sessions.get(project_id)
+        if session:
+            return session.screen.snapshot()
         return ""
 
     def is_running(self, project_id: str) -> bool:
@@ -387,15 +436,19 @@ class ProcessManager:
                 await self._stop_console_session(project_id)
 
             # Создаем PTY с PowerShell
-            cmd = f'powershell.exe -NoLogo -NoExit -Command "cd \'{project_path}\'"'
+            cmd = self._build_console_command(project_path)
             print(f"[DEBUG] Console command: {cmd}")
 
-            pty = winpty.PTY(120, 30)
-            pty.spawn(cmd)
+            session_id = await create_session(project_id, "console", None)
+
+            pty = create_pty(120, 30)
+            recorder.resize(session_id, pty.cols, pty.rows)
+            pty.spawn(cmd, cwd=project_path)
 
             session = ConsoleSession(
                 project_id=project_id,
-                process=pty
+                process=pty,
+                session_id=session_id
             )
 
             # Добавляем pending callbacks
@@ -404,6 +457,7 @@ class ProcessManager:
                 del self.pending_console_callbacks[project_id]
 
             self.console_sessions[project_id] = session
+            self._publish("started", "console", project_id)
 
             # Запускаем чтение вывода
             session._read_task = asyncio.create_task(
@@ -416,21 +470,23 @@ class ProcessManager:
         """Чтение вывода консоли"""
         while session.running:
             try:
-                data = session.process.read(blocking=False)
-                if data:
-                    # Сохраняем в историю
-                    session.output_history += data
-                    if len(session.output_history) > session.MAX_HISTORY_SIZE:
-                        session.output_history = session.output_history[-session.MAX_HISTORY_SIZE:]
-
-                    # Отправляем подписчикам (copy list to prevent modification during iteration)
-                    for callback in list(session.output_callbacks):
-                        try:
-                            await callback(data)
-                        except Exception:
-                            pass
-                else:
-                    await asyncio.sleep(0.05)
+                data = await session.process.read()
+                if not data:
+                    break
+
+                # Сохраняем в историю
+                session.output_history.append(data)
+                session.screen.feed(data)
+                recorder.record(session.session_id, data)
+
+                # Отправляем подписчикам (copy list to prevent modification during iteration)
+                for callback in list(session.output_callbacks):
+                    try:
+                        await callback(data)
+                    except Exception:
+                        pass
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 if session.running:
                     print(f"Error reading console: {e}")
@@ -452,7 +508,11 @@ class ProcessManager:
         session = self.console_sessions.get(project_id)
         if session and session.running:
             try:
+                changed = (cols, rows) != (session.process.cols, session.process.rows)
                 session.process.set_size(cols, rows)
+                session.screen.resize(cols, rows)
+                if changed:
+                    recorder.resize(session.session_id, cols, rows)
                 return True
             except Exception:
                 pass
@@ -502,7 +562,10 @@ class ProcessManager:
                 session.process.close()
             except Exception:
                 pass
+            recorder.end_session(session.session_id)
+            await end_session(session.session_id)
             del self.console_sessions[project_id]
+            self._publish("stopped", "console", project_id)
 
     async def stop_console(self, project_id: str) -> bool:
         """Остановка консоли проекта"""
@@ -521,7 +584,14 @@ class ProcessManager:
         """Получение истории консоли"""
         session = self.console_sessions.get(project_id)
         if session:
-            return session.output_history
+            return session.output_history.snapshot()
+        return ""
+
+    def get_console_snapshot(self, project_id: str) -> str:
+        """Снимок текущего экрана консоли"""
+        session = self.console_sessions.get(project_id)
+        if session:
+            return session.screen.snapshot()
         return ""
 
     # ==================== ZEUSOVICH METHODS ====================
@@ -534,14 +604,21 @@ class ProcessManager:
                 await self._stop_zeusovich_session()
 
             # Запускаем Claude CLI в base_path
-            cmd = f'cmd.exe /k "cd /d {base_path} && claude"'
+            if os.name == 'nt':
+                cmd = f'cmd.exe /k "cd /d {base_path} && claude"'
+            else:
+                cmd = 'claude; exec "${SHELL:-/bin/sh}" -i'
             print(f"[DEBUG] Zeusovich command: {cmd}")
 
-            pty = winpty.PTY(120, 30)
-            pty.spawn(cmd)
+            session_id = await create_session("zeusovich", "zeusovich", LLMType.CLAUDE_CODE.value)
+
+            pty = create_pty(120, 30)
+            recorder.resize(session_id, pty.cols, pty.rows)
+            pty.spawn(cmd, cwd=base_path)
 
             session = ZeusovichSession(
                 process=pty,
+                session_id=session_id,
                 started_project_ids=project_ids or set()
             )
 
@@ -551,6 +628,7 @@ class ProcessManager:
                 self.pending_zeusovich_callbacks = []
 
             self.zeusovich_session = session
+            self._publish("started", "zeusovich")
 
             # Запускаем чтение вывода
             session._read_task = asyncio.create_task(
@@ -563,21 +641,23 @@ class ProcessManager:
         """Чтение вывода Zeusovich"""
         while session.running:
             try:
-                data = session.process.read(blocking=False)
-                if data:
-                    # Сохраняем в историю
-                    session.output_history += data
-                    if len(session.output_history) > session.MAX_HISTORY_SIZE:
-                        session.output_history = session.output_history[-session.MAX_HISTORY_SIZE:]
-
-                    # Отправляем подписчикам (copy list to prevent modification during iteration)
-                    for callback in list(session.output_callbacks):
-                        try:
-                            await callback(data)
-                        except Exception:
-                            pass
-                else:
-                    await asyncio.sleep(0.05)
+                data = await session.process.read()
+                if not data:
+                    break
+
+                # Сохраняем в историю
+                session.output_history.append(data)
+                session.screen.feed(data)
+                recorder.record(session.session_id, data)
+
+                # Отправляем подписчикам (copy list to prevent modification during iteration)
+                for callback in list(session.output_callbacks):
+                    try:
+                        await callback(data)
+                    except Exception:
+                        pass
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 if session.running:
                     print(f"Error reading Zeusovich: {e}")
@@ -597,7 +677,11 @@ class ProcessManager:
         """Изменение размера терминала Zeusovich"""
         if self.zeusovich_session and self.zeusovich_session.running:
             try:
+                changed = (cols, rows) != (self.zeusovich_session.process.cols, self.zeusovich_session.process.rows)
                 self.zeusovich_session.process.set_size(cols, rows)
+                self.zeusovich_session.screen.resize(cols, rows)
+                if changed:
+                    recorder.resize(self.zeusovich_session.session_id, cols, rows)
                 return True
             except Exception:
                 pass
@@ -632,7 +716,10 @@ class ProcessManager:
                 self.zeusovich_session.process.close()
             except Exception:
                 pass
+            recorder.end_session(self.zeusovich_session.session_id)
+            await end_session(self.zeusovich_session.session_id)
             self.zeusovich_session = None
+            self._publish("stopped", "zeusovich")
 
     async def stop_zeusovich(self) -> bool:
         """Остановка Zeusovich"""
@@ -649,7 +736,13 @@ class ProcessManager:
     def get_zeusovich_history(self) -> str:
         """Получение истории Zeusovich"""
         if self.zeusovich_session:
-            return self.zeusovich_session.output_history
+            return self.zeusovich_session.output_history.snapshot()
+        return ""
+
+    def get_zeusovich_snapshot(self) -> str:
+        """Снимок текущего экрана Zeusovich"""
+        if self.zeusovich_session:
+            return self.zeusovich_session.screen.snapshot()
         return ""
 
     def get_zeusovich_started_projects(self) -> set[str]:
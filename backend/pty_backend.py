@@ -0,0 +1,241 @@
+"""
+PTY backend - общий интерфейс псевдотерминала для всех типов сессий.
+Windows: pywinpty + поток-читатель. POSIX: pty.fork + loop.add_reader.
+"""
+import asyncio
+import codecs
+import os
+import signal
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+if os.name == 'nt':
+    import winpty
+else:
+    import fcntl
+    import pty
+    import struct
+    import termios
+
+
+READ_SIZE = 65536
+
+
+class PTYBackend(ABC):
+    """
+    Псевдотерминал с чтением по готовности.
+    read() ждёт данные без таймера; пустая строка = процесс завершился.
+    """
+
+    def __init__(self, cols: int = 120, rows: int = 30):
+        self.cols = cols
+        self.rows = rows
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._eof = False
+
+    @abstractmethod
+    def spawn(self, command: str, cwd: Optional[str] = None) -> None:
+        """Запуск команды в PTY"""
+
+    @abstractmethod
+    def write(self, data: str) -> None:
+        """Отправка ввода в PTY"""
+
+    @abstractmethod
+    def set_size(self, cols: int, rows: int) -> None:
+        """Изменение размера терминала"""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Завершение процесса и освобождение PTY"""
+
+    async def read(self) -> str:
+        """Ожидание следующего куска вывода ('' при EOF)"""
+        if self._eof and self._queue.empty():
+            return ""
+        return await self._queue.get()
+
+    def _feed(self, data: str):
+        """Передача декодированного вывода читателю (вызывается в loop)"""
+        if data:
+            self._queue.put_nowait(data)
+
+    def _feed_eof(self):
+        """Сигнал о завершении вывода (вызывается в loop)"""
+        if not self._eof:
+            self._eof = True
+            self._queue.put_nowait("")
+
+
+class PosixPTY(PTYBackend):
+    """PTY на pty.fork; чтение через loop.add_reader, без опроса"""
+
+    def __init__(self, cols: int = 120, rows: int = 30):
+        super().__init__(cols, rows)
+        self.pid: Optional[int] = None
+        self.fd: Optional[int] = None
+        self._write_buffer = bytearray()
+        # Инкрементальный декодер: мультибайтовые символы могут быть разрезаны между read()
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def spawn(self, command: str, cwd: Optional[str] = None) -> None:
+        self._loop = asyncio.get_running_loop()
+        pid, fd = pty.fork()
+        if pid == 0:
+            # Дочерний процесс
+            try:
+                if cwd:
+                    os.chdir(cwd)
+                env = dict(os.environ, TERM="xterm-256color", COLUMNS=str(self.cols), LINES=str(self.rows))
+                os.execvpe("/bin/sh", ["/bin/sh", "-c", command], env)
+            finally:
+                os._exit(127)
+
+        self.pid = pid
+        self.fd = fd
+        os.set_blocking(fd, False)
+        self.set_size(self.cols, self.rows)
+        self._loop.add_reader(fd, self._on_readable)
+
+    def _on_readable(self):
+        """Callback готовности fd - читаем всё что есть"""
+        try:
+            raw = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            # EIO - slave сторона закрыта, процесс завершился
+            raw = b""
+
+        if not raw:
+            self._loop.remove_reader(self.fd)
+            self._feed(self._decoder.decode(b"", final=True))
+            self._feed_eof()
+            return
+
+        self._feed(self._decoder.decode(raw))
+
+    def write(self, data: str) -> None:
+        if self.fd is None:
+            raise OSError("PTY is not spawned")
+        pending = not self._write_buffer
+        self._write_buffer += data.encode("utf-8")
+        if pending:
+            self._on_writable()
+
+    def _on_writable(self):
+        """Дописываем буфер ввода; при переполнении PTY ждём готовности fd"""
+        try:
+            written = os.write(self.fd, self._write_buffer)
+        except BlockingIOError:
+            written = 0
+        except OSError:
+            self._write_buffer.clear()
+            written = 0
+        del self._write_buffer[:written]
+        if self._write_buffer:
+            self._loop.add_writer(self.fd, self._on_writable)
+        else:
+            self._loop.remove_writer(self.fd)
+
+    def set_size(self, cols: int, rows: int) -> None:
+        self.cols, self.rows = cols, rows
+        if self.fd is not None:
+            fcntl.ioctl(self.fd, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+
+    def close(self) -> None:
+        if self.fd is not None:
+            self._loop.remove_reader(self.fd)
+            self._loop.remove_writer(self.fd)
+            try:
+                os.close(self.fd)
+            except OSError:
+                pass
+            self.fd = None
+        if self.pid:
+            try:
+                os.kill(self.pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+            self._loop.call_later(1.0, self._reap, self.pid)
+            self.pid = None
+        self._feed_eof()
+
+    @staticmethod
+    def _reap(pid: int):
+        """Забираем статус дочернего процесса, чтобы не оставлять зомби"""
+        try:
+            if os.waitpid(pid, os.WNOHANG) == (0, 0):
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+
+class WinPTY(PTYBackend):
+    """
+    PTY на pywinpty. winpty не даёт fd для select, поэтому блокирующее
+    чтение идёт в отдельном потоке и передаётся в loop через call_soon_threadsafe.
+    """
+
+    def __init__(self, cols: int = 120, rows: int = 30):
+        super().__init__(cols, rows)
+        self._pty = winpty.PTY(cols, rows)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def spawn(self, command: str, cwd: Optional[str] = None) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._pty.spawn(command, cwd=cwd)
+        self._thread = threading.Thread(target=self._reader, daemon=True)
+        self._thread.start()
+
+    def _reader(self):
+        """Поток-читатель: блокируется в winpty до прихода данных"""
+        while not self._closed:
+            process = self._pty
+            if process is None:
+                break
+            try:
+                data = process.read(blocking=True)
+            except Exception:
+                break
+            if data:
+                self._loop.call_soon_threadsafe(self._feed, data)
+            elif not process.isalive():
+                break
+        try:
+            self._loop.call_soon_threadsafe(self._feed_eof)
+        except RuntimeError:
+            pass  # loop уже закрыт
+
+    def write(self, data: str) -> None:
+        if self._pty is None:
+            raise OSError("PTY is closed")
+        self._pty.write(data)
+
+    def set_size(self, cols: int, rows: int) -> None:
+        self.cols, self.rows = cols, rows
+        if self._pty is not None:
+            self._pty.set_size(cols, rows)
+
+    def close(self) -> None:
+        self._closed = True
+        if self._pty is not None:
+            try:
+                # Прерываем блокирующий read() в потоке-читателе
+                self._pty.cancel_io()
+            except Exception:
+                pass
+            # Процесс winpty завершается при освобождении объекта PTY
+            self._pty = None
+        self._feed_eof()
+
+
+def create_pty(cols: int = 120, rows: int = 30) -> PTYBackend:
+    """Создание PTY для текущей платформы"""
+    if os.name == 'nt':
+        return WinPTY(cols, rows)
+    return PosixPTY(cols, rows)
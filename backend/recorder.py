@@ -0,0 +1,319 @@
+"""
+Write-behind запись вывода терминалов в историю.
+Циклы чтения PTY отдают куски без await; отдельная задача сбрасывает
+их в БД по размеру, по времени и при завершении сессии.
+"""
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional, TextIO
+
+from .database import (
+    DB_PATH, get_segment_tail, queue_output_size, queue_resize, queue_search_text, queue_segment,
+    wait_for_writes
+)
+from .search import LineSplitter
+from .segments import OpenSegment
+
+
+class OutputRecorder:
+    """
+    Буферы вывода по сессиям + задача сброса.
+    Каждый сброс дописывает буфер в открытый сегмент сессии и перезаписывает
+    его в БД; заполненный сегмент закрывается и начинается следующий.
+    Память ограничена MAX_MEMORY (буферы + ещё не закоммиченное); если БД
+    отстаёт, новые куски дописываются в spill-файл и переносятся в БД позже.
+    """
+
+    FLUSH_SIZE = 32 * 1024  # Сессия с таким объёмом сбрасывается сразу
+    FLUSH_INTERVAL = 1.0  # Максимум, что теряется при падении
+    MAX_MEMORY = 8 * 1024 * 1024  # Символов в буферах и в очереди БД
+    REPLAY_BATCH = 1024 * 1024  # Перенос spill-файла порциями
+
+    def __init__(self, spill_path: Path):
+        self.spill_path = spill_path
+        self._buffers: dict[int, list[tuple[int, str]]] = {}  # (мс, кусок)
+        self._segments: dict[int, OpenSegment] = {}
+        # (seq, offset) следующего сегмента для живых сессий без открытого сегмента
+        self._positions: dict[int, tuple[int, int]] = {}
+        # Завершены во время spill - сегменты закрываются после переноса файла
+        self._ended: set[int] = set()
+        self._dirty: set[int] = set()  # Открытые сегменты, ещё не переданные в БД
+        self._splitter = LineSplitter()  # Куски для полнотекстового индекса
+        self._sizes: dict[int, int] = {}
+        self._buffered = 0  # Символов в буферах
+        self._submitted = 0  # Всего передано в очередь БД
+        self._committed = 0  # Из них подтверждено коммитом
+        self._spill: Optional[TextIO] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        # Счётчики
+        self.recorded = 0
+        self.spilled = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._submitted - self._committed
+
+    def start(self):
+        """Запуск задачи сброса (после init_db)"""
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Сброс всего накопленного (перед close_db)"""
+        if self._task:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    def record(self, session_id: int, data: str):
+        """Кусок вывода сессии (не блокирует)"""
+        if not data:
+            return
+        self.recorded += len(data)
+        at = int(time.time() * 1000)
+
+        # Пока есть spill-файл, пишем туда же - иначе нарушится порядок вывода
+        if self._spill is not None or self._buffered + self.in_flight + len(data) > self.MAX_MEMORY:
+            self._write_spill(session_id, at, data)
+            return
+
+        self._buffers.setdefault(session_id, []).append((at, data))
+        size = self._sizes.get(session_id, 0) + len(data)
+        self._sizes[session_id] = size
+        self._buffered += len(data)
+        if size >= self.FLUSH_SIZE:
+            self._wakeup.set()
+
+    def resize(self, session_id: int, width: int, height: int):
+        """Размер терминала сессии (начальный или изменённый) с текущего момента"""
+        queue_resize(session_id, int(time.time() * 1000), width, height)
+
+    def end_session(self, session_id: int):
+        """Сессия завершена - её буфер уходит в очередь БД сразу"""
+        chunks = self._buffers.pop(session_id, None)
+        size = self._sizes.pop(session_id, 0)
+        if chunks:
+            self._buffered -= size
+            self._submit(session_id, chunks)
+            self._wakeup.set()
+        if self._spill is not None:
+            # Хвост вывода ещё в spill-файле - сегмент закроется после переноса
+            self._ended.add(session_id)
+            return
+        self._close_session(session_id)
+
+    def _close_session(self, session_id: int, keep_position: bool = False):
+        """Открытый сегмент сессии - в очередь БД, недописанная строка - в индекс"""
+        segment = self._segments.pop(session_id, None)
+        if segment:
+            if session_id in self._dirty:
+                self._dirty.discard(session_id)
+                queue_segment(session_id, segment)
+            if keep_position:
+                self._positions[session_id] = (segment.seq + 1, segment.end_offset)
+        if not keep_position:
+            self._positions.pop(session_id, None)
+        self._index(session_id, self._splitter.finish(session_id))
+
+    def active_sessions(self) -> set[int]:
+        """Сессии, вывод которых ещё дописывается"""
+        return set(self._segments) | set(self._buffers) | self._ended
+
+    def stats(self) -> dict:
+        return {
+            "buffered": self._buffered,
+            "in_flight": self.in_flight,
+            "recorded": self.recorded,
+            "spilled": self.spilled,
+            "spilling": self._spill is not None,
+        }
+
+    def _submit(self, session_id: int, chunks: list[tuple[int, str]]):
+        """Куски - в открытый сегмент сессии; заполненный сегмент - сразу в очередь БД"""
+        segment = self._segments.get(session_id)
+        if segment is not None:
+            offset = segment.end_offset
+        else:
+            offset = self._positions.get(session_id, (0, 0))[1]
+        for at, data in chunks:
+            if segment is None:
+                seq, offset = self._positions.pop(session_id, (0, 0))
+                segment = OpenSegment(seq=seq, start_offset=offset, started_at=at)
+                self._segments[session_id] = segment
+            segment.append(at, data)
+            self._submitted += len(data)
+            if segment.full:
+                queue_segment(session_id, segment)
+                del self._segments[session_id]
+                self._positions[session_id] = (segment.seq + 1, segment.end_offset)
+                segment = None
+        if segment is not None:
+            self._dirty.add(session_id)
+        else:
+            self._dirty.discard(session_id)
+        text = "".join(data for _, data in chunks)
+        queue_output_size(session_id, len(text), len(chunks))
+        self._index(session_id, self._splitter.feed(session_id, offset, chunks[0][0], text))
+
+    @staticmethod
+    def _index(session_id: int, pieces: list[tuple[int, int, str]]):
+        for offset, at, text in pieces:
+            queue_search_text(session_id, offset, at, text)
+
+    def _queue_dirty(self):
+        """Изменённые открытые сегменты - в очередь БД (сжимаются целиком, поэтому раз на сброс)"""
+        for session_id in self._dirty:
+            queue_segment(session_id, self._segments[session_id])
+        self._dirty.clear()
+
+    async def _confirm(self):
+        """Ожидание коммита всего переданного"""
+        self._queue_dirty()
+        mark = self._submitted
+        try:
+            await wait_for_writes()
+        finally:
+            # При ошибке коммита записи уже потеряны - не держим их в лимите памяти
+            self._committed = mark
+
+    async def _run(self):
+        # Остаток spill-файла после падения
+        try:
+            await self._replay_spill(recover=True)
+        except Exception as e:
+            print(f"[Recorder] Spill replay failed: {e}")
+        while True:
+            if not self._closing:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+
+            try:
+                await self._flush()
+                if self._spill is not None or self._closing:
+                    await self._replay_spill()
+            except Exception as e:
+                print(f"[Recorder] Flush failed: {e}")
+
+            # Переданное во время последнего ожидания коммита тоже дожидаемся
+            if self._closing and not self._buffers and not self.in_flight:
+                break
+
+    async def _flush(self):
+        """Все буферы - в очередь БД, ждём групповой коммит"""
+        if self._buffers:
+            buffers = self._buffers
+            self._buffers = {}
+            self._sizes = {}
+            self._buffered = 0
+            for session_id, chunks in buffers.items():
+                self._submit(session_id, chunks)
+        if self.in_flight:
+            # Пока ждём коммит, новые куски копятся в буферах (до MAX_MEMORY)
+            await self._confirm()
+        if self._spill is not None:
+            self._spill.flush()
+
+    def _open_spill(self) -> TextIO:
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        return open(self.spill_path, "a", encoding="utf-8")
+
+    def _write_spill(self, session_id: int, at: int, data: str):
+        if self._spill is None:
+            self._spill = self._open_spill()
+            print(f"[Recorder] Database is lagging, spilling output to {self.spill_path}")
+            # Накопленное в памяти старше нового куска - туда же и перед ним
+            buffers = self._buffers
+            self._buffers = {}
+            self._sizes = {}
+            self._buffered = 0
+            for buffered_id, chunks in buffers.items():
+                for chunk_at, chunk in chunks:
+                    self._write_spill(buffered_id, chunk_at, chunk)
+        self._spill.write(json.dumps({"s": session_id, "t": at, "d": data}) + "\n")
+        self.spilled += len(data)
+
+    async def _replay_spill(self, recover: bool = False):
+        """
+        Перенос spill-файла в БД с сохранением порядка вывода.
+        Позиция в .replay после каждого коммита пишется в .offset - после
+        падения перенос продолжается с неё, а не с начала файла.
+        """
+        replay_path = self.spill_path.with_suffix(".replay")
+        offset_path = self.spill_path.with_suffix(".offset")
+        restored: set[int] = set()
+        while True:
+            # .replay остаётся только после падения - он старше текущего spill-файла
+            if not replay_path.exists():
+                if self._spill is not None:
+                    self._spill.close()
+                    self._spill = None
+                if not self.spill_path.exists():
+                    break
+                offset_path.unlink(missing_ok=True)
+                os.replace(self.spill_path, replay_path)
+
+            # Пока переносим, новые куски пишутся в новый spill-файл
+            if self._spill is None:
+                self._spill = self._open_spill()
+            restored |= await self._replay_file(replay_path, offset_path)
+            replay_path.unlink()
+            offset_path.unlink(missing_ok=True)
+
+            if self._spill.tell() == 0:
+                # За время переноса ничего не пришло - возвращаемся к буферам в памяти
+                self._spill.close()
+                self._spill = None
+                self.spill_path.unlink(missing_ok=True)
+                break
+
+        # Вывод завершённых сессий перенесён целиком - закрываем их сегменты
+        for session_id in self._ended:
+            self._close_session(session_id)
+        self._ended.clear()
+        if recover:
+            # Сессии до падения уже не пишутся (позиция - на случай, если сессия всё же живая)
+            for session_id in restored - set(self._buffers):
+                self._close_session(session_id, keep_position=True)
+
+    async def _replay_file(self, path: Path, offset_path: Path) -> set[int]:
+        """Перенос одного файла; возвращает сессии, продолженные с позиции из БД"""
+        restored = set()
+        pending = 0
+        try:
+            position = int(offset_path.read_text())
+        except (OSError, ValueError):
+            position = 0
+        with open(path, "rb") as f:
+            f.seek(position)
+            for line in f:
+                position += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Недописанная строка после падения
+                session_id = entry["s"]
+                if session_id not in self._segments and session_id not in self._positions:
+                    # Сессия до падения - продолжаем после её последнего сегмента
+                    self._positions[session_id] = await get_segment_tail(session_id)
+                    restored.add(session_id)
+                self._submit(session_id, [(entry.get("t") or int(time.time() * 1000), entry["d"])])
+                pending += len(entry["d"])
+                if pending >= self.REPLAY_BATCH:
+                    await self._confirm()
+                    offset_path.write_text(str(position))
+                    pending = 0
+        await self._confirm()
+        return restored
+
+
+# Глобальный экземпляр
+recorder = OutputRecorder(DB_PATH.parent / "recorder-spill.jsonl")
@@ -0,0 +1,86 @@
+"""
+Воспроизведение сохранённого вывода сессии.
+Читает сегменты порциями прямо из БД (память не зависит от длины сессии),
+перематывает по смещению или времени через строки terminal_segments
+и отметки кусков внутри сегмента, выдерживает исходные паузы с ускорением.
+"""
+import asyncio
+from typing import AsyncIterator, Optional
+
+from .database import find_segment_by_offset, find_segment_by_time, iter_session_segments
+
+SEGMENT_BATCH = 2  # Сегментов (~64KB каждый) в памяти за раз
+INSTANT_CHUNK = 32 * 1024  # Склейка кусков при выдаче без пауз
+
+
+async def iter_chunks(
+    session_id: int, offset: Optional[int] = None, at: Optional[int] = None
+) -> AsyncIterator[tuple[int, int, str]]:
+    """
+    (мс unix, смещение, текст) кусков вывода по порядку, начиная с offset
+    (символ вывода сессии) или at (мс). При перемотке поток начинается с середины -
+    состояние терминала (цвета, экран) до этой точки не восстанавливается.
+    """
+    if offset is not None:
+        from_seq = await find_segment_by_offset(session_id, offset)
+    elif at is not None:
+        from_seq = await find_segment_by_time(session_id, at)
+    else:
+        from_seq = 0
+    if from_seq is None:
+        return
+
+    async for segment in iter_session_segments(session_id, from_seq, marks=True, batch=SEGMENT_BATCH):
+        text = segment["output"]
+        position = 0
+        for length, delta in segment["marks"]:
+            chunk_offset = segment["start_offset"] + position
+            chunk_at = segment["started_at"] + delta
+            chunk = text[position:position + length]
+            position += length
+            if offset is not None:
+                if chunk_offset + length <= offset:
+                    continue
+                if chunk_offset < offset:
+                    chunk = chunk[offset - chunk_offset:]
+                    chunk_offset = offset
+            elif at is not None and chunk_at < at:
+                continue
+            yield chunk_at, chunk_offset, chunk
+
+
+async def paced(
+    chunks: AsyncIterator[tuple[int, int, str]],
+    speed: Optional[float] = None,
+    max_idle: Optional[float] = None
+) -> AsyncIterator[tuple[int, int, str]]:
+    """
+    Куски с исходными паузами: speed=1 - реальное время, >1 - ускорение,
+    None - без пауз. max_idle - предел паузы в секундах.
+    """
+    previous = None
+    async for at, offset, text in chunks:
+        if speed is not None and previous is not None:
+            delay = max(0, at - previous) / 1000
+            if max_idle is not None:
+                delay = min(delay, max_idle)
+            if delay:
+                await asyncio.sleep(delay / speed)
+        previous = at
+        yield at, offset, text
+
+
+async def coalesced(chunks: AsyncIterator[tuple[int, int, str]]) -> AsyncIterator[tuple[int, int, str]]:
+    """Склейка мелких кусков до INSTANT_CHUNK (для выдачи без пауз)"""
+    pending: list[str] = []
+    pending_at, pending_offset, size = 0, 0, 0
+    async for at, offset, text in chunks:
+        if not pending:
+            pending_at, pending_offset = at, offset
+        pending.append(text)
+        size += len(text)
+        if size >= INSTANT_CHUNK:
+            yield pending_at, pending_offset, "".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield pending_at, pending_offset, "".join(pending)
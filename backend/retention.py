@@ -0,0 +1,134 @@
+"""
+Хранение истории: удаление сессий по политикам из GlobalSettings
+(возраст, объём, последние N) и возврат места через incremental vacuum.
+Работает небольшими порциями, чтобы не занимать запись надолго; партиция
+(partitions.py), все сессии которой истекли, удаляется вместе с файлом.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from .config import RetentionPolicy, load_settings
+from .database import (
+    delete_session_batch, drop_partition, get_free_pages, get_partition_sessions, get_session_sizes,
+    incremental_vacuum
+)
+from .process_manager import process_manager
+from .recorder import recorder
+
+
+def select_expired(sessions: list[dict], policy: RetentionPolicy, now: datetime) -> set[int]:
+    """id сессий, не проходящих политику (sessions - от новых к старым)"""
+    cutoff = None
+    if policy.max_age_days is not None:
+        # started_at - CURRENT_TIMESTAMP SQLite (UTC, 'YYYY-MM-DD HH:MM:SS')
+        cutoff = (now - timedelta(days=policy.max_age_days)).strftime("%Y-%m-%d %H:%M:%S")
+
+    expired = set()
+    total = 0
+    for index, session in enumerate(sessions):
+        total += session["bytes"]
+        if policy.keep_last_sessions is not None and index >= policy.keep_last_sessions:
+            expired.add(session["id"])
+        elif cutoff is not None and session["started_at"] < cutoff:
+            expired.add(session["id"])
+        elif policy.max_bytes is not None and total > policy.max_bytes:
+            expired.add(session["id"])
+    return expired
+
+
+class HistoryCompactor:
+    """Фоновая задача: применяет политики хранения раз в INTERVAL"""
+
+    INTERVAL = 600.0
+    BATCH = 50  # Строк из таблицы за одну транзакцию
+    VACUUM_PAGES = 256  # Страниц за один шаг incremental vacuum
+    PAUSE = 0.05  # Между порциями - даём пройти остальным записям
+
+    def __init__(self, active_sessions: Callable[[], set[int]]):
+        self._active_sessions = active_sessions
+        self._task: Optional[asyncio.Task] = None
+        # Счётчики
+        self.deleted_sessions = 0
+        self.dropped_partitions = 0
+        self.vacuumed_pages = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.INTERVAL)
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"[Retention] Compaction failed: {e}")
+
+    async def run_once(self) -> int:
+        """Один проход; возвращает число удалённых сессий"""
+        expired = await self.find_expired()
+        dropped = await self.drop_partitions(expired)
+        self.deleted_sessions += len(dropped)
+        for session_id in expired:
+            if session_id in dropped:
+                continue
+            while not await delete_session_batch(session_id, self.BATCH):
+                await asyncio.sleep(self.PAUSE)
+            self.deleted_sessions += 1
+        await self.vacuum()
+        if expired:
+            print(f"[Retention] Deleted {len(expired)} sessions")
+        return len(expired)
+
+    async def find_expired(self) -> list[int]:
+        settings = load_settings()
+        sessions = await get_session_sizes()
+        now = datetime.now(timezone.utc)
+
+        expired = select_expired(sessions, settings.retention, now)
+        for project_id, policy in settings.project_retention.items():
+            project_sessions = [s for s in sessions if s["project_id"] == project_id]
+            expired |= select_expired(project_sessions, policy, now)
+
+        # Идущие сессии не трогаем - их вывод ещё записывается (в том числе
+        # живые процессы без вывода или с только что закрытым сегментом)
+        expired -= self._active_sessions()
+        # Старые - первыми
+        order = {session["id"]: index for index, session in enumerate(sessions)}
+        return sorted(expired, key=order.__getitem__, reverse=True)
+
+    async def drop_partitions(self, expired: list[int]) -> set[int]:
+        """Удаление партиций, в которых истекли все сессии; возвращает id их сессий"""
+        expired_ids = set(expired)
+        dropped: set[int] = set()
+        for name, session_ids in (await get_partition_sessions()).items():
+            if session_ids <= expired_ids and await drop_partition(name, session_ids):
+                dropped |= session_ids
+                self.dropped_partitions += 1
+        return dropped
+
+    async def vacuum(self):
+        free = await get_free_pages()
+        while free:
+            await incremental_vacuum(self.VACUUM_PAGES)
+            left = await get_free_pages()
+            self.vacuumed_pages += free - left
+            if left >= free:
+                break  # Страницы держит читатель или WAL - вернёмся в следующий проход
+            free = left
+            await asyncio.sleep(self.PAUSE)
+
+
+# Глобальный экземпляр
+compactor = HistoryCompactor(
+    lambda: recorder.active_sessions() | process_manager.live_session_ids()
+)
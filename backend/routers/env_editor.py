@@ -7,6 +7,7 @@ from pathlib import Path
 from typing import Optional
 
 from ..config import load_project
+from ..io_pool import io_pool
 
 router = APIRouter()
 
@@ -49,18 +50,37 @@ def dict_to_env(data: dict[str, str]) -> str:
     return "\n".join(lines)
 
 
-@router.get("/{project_id}")
-async def get_env(project_id: str):
-    """Получение содержимого .env файла проекта"""
-    project = load_project(project_id)
+def read_env_file(env_path: Path) -> Optional[str]:
+    """Содержимое .env или None, если файла нет (блокирующее - через io_pool)"""
+    try:
+        return env_path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+
+def write_env_file(env_path: Path, content: str):
+    """Запись .env (блокирующее - через io_pool)"""
+    # Создаем директорию если не существует
+    env_path.parent.mkdir(parents=True, exist_ok=True)
+    env_path.write_text(content, encoding="utf-8")
+
+
+async def _env_path(project_id: str) -> Path:
+    project = await io_pool.run(load_project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
+    return Path(project.path) / project.env_file
+
 
-    env_path = Path(project.path) / project.env_file
-    if not env_path.exists():
+@router.get("/{project_id}")
+async def get_env(project_id: str):
+    """Получение содержимого .env файла проекта"""
+    env_path = await _env_path(project_id)
+    async with io_pool.lock(env_path):
+        content = await io_pool.run(read_env_file, env_path)
+    if content is None:
         return {"exists": False, "content": "", "variables": {}}
 
-    content = env_path.read_text(encoding="utf-8")
     variables = parse_env_file(content)
 
     # Маскируем значения с ключевыми словами
@@ -83,41 +103,28 @@ async def get_env(project_id: str):
 @router.put("/{project_id}")
 async def update_env(project_id: str, data: EnvUpdate):
     """Обновление всего .env файла"""
-    project = load_project(project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-
-    env_path = Path(project.path) / project.env_file
-
-    # Создаем директорию если не существует
-    env_path.parent.mkdir(parents=True, exist_ok=True)
-
-    env_path.write_text(data.content, encoding="utf-8")
+    env_path = await _env_path(project_id)
+    async with io_pool.lock(env_path):
+        await io_pool.run(write_env_file, env_path, data.content)
     return {"status": "ok", "path": str(env_path)}
 
 
 @router.put("/{project_id}/var")
 async def update_env_var(project_id: str, data: EnvVarUpdate):
     """Обновление отдельной переменной в .env"""
-    project = load_project(project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    env_path = await _env_path(project_id)
 
-    env_path = Path(project.path) / project.env_file
+    # Чтение и запись под одной блокировкой - параллельные правки не теряются
+    async with io_pool.lock(env_path):
+        # Читаем существующий файл или создаем пустой
+        content = await io_pool.run(read_env_file, env_path)
+        variables = parse_env_file(content) if content is not None else {}
 
-    # Читаем существующий файл или создаем пустой
-    if env_path.exists():
-        content = env_path.read_text(encoding="utf-8")
-        variables = parse_env_file(content)
-    else:
-        variables = {}
+        # Обновляем переменную
+        variables[data.key] = data.value
 
-    # Обновляем переменную
-    variables[data.key] = data.value
-
-    # Записываем обратно
-    env_path.parent.mkdir(parents=True, exist_ok=True)
-    env_path.write_text(dict_to_env(variables), encoding="utf-8")
+        # Записываем обратно
+        await io_pool.run(write_env_file, env_path, dict_to_env(variables))
 
     return {"status": "ok", "key": data.key}
 
@@ -125,21 +132,18 @@ async def update_env_var(project_id: str, data: EnvVarUpdate):
 @router.delete("/{project_id}/var/{key}")
 async def delete_env_var(project_id: str, key: str):
     """Удаление переменной из .env"""
-    project = load_project(project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    env_path = await _env_path(project_id)
 
-    env_path = Path(project.path) / project.env_file
-    if not env_path.exists():
-        raise HTTPException(status_code=404, detail=".env file not found")
+    async with io_pool.lock(env_path):
+        content = await io_pool.run(read_env_file, env_path)
+        if content is None:
+            raise HTTPException(status_code=404, detail=".env file not found")
 
-    content = env_path.read_text(encoding="utf-8")
-    variables = parse_env_file(content)
-
-    if key not in variables:
-        raise HTTPException(status_code=404, detail="Variable not found")
+        variables = parse_env_file(content)
+        if key not in variables:
+            raise HTTPException(status_code=404, detail="Variable not found")
 
-    del variables[key]
-    env_path.write_text(dict_to_env(variables), encoding="utf-8")
+        del variables[key]
+        await io_pool.run(write_env_file, env_path, dict_to_env(variables))
 
     return {"status": "ok", "key": key}
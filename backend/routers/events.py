@@ -0,0 +1,24 @@
+"""
+Server-Sent Events - статусы всех сессий (снимок при подключении, затем дельты)
+"""
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+
+from ..events import SSE_HEADERS, sse_stream
+from ..process_manager import process_manager
+
+router = APIRouter()
+
+
+def _snapshot() -> dict:
+    return {"type": "snapshot", "sessions": process_manager.status_snapshot()}
+
+
+@router.get("")
+async def status_events():
+    """Поток событий started/stopped/typing/idle/attention"""
+    return StreamingResponse(
+        sse_stream(process_manager.events, _snapshot),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
@@ -0,0 +1,37 @@
+"""
+Изменения файлов запущенных проектов: список за сессию и поток SSE
+"""
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from ..events import SSE_HEADERS, sse_stream
+from ..file_watch import file_watcher
+
+router = APIRouter()
+
+
+@router.get("/events")
+async def file_events(project_id: Optional[str] = None):
+    """Снимок изменённых за сессию файлов, затем пачки изменений (всех проектов или одного)"""
+    def snapshot() -> dict:
+        return {"type": "snapshot", "projects": file_watcher.snapshot(project_id)}
+
+    def accept(event: dict) -> bool:
+        return not project_id or event["project_id"] == project_id
+
+    return StreamingResponse(
+        sse_stream(file_watcher.events, snapshot, accept),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+@router.get("/{project_id}/session")
+async def session_files(project_id: str, session_id: Optional[int] = None):
+    """Файлы, изменённые за текущую (или последнюю) сессию проекта"""
+    watcher = file_watcher.get(project_id)
+    if watcher is None or (session_id is not None and watcher.session_id != session_id):
+        raise HTTPException(status_code=404, detail="No file changes recorded for this session")
+    return watcher.snapshot()
@@ -0,0 +1,176 @@
+"""
+API роутер для истории сессий
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from ..asciicast import (
+    archive_name, file_name, gzipped, iter_asciicast, iter_project_sessions, iter_zip
+)
+from ..database import (
+    get_history_size, get_output_page, get_project_daily_stats, get_project_stats,
+    get_session, get_stats, list_sessions, search_history
+)
+from ..replay import coalesced, iter_chunks, paced
+
+router = APIRouter()
+
+
+def _ms(value: Optional[datetime]) -> Optional[int]:
+    return int(value.timestamp() * 1000) if value else None
+
+
+@router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1),
+    project_id: Optional[str] = None,
+    kind: Optional[Literal["output", "message"]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """Полнотекстовый поиск по выводу терминалов и сообщениям"""
+    try:
+        return await search_history(
+            q, project_id=project_id, since=_ms(since), until=_ms(until),
+            kind=kind, limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/size")
+async def history_size():
+    """Размер БД истории: файл, свободное место, объём по проектам"""
+    return await get_history_size()
+
+
+@router.get("/sessions")
+async def sessions(
+    project_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None
+):
+    """Сессии от новых к старым (все или проекта); cursor - next_cursor предыдущей страницы"""
+    try:
+        return await list_sessions(project_id=project_id, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/sessions/{session_id}")
+async def session_detail(session_id: int):
+    """Сессия с итогами (длительность, объём вывода, время typing/idle)"""
+    session = await get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+@router.get("/sessions/{session_id}/output")
+async def session_output(
+    session_id: int,
+    limit: int = Query(4, ge=1, le=16),
+    cursor: Optional[str] = None
+):
+    """Вывод сессии постранично - по limit сегментов (~64KB каждый)"""
+    if not await get_session(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    try:
+        return await get_output_page(session_id, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/stats")
+async def stats():
+    """Общая статистика истории"""
+    return await get_stats()
+
+
+@router.get("/stats/projects")
+async def projects_stats():
+    """Итоги по проектам: сессии, сообщения, объём и куски вывода, время typing/idle"""
+    return await get_project_stats()
+
+
+@router.get("/stats/projects/{project_id}")
+async def project_stats(project_id: str, days: int = Query(30, ge=1, le=3660)):
+    """Итоги проекта и дневные агрегаты за последние days дней"""
+    since = datetime.now(timezone.utc) - timedelta(days=days - 1)
+    return await get_project_daily_stats(project_id, since.strftime("%Y-%m-%d"))
+
+
+@router.get("/sessions/{session_id}/replay")
+async def replay_session(
+    session_id: int,
+    offset: Optional[int] = Query(None, ge=0),
+    at: Optional[datetime] = None,
+    speed: Optional[float] = Query(None, gt=0),
+    max_idle: Optional[float] = Query(None, gt=0),
+    format: Literal["raw", "ndjson"] = "raw"
+):
+    """
+    Потоковое воспроизведение вывода сессии.
+    offset (символ вывода, например ref из поиска) или at - откуда начать;
+    speed - 1 реальное время, 4 ускорение в 4 раза, без speed - сразу всё;
+    format=ndjson - строки {"t": мс, "o": смещение, "d": текст}.
+    """
+    if not await get_session(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    chunks = iter_chunks(session_id, offset=offset, at=_ms(at))
+    if speed is not None:
+        chunks = paced(chunks, speed, max_idle)
+    elif format == "raw":
+        chunks = coalesced(chunks)
+
+    async def stream():
+        async for chunk_at, chunk_offset, text in chunks:
+            if format == "ndjson":
+                yield json.dumps({"t": chunk_at, "o": chunk_offset, "d": text}) + "\n"
+            else:
+                yield text
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson" if format == "ndjson" else "text/plain; charset=utf-8",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/sessions/{session_id}/asciicast")
+async def export_session(session_id: int, gzip: bool = False):
+    """Сессия в формате asciicast v2 (.cast, с gzip=true - .cast.gz)"""
+    session = await get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    lines = iter_asciicast(session)
+    name = file_name(session)
+    if gzip:
+        return StreamingResponse(
+            gzipped(lines),
+            media_type="application/gzip",
+            headers={"Content-Disposition": f'attachment; filename="{name}.gz"'}
+        )
+    return StreamingResponse(
+        lines,
+        media_type="application/x-asciicast",
+        headers={"Content-Disposition": f'attachment; filename="{name}"'}
+    )
+
+
+@router.get("/projects/{project_id}/asciicast")
+async def export_project(project_id: str):
+    """Все сессии проекта: ZIP с файлом .cast на сессию"""
+    return StreamingResponse(
+        iter_zip(iter_project_sessions(project_id)),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{archive_name(project_id)}"'}
+    )
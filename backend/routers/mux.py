@@ -0,0 +1,289 @@
+"""
+Мультиплексированный WebSocket - одно соединение на вкладку браузера.
+Каналы project:<id>, console:<id> и zeusovich подключаются подпиской:
+смена проекта - это unsubscribe/subscribe без нового handshake.
+
+Управляющие сообщения - JSON с полем channel.
+Бинарный подпротокол: заголовок 3 байта (тип кадра + id канала uint16 BE),
+id канала сервер выдаёт в ответе subscribed.
+"""
+import struct
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from ..config import load_project
+from ..process_manager import process_manager
+from ..ws_client import (
+    BINARY_FRAMES,
+    FRAME_INPUT,
+    ClientConnection,
+    accept_websocket,
+    receive_raw,
+)
+from .zeusovich import start_zeusovich
+
+router = APIRouter()
+
+FRAME_HEADER = struct.Struct(">BH")  # тип кадра, id канала
+
+
+async def _start_project(project_id: str):
+    project = load_project(project_id)
+    if project:
+        await process_manager.start_process(project)
+
+
+async def _start_console(project_id: str):
+    project = load_project(project_id)
+    if project:
+        await process_manager.start_console(project_id, project.path)
+
+
+@dataclass(frozen=True)
+class ChannelKind:
+    """Операции над сессией канала (key - id проекта, для zeusovich пустой)"""
+    is_running: Callable[[str], bool]
+    snapshot: Callable[[str], str]
+    write: Callable[[str, str], Awaitable[bool]]
+    resize: Callable[[str, int, int], Awaitable[bool]]
+    start: Callable[[str], Awaitable[None]]
+    stop: Callable[[str], Awaitable[bool]]
+    add_output: Callable[[str, Callable], None]
+    remove_output: Callable[[str, Callable], None]
+    needs_project: bool = True
+
+
+CHANNEL_KINDS: dict[str, ChannelKind] = {
+    "project": ChannelKind(
+        is_running=process_manager.is_running,
+        snapshot=process_manager.get_output_snapshot,
+        write=process_manager.write_to_process,
+        resize=process_manager.resize_terminal,
+        start=_start_project,
+        stop=process_manager.stop_process,
+        add_output=process_manager.add_output_callback,
+        remove_output=process_manager.remove_output_callback,
+    ),
+    "console": ChannelKind(
+        is_running=process_manager.is_console_running,
+        snapshot=process_manager.get_console_snapshot,
+        write=process_manager.write_to_console,
+        resize=process_manager.resize_console,
+        start=_start_console,
+        stop=process_manager.stop_console,
+        add_output=process_manager.add_console_callback,
+        remove_output=process_manager.remove_console_callback,
+    ),
+    "zeusovich": ChannelKind(
+        is_running=lambda key: process_manager.is_zeusovich_running(),
+        snapshot=lambda key: process_manager.get_zeusovich_snapshot(),
+        write=lambda key, data: process_manager.write_to_zeusovich(data),
+        resize=lambda key, cols, rows: process_manager.resize_zeusovich(cols, rows),
+        start=lambda key: start_zeusovich(),
+        stop=lambda key: process_manager.stop_zeusovich(),
+        add_output=lambda key, callback: process_manager.add_zeusovich_callback(callback),
+        remove_output=lambda key, callback: process_manager.remove_zeusovich_callback(callback),
+        needs_project=False,
+    ),
+}
+
+
+@dataclass
+class Subscription:
+    """Подписка соединения на канал"""
+    channel: str
+    id: int
+    kind: ChannelKind
+    key: str
+    output_callback: Optional[Callable] = None
+    status_callback: Optional[Callable] = None
+
+
+class MuxClient(ClientConnection):
+    """Соединение с набором подписок; кадры вывода помечаются каналом"""
+
+    def __init__(self, websocket: WebSocket, binary: bool):
+        super().__init__(websocket, "mux", resync=self._snapshots, binary=binary)
+        self.subscriptions: dict[str, Subscription] = {}
+        self.by_id: dict[int, Subscription] = {}
+        self._next_id = 0
+
+    def _snapshots(self) -> list[dict]:
+        """Пересинхронизация: снимки экрана всех подписанных каналов"""
+        return [
+            {"type": "history", "channel": sub.channel, "data": sub.kind.snapshot(sub.key)}
+            for sub in self.subscriptions.values()
+        ]
+
+    async def _send(self, message: dict):
+        sub = self.subscriptions.get(message.get("channel"))
+        frame = BINARY_FRAMES.get(message["type"]) if self.binary and sub else None
+        if frame is None:
+            await self.websocket.send_json(message)
+            return
+        await self.websocket.send_bytes(
+            FRAME_HEADER.pack(frame, sub.id) + message["data"].encode("utf-8")
+        )
+
+    def error(self, channel: Optional[str], message: str):
+        self.send_json({"type": "error", "channel": channel, "message": message})
+
+    async def subscribe(self, channel: str, cols: Optional[int] = None, rows: Optional[int] = None):
+        """Подписка на канал: статус + снимок экрана в размере клиента"""
+        if channel in self.subscriptions:
+            return
+        name, _, key = channel.partition(":")
+        kind = CHANNEL_KINDS.get(name)
+        if not kind or bool(key) != kind.needs_project:
+            self.error(channel, "Unknown channel")
+            return
+        project = load_project(key) if kind.needs_project else None
+        if kind.needs_project and not project:
+            self.error(channel, "Project not found")
+            return
+
+        # id не переиспользуются, пока не переполнится uint16 -
+        # запоздавшие кадры старой подписки не попадут в новую
+        self._next_id = self._next_id % 0xFFFF + 1
+        sub = Subscription(channel=channel, id=self._next_id, kind=kind, key=key)
+        self.subscriptions[channel] = sub
+        self.by_id[sub.id] = sub
+        self.send_json({"type": "subscribed", "channel": channel, "id": sub.id})
+
+        async def send_output(data: str):
+            self.send_output(data, channel)
+
+        sub.output_callback = send_output
+        kind.add_output(key, send_output)
+
+        if name == "project":
+            async def send_status(status: str):
+                self.send_json({"type": "llm_status", "channel": channel, "status": status})
+
+            sub.status_callback = send_status
+            process_manager.add_status_callback(key, send_status)
+
+        is_running = kind.is_running(key)
+        status = {"type": "status", "channel": channel, "running": is_running}
+        if name == "project":
+            status["project"] = project.model_dump()
+        self.send_json(status)
+
+        if is_running:
+            if cols and rows and cols > 0 and rows > 0:
+                await kind.resize(key, cols, rows)
+            history = kind.snapshot(key)
+            if history:
+                self.send_json({"type": "history", "channel": channel, "data": history})
+
+    def unsubscribe(self, channel: str):
+        """Отписка от канала"""
+        sub = self.subscriptions.pop(channel, None)
+        if not sub:
+            return
+        self.by_id.pop(sub.id, None)
+        if sub.output_callback:
+            sub.kind.remove_output(sub.key, sub.output_callback)
+        if sub.status_callback:
+            process_manager.remove_status_callback(sub.key, sub.status_callback)
+
+    async def close(self):
+        for channel in list(self.subscriptions):
+            self.unsubscribe(channel)
+        await super().close()
+
+    def parse(self, message) -> Optional[dict]:
+        """Бинарный кадр ввода -> сообщение input с именем канала"""
+        if isinstance(message, dict):
+            return message
+        if not isinstance(message, bytes):
+            raise ValueError("Message must be a JSON object")
+        if len(message) < FRAME_HEADER.size:
+            raise ValueError("Frame too short")
+        frame, channel_id = FRAME_HEADER.unpack_from(message)
+        if frame != FRAME_INPUT:
+            raise ValueError(f"Unknown frame type: {frame:#04x}")
+        sub = self.by_id.get(channel_id)
+        if not sub:
+            return None  # Ввод в канал, от которого уже отписались
+        return {
+            "type": "input",
+            "channel": sub.channel,
+            "data": str(memoryview(message)[FRAME_HEADER.size:], "utf-8", "replace"),
+        }
+
+    async def handle(self, data: dict):
+        """Обработка сообщения клиента"""
+        msg_type = data["type"]
+        channel = data.get("channel")
+
+        if msg_type == "subscribe":
+            if not isinstance(channel, str):
+                self.error(None, "Invalid channel")
+                return
+            await self.subscribe(channel, data.get("cols"), data.get("rows"))
+            return
+        if msg_type == "unsubscribe":
+            self.unsubscribe(channel)
+            return
+
+        sub = self.subscriptions.get(channel)
+        if not sub:
+            self.error(channel, "Not subscribed")
+            return
+
+        if msg_type == "input":
+            await sub.kind.write(sub.key, data["data"])
+
+        elif msg_type == "resize":
+            await sub.kind.resize(sub.key, data["cols"], data["rows"])
+
+        elif msg_type == "start":
+            if not sub.kind.is_running(sub.key):
+                await sub.kind.start(sub.key)
+                self.send_json({"type": "status", "channel": channel, "running": True})
+
+        elif msg_type == "stop":
+            if sub.kind.is_running(sub.key):
+                await sub.kind.stop(sub.key)
+                self.send_json({"type": "status", "channel": channel, "running": False})
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["channels"] = list(self.subscriptions)
+        return stats
+
+
+@router.websocket("")
+async def mux_websocket(websocket: WebSocket):
+    """Один WebSocket для всех терминалов (подписки на каналы)"""
+    binary = await accept_websocket(websocket)
+    client = MuxClient(websocket, binary)
+    client.start()
+
+    try:
+        while True:
+            try:
+                data = client.parse(await receive_raw(websocket))
+            except (ValueError, TypeError) as e:
+                # Битый JSON или кадр - ошибка только этому сообщению
+                client.error(None, f"Invalid message: {e}")
+                continue
+            if not data:
+                continue
+            channel = data.get("channel")
+            try:
+                await client.handle(data)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                # Остальные каналы сокета продолжают работать
+                client.error(channel if isinstance(channel, str) else None, f"Invalid message: {e}")
+
+    except WebSocketDisconnect:
+        await client.close()
+    except Exception as e:
+        print(f"Mux WebSocket error: {e}")
+        await client.close()
@@ -5,97 +5,33 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from pathlib import Path
+import subprocess
 import uuid
-import re
 
 from ..config import (
-    ProjectConfig, WorkMode, LLMType,
+    ProjectConfig, WorkMode, LLMType, PROJECTS_DIR,
     load_all_projects, load_project, save_project, delete_project
 )
+from ..file_watch import file_watcher
+from ..git_info import git_cache
+from ..io_pool import io_pool
 from ..process_manager import process_manager
-from ..workspace import sync_zeusovich_workspace
+from ..workspace import workspace_sync
 
 
-def get_git_info(project_path: str) -> dict:
-    """Извлекает информацию о git репозитории из проекта"""
-    path = Path(project_path)
-    git_dir = path / ".git"
-
-    result = {
-        "has_git": False,
-        "remote_url": None,
-        "remote_name": None,
-        "web_url": None,
-        "branch": None
-    }
-
-    if not git_dir.exists():
-        return result
-
-    result["has_git"] = True
-
-    # Читаем текущую ветку
-    head_file = git_dir / "HEAD"
-    if head_file.exists():
-        try:
-            content = head_file.read_text().strip()
-            if content.startswith("ref: refs/heads/"):
-                result["branch"] = content.replace("ref: refs/heads/", "")
-        except:
-            pass
-
-    # Читаем remote URL из config
-    config_file = git_dir / "config"
-    if config_file.exists():
-        try:
-            content = config_file.read_text()
-            # Ищем секцию [remote "origin"]
-            remote_match = re.search(
-                r'\[remote\s+"(\w+)"\]\s*\n\s*url\s*=\s*(.+)',
-                content
-            )
-            if remote_match:
-                result["remote_name"] = remote_match.group(1)
-                remote_url = remote_match.group(2).strip()
-                result["remote_url"] = remote_url
-
-                # Конвертируем в web URL
-                result["web_url"] = convert_to_web_url(remote_url)
-        except:
-            pass
-
-    return result
-
-
-def convert_to_web_url(git_url: str) -> Optional[str]:
-    """Конвертирует git URL в web URL"""
-    if not git_url:
-        return None
-
-    # SSH формат: git@github.com:user/repo.git
-    ssh_match = re.match(r'git@([^:]+):(.+?)(?:\.git)?$', git_url)
-    if ssh_match:
-        host = ssh_match.group(1)
-        path = ssh_match.group(2)
-        return f"https://{host}/{path}"
+router = APIRouter()
 
-    # HTTPS формат: https://github.com/user/repo.git
-    https_match = re.match(r'https?://([^/]+)/(.+?)(?:\.git)?$', git_url)
-    if https_match:
-        host = https_match.group(1)
-        path = https_match.group(2)
-        return f"https://{host}/{path}"
 
-    # Git протокол: git://github.com/user/repo.git
-    git_match = re.match(r'git://([^/]+)/(.+?)(?:\.git)?$', git_url)
-    if git_match:
-        host = git_match.group(1)
-        path = git_match.group(2)
-        return f"https://{host}/{path}"
+def _project_lock(project_id: str):
+    """Блокировка конфига проекта (чтение-изменение-запись)"""
+    return io_pool.lock(PROJECTS_DIR / f"{project_id}.yaml")
 
-    return git_url
 
-router = APIRouter()
+async def _load_project(project_id: str) -> ProjectConfig:
+    project = await io_pool.run(load_project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
 
 
 class ProjectCreate(BaseModel):
@@ -128,13 +64,14 @@ class ModeChange(BaseModel):
 @router.get("/")
 async def list_projects():
     """Получение списка всех проектов"""
-    projects = load_all_projects()
+    projects = await io_pool.run(load_all_projects)
     result = []
     for p in projects:
         result.append({
             **p.model_dump(),
             "running": process_manager.is_running(p.id),
-            "git": get_git_info(p.path)
+            # Из кэша; обновление придёт событием "git" в /api/events
+            "git": git_cache.get(p.id, p.path)
         })
     return result
 
@@ -142,13 +79,11 @@ async def list_projects():
 @router.get("/{project_id}")
 async def get_project(project_id: str):
     """Получение проекта по ID"""
-    project = load_project(project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await _load_project(project_id)
     return {
         **project.model_dump(),
         "running": process_manager.is_running(project_id),
-        "git": get_git_info(project.path)
+        "git": await git_cache.fetch(project_id, project.path)
     }
 
 
@@ -167,10 +102,11 @@ async def create_project(data: ProjectCreate):
         use_global_api_key=data.use_global_api_key
     )
 
-    save_project(project)
+    async with _project_lock(project_id):
+        await io_pool.run(save_project, project)
 
     # Sync Zeusovich workspace to include new project
-    sync_zeusovich_workspace()
+    workspace_sync.request()
 
     return project.model_dump()
 
@@ -178,17 +114,19 @@ async def create_project(data: ProjectCreate):
 @router.put("/{project_id}")
 async def update_project(project_id: str, data: ProjectUpdate):
     """Обновление проекта"""
-    project = load_project(project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    async with _project_lock(project_id):
+        project = await _load_project(project_id)
 
-    # Обновляем только переданные поля
-    update_data = data.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        if value is not None:
-            setattr(project, key, value)
+        # Обновляем только переданные поля
+        update_data = data.model_dump(exclude_unset=True)
+        for key, value in update_data.items():
+            if value is not None:
+                setattr(project, key, value)
 
-    save_project(project)
+        await io_pool.run(save_project, project)
+
+    # Имя или папка могли измениться - ссылка в workspace тоже
+    workspace_sync.request()
     return project.model_dump()
 
 
@@ -199,11 +137,15 @@ async def remove_project(project_id: str):
     if process_manager.is_running(project_id):
         await process_manager.stop_process(project_id)
 
-    if not delete_project(project_id):
+    async with _project_lock(project_id):
+        deleted = await io_pool.run(delete_project, project_id)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Project not found")
+    git_cache.forget(project_id)
+    file_watcher.forget(project_id)
 
     # Sync Zeusovich workspace to remove old link
-    sync_zeusovich_workspace()
+    workspace_sync.request()
 
     return {"status": "deleted", "id": project_id}
 
@@ -211,12 +153,10 @@ async def remove_project(project_id: str):
 @router.post("/{project_id}/mode")
 async def change_mode(project_id: str, data: ModeChange):
     """Смена режима работы проекта"""
-    project = load_project(project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-
-    project.mode = data.mode
-    save_project(project)
+    async with _project_lock(project_id):
+        project = await _load_project(project_id)
+        project.mode = data.mode
+        await io_pool.run(save_project, project)
 
     return {"status": "ok", "mode": data.mode.value}
 
@@ -224,9 +164,7 @@ async def change_mode(project_id: str, data: ModeChange):
 @router.post("/{project_id}/start")
 async def start_project(project_id: str):
     """Запуск процесса проекта"""
-    project = load_project(project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await _load_project(project_id)
 
     if process_manager.is_running(project_id):
         raise HTTPException(status_code=400, detail="Process already running")
@@ -252,9 +190,7 @@ async def stop_project(project_id: str):
 @router.post("/{project_id}/restart")
 async def restart_project(project_id: str):
     """Перезапуск процесса проекта"""
-    project = load_project(project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await _load_project(project_id)
 
     if process_manager.is_running(project_id):
         await process_manager.stop_process(project_id)
@@ -276,17 +212,13 @@ async def list_running():
 @router.post("/{project_id}/open-folder")
 async def open_project_folder(project_id: str):
     """Открыть папку проекта в Explorer"""
-    import subprocess
-
-    project = load_project(project_id)
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await _load_project(project_id)
 
     path = Path(project.path)
-    if not path.exists():
+    if not await io_pool.run(path.exists):
         raise HTTPException(status_code=404, detail="Folder not found")
 
-    # Open in Windows Explorer
-    subprocess.Popen(f'explorer "{path}"', shell=True)
+    # Open in Windows Explorer (запуск shell тоже может подвиснуть - в пуле)
+    await io_pool.run(subprocess.Popen, f'explorer "{path}"', shell=True)
 
     return {"status": "ok", "path": str(path)}
@@ -6,9 +6,11 @@ from pydantic import BaseModel
 from typing import Optional
 
 from ..config import (
-    GlobalSettings, APIKeys, LLMType, WorkMode,
+    GlobalSettings, APIKeys, LLMType, WorkMode, RetentionPolicy, HistoryLayout, SETTINGS_FILE,
     load_settings, save_settings
 )
+from ..database import set_history_layout
+from ..io_pool import io_pool
 
 router = APIRouter()
 
@@ -18,6 +20,9 @@ class SettingsUpdate(BaseModel):
     base_projects_path: Optional[str] = None
     default_llm: Optional[LLMType] = None
     default_mode: Optional[WorkMode] = None
+    retention: Optional[RetentionPolicy] = None
+    project_retention: Optional[dict[str, RetentionPolicy]] = None
+    history_layout: Optional[HistoryLayout] = None
 
 
 class APIKeysUpdate(BaseModel):
@@ -30,7 +35,7 @@ class APIKeysUpdate(BaseModel):
 @router.get("/")
 async def get_settings():
     """Получение текущих настроек"""
-    settings = load_settings()
+    settings = await io_pool.run(load_settings)
     # Маскируем API ключи
     result = settings.model_dump()
     if result["api_keys"]["anthropic"]:
@@ -45,30 +50,34 @@ async def get_settings():
 @router.put("/")
 async def update_settings(data: SettingsUpdate):
     """Обновление настроек"""
-    settings = load_settings()
+    async with io_pool.lock(SETTINGS_FILE):
+        settings = await io_pool.run(load_settings)
 
-    update_data = data.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        if value is not None:
-            setattr(settings, key, value)
+        # Значения как модели (не dict) - вложенные политики хранения остаются RetentionPolicy
+        for key in data.model_fields_set:
+            value = getattr(data, key)
+            if value is not None:
+                setattr(settings, key, value)
 
-    save_settings(settings)
+        await io_pool.run(save_settings, settings)
+    set_history_layout(settings.history_layout)
     return {"status": "ok"}
 
 
 @router.put("/api-keys")
 async def update_api_keys(data: APIKeysUpdate):
     """Обновление API ключей"""
-    settings = load_settings()
+    async with io_pool.lock(SETTINGS_FILE):
+        settings = await io_pool.run(load_settings)
 
-    if data.anthropic is not None:
-        settings.api_keys.anthropic = data.anthropic
-    if data.openai is not None:
-        settings.api_keys.openai = data.openai
-    if data.google is not None:
-        settings.api_keys.google = data.google
+        if data.anthropic is not None:
+            settings.api_keys.anthropic = data.anthropic
+        if data.openai is not None:
+            settings.api_keys.openai = data.openai
+        if data.google is not None:
+            settings.api_keys.google = data.google
 
-    save_settings(settings)
+        await io_pool.run(save_settings, settings)
     return {"status": "ok"}
 
 
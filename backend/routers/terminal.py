@@ -7,35 +7,57 @@ from typing import Optional
 
 from ..process_manager import process_manager
 from ..config import load_project
+from ..ws_client import ClientConnection, accept_websocket, receive_message, client_stats
 
 router = APIRouter()
 
 
+def get_terminal_size(websocket: WebSocket) -> Optional[tuple[int, int]]:
+    """Размер терминала клиента из query (?cols=..&rows=..)"""
+    try:
+        cols = int(websocket.query_params["cols"])
+        rows = int(websocket.query_params["rows"])
+    except (KeyError, ValueError):
+        return None
+    if cols > 0 and rows > 0:
+        return cols, rows
+    return None
+
+
 class ConnectionManager:
     """Менеджер WebSocket соединений"""
 
     def __init__(self):
-        # project_id -> list of websockets
-        self.connections: dict[str, list[WebSocket]] = {}
+        # project_id -> list of clients
+        self.connections: dict[str, list[ClientConnection]] = {}
 
     async def connect(self, websocket: WebSocket, project_id: str):
         """Подключение нового клиента"""
-        await websocket.accept()
+        binary = await accept_websocket(websocket)
+
+        # У каждого клиента своя очередь; при переполнении - снимок экрана
+        client = ClientConnection(
+            websocket,
+            f"project:{project_id}",
+            resync=lambda: [{
+                "type": "history",
+                "data": process_manager.get_output_snapshot(project_id)
+            }],
+            binary=binary
+        )
+        client.start()
 
         if project_id not in self.connections:
             self.connections[project_id] = []
-        self.connections[project_id].append(websocket)
+        self.connections[project_id].append(client)
 
         # Регистрируем callback для получения вывода
         async def send_output(data: str):
-            await self.broadcast(project_id, {
-                "type": "output",
-                "data": data
-            })
+            self.broadcast_output(project_id, data)
 
         # Регистрируем callback для статуса (typing/idle)
         async def send_status(status: str):
-            await self.broadcast(project_id, {
+            self.broadcast(project_id, {
                 "type": "llm_status",
                 "status": status  # "typing" или "idle"
             })
@@ -43,33 +65,37 @@ class ConnectionManager:
         process_manager.add_output_callback(project_id, send_output)
         process_manager.add_status_callback(project_id, send_status)
 
-        return (send_output, send_status)
+        return client, (send_output, send_status)
 
-    def disconnect(self, websocket: WebSocket, project_id: str, callbacks):
+    async def disconnect(self, client: ClientConnection, project_id: str, callbacks):
         """Отключение клиента"""
         if project_id in self.connections:
-            if websocket in self.connections[project_id]:
-                self.connections[project_id].remove(websocket)
+            if client in self.connections[project_id]:
+                self.connections[project_id].remove(client)
             if not self.connections[project_id]:
                 del self.connections[project_id]
 
         output_cb, status_cb = callbacks
         process_manager.remove_output_callback(project_id, output_cb)
         process_manager.remove_status_callback(project_id, status_cb)
+        await client.close()
 
-    async def broadcast(self, project_id: str, message: dict):
-        """Отправка сообщения всем клиентам проекта"""
-        if project_id in self.connections:
-            disconnected = []
-            for ws in self.connections[project_id]:
-                try:
-                    await ws.send_json(message)
-                except Exception:
-                    disconnected.append(ws)
+    def _clients(self, project_id: str) -> list[ClientConnection]:
+        """Живые клиенты проекта (закрытые удаляются)"""
+        clients = self.connections.get(project_id, [])
+        if any(client.closed for client in clients):
+            clients[:] = [client for client in clients if not client.closed]
+        return clients
+
+    def broadcast(self, project_id: str, message: dict):
+        """Постановка сообщения в очереди всех клиентов проекта"""
+        for client in self._clients(project_id):
+            client.send_json(message)
 
-            # Удаляем отключенные соединения
-            for ws in disconnected:
-                self.connections[project_id].remove(ws)
+    def broadcast_output(self, project_id: str, data: str):
+        """Постановка вывода в очереди всех клиентов (склеивается при отправке)"""
+        for client in self._clients(project_id):
+            client.send_output(data)
 
 
 manager = ConnectionManager()
@@ -83,28 +109,31 @@ async def terminal_websocket(websocket: WebSocket, project_id: str):
         await websocket.close(code=4004, reason="Project not found")
         return
 
-    callbacks = await manager.connect(websocket, project_id)
+    client, callbacks = await manager.connect(websocket, project_id)
 
     # Отправляем начальный статус
     is_running = process_manager.is_running(project_id)
-    await websocket.send_json({
+    client.send_json({
         "type": "status",
         "running": is_running,
         "project": project.model_dump()
     })
 
-    # Если процесс запущен - отправляем историю
+    # Если процесс запущен - отправляем снимок экрана в размере клиента
     if is_running:
-        history = process_manager.get_output_history(project_id)
+        size = get_terminal_size(websocket)
+        if size:
+            await process_manager.resize_terminal(project_id, *size)
+        history = process_manager.get_output_snapshot(project_id)
         if history:
-            await websocket.send_json({
+            client.send_json({
                 "type": "history",
                 "data": history
             })
 
     try:
         while True:
-            data = await websocket.receive_json()
+            data = await receive_message(websocket)
 
             if data["type"] == "input":
                 # Ввод пользователя
@@ -128,7 +157,7 @@ async def terminal_websocket(websocket: WebSocket, project_id: str):
                     print(f"[DEBUG] Starting process...")
                     await process_manager.start_process(project)
                     print(f"[DEBUG] Process started!")
-                    await websocket.send_json({
+                    client.send_json({
                         "type": "status",
                         "running": True
                     })
@@ -137,16 +166,16 @@ async def terminal_websocket(websocket: WebSocket, project_id: str):
                 # Остановка процесса
                 if process_manager.is_running(project_id):
                     await process_manager.stop_process(project_id)
-                    await websocket.send_json({
+                    client.send_json({
                         "type": "status",
                         "running": False
                     })
 
     except WebSocketDisconnect:
-        manager.disconnect(websocket, project_id, callbacks)
+        await manager.disconnect(client, project_id, callbacks)
     except Exception as e:
         print(f"WebSocket error: {e}")
-        manager.disconnect(websocket, project_id, callbacks)
+        await manager.disconnect(client, project_id, callbacks)
 
 
 # ==================== CONSOLE WEBSOCKET ====================
@@ -155,42 +184,41 @@ class ConsoleConnectionManager:
     """Менеджер WebSocket для консолей"""
 
     def __init__(self):
-        self.connections: dict[str, list[WebSocket]] = {}
+        self.connections: dict[str, list[ClientConnection]] = {}
 
     async def connect(self, websocket: WebSocket, project_id: str):
-        await websocket.accept()
+        binary = await accept_websocket(websocket)
+
+        client = ClientConnection(
+            websocket,
+            f"console:{project_id}",
+            resync=lambda: [{
+                "type": "history",
+                "data": process_manager.get_console_snapshot(project_id)
+            }],
+            binary=binary
+        )
+        client.start()
 
         if project_id not in self.connections:
             self.connections[project_id] = []
-        self.connections[project_id].append(websocket)
+        self.connections[project_id].append(client)
 
         async def send_output(data: str):
-            await self.broadcast(project_id, {
-                "type": "output",
-                "data": data
-            })
+            for connected in self.connections.get(project_id, []):
+                connected.send_output(data)
 
         process_manager.add_console_callback(project_id, send_output)
-        return send_output
+        return client, send_output
 
-    def disconnect(self, websocket: WebSocket, project_id: str, callback):
+    async def disconnect(self, client: ClientConnection, project_id: str, callback):
         if project_id in self.connections:
-            if websocket in self.connections[project_id]:
-                self.connections[project_id].remove(websocket)
+            if client in self.connections[project_id]:
+                self.connections[project_id].remove(client)
             if not self.connections[project_id]:
                 del self.connections[project_id]
         process_manager.remove_console_callback(project_id, callback)
-
-    async def broadcast(self, project_id: str, message: dict):
-        if project_id in self.connections:
-            disconnected = []
-            for ws in self.connections[project_id]:
-                try:
-                    await ws.send_json(message)
-                except Exception:
-                    disconnected.append(ws)
-            for ws in disconnected:
-                self.connections[project_id].remove(ws)
+        await client.close()
 
 
 console_manager = ConsoleConnectionManager()
@@ -204,27 +232,30 @@ async def console_websocket(websocket: WebSocket, project_id: str):
         await websocket.close(code=4004, reason="Project not found")
         return
 
-    callback = await console_manager.connect(websocket, project_id)
+    client, callback = await console_manager.connect(websocket, project_id)
 
     # Отправляем статус
     is_running = process_manager.is_console_running(project_id)
-    await websocket.send_json({
+    client.send_json({
         "type": "status",
         "running": is_running
     })
 
-    # Если консоль уже запущена - отправляем историю
+    # Если консоль уже запущена - отправляем снимок экрана
     if is_running:
-        history = process_manager.get_console_history(project_id)
+        size = get_terminal_size(websocket)
+        if size:
+            await process_manager.resize_console(project_id, *size)
+        history = process_manager.get_console_snapshot(project_id)
         if history:
-            await websocket.send_json({
+            client.send_json({
                 "type": "history",
                 "data": history
             })
 
     try:
         while True:
-            data = await websocket.receive_json()
+            data = await receive_message(websocket)
 
             if data["type"] == "input":
                 await process_manager.write_to_console(project_id, data["data"])
@@ -239,7 +270,7 @@ async def console_websocket(websocket: WebSocket, project_id: str):
             elif data["type"] == "start":
                 if not process_manager.is_console_running(project_id):
                     await process_manager.start_console(project_id, project.path)
-                    await websocket.send_json({
+                    client.send_json({
                         "type": "status",
                         "running": True
                     })
@@ -247,13 +278,19 @@ async def console_websocket(websocket: WebSocket, project_id: str):
             elif data["type"] == "stop":
                 if process_manager.is_console_running(project_id):
                     await process_manager.stop_console(project_id)
-                    await websocket.send_json({
+                    client.send_json({
                         "type": "status",
                         "running": False
                     })
 
     except WebSocketDisconnect:
-        console_manager.disconnect(websocket, project_id, callback)
+        await console_manager.disconnect(client, project_id, callback)
     except Exception as e:
         print(f"Console WebSocket error: {e}")
-        console_manager.disconnect(websocket, project_id, callback)
+        await console_manager.disconnect(client, project_id, callback)
+
+
+@router.get("/stats")
+async def connection_stats():
+    """Очереди отправки WebSocket клиентов: глубина и выброшенные кадры"""
+    return {"clients": client_stats()}
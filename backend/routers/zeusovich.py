@@ -6,7 +6,9 @@ from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
 from ..config import load_all_projects
 from ..process_manager import process_manager
-from ..workspace import get_workspace_path
+from ..workspace import get_workspace_path, workspace_sync
+from ..ws_client import ClientConnection, accept_websocket, receive_message
+from .terminal import get_terminal_size
 
 router = APIRouter()
 
@@ -15,64 +17,83 @@ class ZeusovichConnectionManager:
     """Менеджер WebSocket для Zeusovich терминала"""
 
     def __init__(self):
-        self.connections: list[WebSocket] = []
+        self.connections: list[ClientConnection] = []
 
     async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.connections.append(websocket)
+        binary = await accept_websocket(websocket)
+
+        client = ClientConnection(
+            websocket,
+            "zeusovich",
+            resync=lambda: [{
+                "type": "history",
+                "data": process_manager.get_zeusovich_snapshot()
+            }],
+            binary=binary
+        )
+        client.start()
+        self.connections.append(client)
 
         async def send_output(data: str):
-            await self.broadcast({
-                "type": "output",
-                "data": data
-            })
+            for connected in self.connections:
+                connected.send_output(data)
 
         process_manager.add_zeusovich_callback(send_output)
-        return send_output
+        return client, send_output
 
-    def disconnect(self, websocket: WebSocket, callback):
-        if websocket in self.connections:
-            self.connections.remove(websocket)
+    async def disconnect(self, client: ClientConnection, callback):
+        if client in self.connections:
+            self.connections.remove(client)
         process_manager.remove_zeusovich_callback(callback)
-
-    async def broadcast(self, message: dict):
-        disconnected = []
-        for ws in self.connections:
-            try:
-                await ws.send_json(message)
-            except Exception:
-                disconnected.append(ws)
-        for ws in disconnected:
-            self.connections.remove(ws)
+        await client.close()
 
 
 manager = ZeusovichConnectionManager()
 
 
+async def start_zeusovich():
+    """Запуск Zeusovich в workspace с junction ссылками на проекты"""
+    workspace_path = get_workspace_path()
+
+    # Запоминаем текущие проекты
+    projects = load_all_projects()
+    project_ids = {p.id for p in projects}
+
+    # Ссылки должны быть на месте до запуска: пересканируем workspace -
+    # ссылку могли удалить, а папку проекта создать вне приложения
+    await workspace_sync.sync(projects, full=True)
+
+    # Запускаем Claude CLI
+    await process_manager.start_zeusovich(workspace_path, project_ids)
+
+
 @router.websocket("/terminal")
 async def zeusovich_terminal(websocket: WebSocket):
     """WebSocket endpoint для Zeusovich CLI терминала"""
-    callback = await manager.connect(websocket)
+    client, callback = await manager.connect(websocket)
 
     # Отправляем статус
     is_running = process_manager.is_zeusovich_running()
-    await websocket.send_json({
+    client.send_json({
         "type": "status",
         "running": is_running
     })
 
-    # Если уже запущен - отправляем историю
+    # Если уже запущен - отправляем снимок экрана
     if is_running:
-        history = process_manager.get_zeusovich_history()
+        size = get_terminal_size(websocket)
+        if size:
+            await process_manager.resize_zeusovich(*size)
+        history = process_manager.get_zeusovich_snapshot()
         if history:
-            await websocket.send_json({
+            client.send_json({
                 "type": "history",
                 "data": history
             })
 
     try:
         while True:
-            data = await websocket.receive_json()
+            data = await receive_message(websocket)
 
             if data["type"] == "input":
                 await process_manager.write_to_zeusovich(data["data"])
@@ -85,16 +106,8 @@ async def zeusovich_terminal(websocket: WebSocket):
 
             elif data["type"] == "start":
                 if not process_manager.is_zeusovich_running():
-                    # Используем workspace с junction ссылками
-                    workspace_path = get_workspace_path()
-
-                    # Запоминаем текущие проекты
-                    projects = load_all_projects()
-                    project_ids = {p.id for p in projects}
-
-                    # Запускаем Claude CLI
-                    await process_manager.start_zeusovich(workspace_path, project_ids)
-                    await websocket.send_json({
+                    await start_zeusovich()
+                    client.send_json({
                         "type": "status",
                         "running": True
                     })
@@ -102,16 +115,16 @@ async def zeusovich_terminal(websocket: WebSocket):
             elif data["type"] == "stop":
                 if process_manager.is_zeusovich_running():
                     await process_manager.stop_zeusovich()
-                    await websocket.send_json({
+                    client.send_json({
                         "type": "status",
                         "running": False
                     })
 
     except WebSocketDisconnect:
-        manager.disconnect(websocket, callback)
+        await manager.disconnect(client, callback)
     except Exception as e:
         print(f"Zeusovich WebSocket error: {e}")
-        manager.disconnect(websocket, callback)
+        await manager.disconnect(client, callback)
 
 
 @router.get("/status")
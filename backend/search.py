@@ -0,0 +1,100 @@
+"""
+Полнотекстовый поиск по истории (FTS5).
+Вывод терминала индексируется очищенным: без ANSI-последовательностей и
+без перерисовок через \\r (спиннеры, прогресс-бары), кусками по границам строк.
+"""
+import html
+import re
+from typing import Optional
+
+from .llm_state import ANSI_ESCAPE_REGEX
+
+# Маркеры совпадений в snippet() - управляющие символы не доживают до индекса
+MATCH_START = "\x01"
+MATCH_END = "\x02"
+
+_TOKEN_REGEX = re.compile(r"\w+", re.UNICODE)
+
+
+def plain_text(text: str) -> str:
+    """Текст, который видел пользователь: без escape-кодов, строка после последнего \\r"""
+    lines = []
+    for line in ANSI_ESCAPE_REGEX.sub("", text).split("\n"):
+        line = line.rstrip("\r")
+        line = line[line.rfind("\r") + 1:].rstrip()
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def fts_query(query: str) -> Optional[str]:
+    """
+    Запрос пользователя -> MATCH-выражение FTS5: все слова обязательны,
+    слово с * на конце ищется как префикс. Синтаксис FTS5 не пропускаем.
+    """
+    terms = []
+    for word in query.split():
+        tokens = _TOKEN_REGEX.findall(word)
+        terms.extend(f'"{token}"' for token in tokens)
+        if tokens and word.endswith("*"):
+            terms[-1] += "*"
+    return " ".join(terms) or None
+
+
+def render_snippet(snippet: str) -> str:
+    """HTML-безопасный сниппет с <mark> вокруг совпадений"""
+    return html.escape(snippet).replace(MATCH_START, "<mark>").replace(MATCH_END, "</mark>")
+
+
+class LineSplitter:
+    """
+    Режет поток вывода сессии на куски для индекса по концам строк,
+    чтобы слово не разрывалось между двумя сбросами.
+    Хвост без \n ждёт следующего куска (не дольше MAX_PENDING символов);
+    длинный вывод делится на куски до PIECE_SIZE - короткие документы
+    дают точные ссылки (ref) и быстрые сниппеты.
+    """
+
+    MAX_PENDING = 4096
+    PIECE_SIZE = 4096
+
+    def __init__(self):
+        # session_id -> (offset, мс, хвост)
+        self._pending: dict[int, tuple[int, int, str]] = {}
+
+    def feed(self, session_id: int, offset: int, at: int, text: str) -> list[tuple[int, int, str]]:
+        """[(offset, мс, очищенный текст)] готовых кусков"""
+        pending = self._pending.pop(session_id, None)
+        if pending:
+            offset, at, text = pending[0], pending[1], pending[2] + text
+        cut = text.rfind("\n") + 1
+        if not cut:
+            if len(text) < self.MAX_PENDING:
+                self._pending[session_id] = (offset, at, text)
+                return []
+            cut = len(text)
+        if cut < len(text):
+            self._pending[session_id] = (offset + cut, at, text[cut:])
+        return self._pieces(offset, at, text[:cut])
+
+    def finish(self, session_id: int) -> list[tuple[int, int, str]]:
+        """Остаток сессии"""
+        pending = self._pending.pop(session_id, None)
+        if pending:
+            return self._pieces(*pending)
+        return []
+
+    def _pieces(self, offset: int, at: int, text: str) -> list[tuple[int, int, str]]:
+        pieces = []
+        start = 0
+        while start < len(text):
+            end = start + self.PIECE_SIZE
+            if end < len(text):
+                newline = text.rfind("\n", start, end)
+                if newline >= start:
+                    end = newline + 1
+            plain = plain_text(text[start:end])
+            if plain:
+                pieces.append((offset + start, at, plain))
+            start = end
+        return pieces
@@ -0,0 +1,68 @@
+"""
+Сжатые сегменты вывода терминала.
+Вывод сессии хранится блоками ~64KB: текст сжат zlib, рядом - сжатые
+отметки времени кусков (длина, задержка в мс), по которым можно
+восстановить, когда какой фрагмент был выведен.
+"""
+import struct
+import zlib
+from dataclasses import dataclass, field
+
+CODEC = "zlib"
+SEGMENT_SIZE = 64 * 1024  # Символов текста в одном сегменте
+LEVEL = 6
+
+_MARK = struct.Struct("<II")  # (длина куска, мс от начала сегмента)
+
+
+@dataclass
+class OpenSegment:
+    """Дописываемый сегмент сессии (в БД перезаписывается при каждом сбросе)"""
+    seq: int
+    start_offset: int
+    started_at: int  # мс
+    ended_at: int = 0
+    parts: list[str] = field(default_factory=list)
+    marks: list[tuple[int, int]] = field(default_factory=list)
+    size: int = 0
+
+    @property
+    def end_offset(self) -> int:
+        return self.start_offset + self.size
+
+    @property
+    def full(self) -> bool:
+        return self.size >= SEGMENT_SIZE
+
+    def append(self, at: int, data: str):
+        self.parts.append(data)
+        self.marks.append((len(data), max(0, at - self.started_at)))
+        self.size += len(data)
+        self.ended_at = max(self.ended_at, at)
+
+    def encode(self) -> tuple[bytes, bytes]:
+        # Склеиваем части, чтобы при следующем сбросе не делать это снова
+        text = "".join(self.parts)
+        self.parts = [text]
+        return encode_text(text), encode_marks(self.marks)
+
+
+def encode_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8", "surrogatepass"), LEVEL)
+
+
+def decode_text(codec: str, data: bytes) -> str:
+    if codec != CODEC:
+        raise ValueError(f"Unknown segment codec: {codec}")
+    return zlib.decompress(data).decode("utf-8", "surrogatepass")
+
+
+def encode_marks(marks: list[tuple[int, int]]) -> bytes:
+    return zlib.compress(b"".join(_MARK.pack(*mark) for mark in marks), LEVEL)
+
+
+def decode_marks(codec: str, data: bytes) -> list[tuple[int, int]]:
+    """[(длина куска, мс от начала сегмента)]"""
+    if codec != CODEC:
+        raise ValueError(f"Unknown segment codec: {codec}")
+    return list(_MARK.iter_unpack(zlib.decompress(data)))
@@ -0,0 +1,63 @@
+"""
+Фоновый rollup дневной статистики.
+Итоги по проектам stats_projects поддерживаются триггерами при записи;
+здесь периодически пересчитываются строки stats_daily за дни, в которые
+могли измениться сессии (идущие сессии дописывают вывод и время).
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from .database import rollup_daily_stats
+
+
+def _day(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d")
+
+
+class StatsRollup:
+    """Пересчёт stats_daily раз в INTERVAL"""
+
+    INTERVAL = 300.0
+    LOOKBACK_DAYS = 2  # Сессия, начатая вчера, ещё может дописывать итоги
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._last_run: Optional[datetime] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Итоги закрытых при остановке сессий
+        try:
+            await self.run_once()
+        except Exception as e:
+            print(f"[Stats] Rollup failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.INTERVAL)
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"[Stats] Rollup failed: {e}")
+
+    async def run_once(self):
+        now = datetime.now(timezone.utc)
+        start = now - timedelta(days=self.LOOKBACK_DAYS)
+        if self._last_run and self._last_run < start:
+            start = self._last_run  # Процесс спал дольше LOOKBACK_DAYS
+        await rollup_daily_stats(_day(start), _day(now + timedelta(days=1)))
+        self._last_run = now
+
+
+# Глобальный экземпляр
+stats_rollup = StatsRollup()
@@ -0,0 +1,559 @@
+"""
+Headless VT100/xterm экран - текущее состояние терминала на сервере.
+Позволяет при подключении отдать компактный снимок экрана вместо
+полного лога вывода со всеми перерисовками.
+"""
+import re
+import unicodedata
+from collections import deque
+from typing import Optional
+
+from .llm_state import ANSI_PARTIAL_REGEX
+
+
+# Токены: CSI, OSC, DCS/PM/APC, ESC-последовательности и одиночные управляющие символы
+TOKEN_REGEX = re.compile(
+    r'\x1b\[([0-?]*)[ -/]*([@-~])'
+    r'|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)'
+    r'|\x1b[PX^_][^\x1b]*\x1b\\'
+    r'|\x1b[ -/]*([0-~])'
+    r'|([\x00-\x1f\x7f])'
+)
+
+# Режимы альтернативного экрана
+ALT_SCREEN_MODES = {'?47', '?1047', '?1049'}
+
+BLANK = ' '
+
+
+def _char_width(char: str) -> int:
+    """Ширина символа в ячейках (0 - комбинирующий, 2 - широкий)"""
+    if unicodedata.combining(char):
+        return 0
+    if unicodedata.east_asian_width(char) in ('W', 'F'):
+        return 2
+    return 1
+
+
+class _Buffer:
+    """Сетка ячеек: символы и атрибуты (строка SGR-параметров) построчно"""
+
+    def __init__(self, cols: int, rows: int):
+        self.chars = [[BLANK] * cols for _ in range(rows)]
+        self.attrs = [[''] * cols for _ in range(rows)]
+        self.x = 0
+        self.y = 0
+        self.saved = (0, 0, '')
+
+    def blank_row(self, cols: int, attr: str = '') -> tuple[list[str], list[str]]:
+        return [BLANK] * cols, [attr] * cols
+
+
+class VTScreen:
+    """
+    Эмулятор экрана: основной и альтернативный буферы, scrollback,
+    курсор, SGR-атрибуты, регион прокрутки.
+    """
+
+    SCROLLBACK_LINES = 1000
+    MAX_PENDING = 4096  # Ограничение на недописанную escape-последовательность
+
+    def __init__(self, cols: int = 120, rows: int = 30, scrollback: int = SCROLLBACK_LINES):
+        self.cols = cols
+        self.rows = rows
+        self.scrollback: deque[tuple[list[str], list[str]]] = deque(maxlen=scrollback)
+        self.main = _Buffer(cols, rows)
+        self.alt: Optional[_Buffer] = None
+        self.buf = self.main
+        self.attr = ''  # Текущие SGR-параметры, '' = по умолчанию
+        self._sgr: dict[str, str] = {}  # Группа атрибута -> параметр
+        self.top = 0
+        self.bottom = rows - 1
+        self.wrap_pending = False
+        self.autowrap = True
+        self.cursor_visible = True
+        self._pending = ''  # Незавершённая escape-последовательность
+
+    # ==================== ВВОД ====================
+
+    def feed(self, data: str):
+        """Обработка куска вывода PTY"""
+        if self._pending:
+            data = self._pending + data
+            self._pending = ''
+
+        # Незакрытый OSC/DCS длиннее лимита - не ждём конца, выводим как есть
+        partial = ANSI_PARTIAL_REGEX.search(data)
+        if partial and len(data) - partial.start() <= self.MAX_PENDING:
+            self._pending = data[partial.start():]
+            data = data[:partial.start()]
+
+        pos = 0
+        for match in TOKEN_REGEX.finditer(data):
+            if match.start() > pos:
+                self._print(data[pos:match.start()])
+            pos = match.end()
+
+            params, final, esc, ctrl = match.groups()
+            if ctrl is not None:
+                self._control(ctrl)
+            elif final is not None:
+                self._csi(params, final)
+            elif esc is not None:
+                self._esc(match.group(0))
+            # OSC/DCS (заголовок окна и т.п.) на экран не влияют
+
+        if pos < len(data):
+            self._print(data[pos:])
+
+    def _print(self, text: str):
+        """Вывод печатаемых символов с переносом строк"""
+        buf = self.buf
+        if text.isascii():
+            while text:
+                if self.wrap_pending:
+                    self._wrap()
+                room = self.cols - buf.x
+                part, text = text[:room], text[room:]
+                row, n = buf.y, len(part)
+                buf.chars[row][buf.x:buf.x + n] = part
+                buf.attrs[row][buf.x:buf.x + n] = [self.attr] * n
+                buf.x += n
+                if buf.x >= self.cols:
+                    buf.x = self.cols - 1
+                    self.wrap_pending = self.autowrap
+            return
+
+        for char in text:
+            width = _char_width(char)
+            if width == 0:
+                # Комбинирующий символ - приклеиваем к предыдущей ячейке
+                x = buf.x - 1 if buf.x > 0 and not self.wrap_pending else buf.x
+                if not buf.chars[buf.y][x] and x > 0:
+                    x -= 1
+                buf.chars[buf.y][x] += char
+                continue
+            if self.wrap_pending or buf.x + width > self.cols:
+                if self.autowrap:
+                    self._wrap()
+                else:
+                    buf.x = self.cols - width
+            buf.chars[buf.y][buf.x] = char
+            buf.attrs[buf.y][buf.x] = self.attr
+            if width == 2 and buf.x + 1 < self.cols:
+                buf.chars[buf.y][buf.x + 1] = ''  # Вторая половина широкого символа
+                buf.attrs[buf.y][buf.x + 1] = self.attr
+            buf.x += width
+            if buf.x >= self.cols:
+                buf.x = self.cols - 1
+                self.wrap_pending = self.autowrap
+
+    def _wrap(self):
+        self.wrap_pending = False
+        self.buf.x = 0
+        self._linefeed()
+
+    def _control(self, char: str):
+        buf = self.buf
+        if char == '\r':
+            buf.x = 0
+            self.wrap_pending = False
+        elif char in '\n\x0b\x0c':
+            self._linefeed()
+        elif char == '\x08':
+            if buf.x > 0:
+                buf.x -= 1
+            self.wrap_pending = False
+        elif char == '\t':
+            buf.x = min(self.cols - 1, (buf.x // 8 + 1) * 8)
+        # BEL, SO/SI и прочие символы игнорируем
+
+    def _linefeed(self):
+        buf = self.buf
+        if buf.y == self.bottom:
+            self._scroll_up(1)
+        elif buf.y < self.rows - 1:
+            buf.y += 1
+
+    def _reverse_index(self):
+        buf = self.buf
+        if buf.y == self.top:
+            self._scroll_down(1)
+        elif buf.y > 0:
+            buf.y -= 1
+
+    def _scroll_up(self, count: int):
+        """Прокрутка региона вверх; ушедшие строки основного экрана - в scrollback"""
+        if self.buf is self.main and self.top == 0:
+            for row in range(min(count, self.bottom + 1)):
+                self.scrollback.append((self.buf.chars[row], self.buf.attrs[row]))
+        self._delete_lines(self.top, count)
+
+    def _scroll_down(self, count: int):
+        self._insert_lines(self.top, count)
+
+    def _delete_lines(self, row: int, count: int):
+        """Удаление строк в регионе со сдвигом вверх (пустые - снизу)"""
+        buf = self.buf
+        count = min(count, self.bottom - row + 1)
+        del buf.chars[row:row + count]
+        del buf.attrs[row:row + count]
+        for _ in range(count):
+            blank_chars, blank_attrs = buf.blank_row(self.cols)
+            buf.chars.insert(self.bottom - count + 1, blank_chars)
+            buf.attrs.insert(self.bottom - count + 1, blank_attrs)
+
+    def _insert_lines(self, row: int, count: int):
+        """Вставка пустых строк в регионе со сдвигом вниз"""
+        buf = self.buf
+        count = min(count, self.bottom - row + 1)
+        del buf.chars[self.bottom - count + 1:self.bottom + 1]
+        del buf.attrs[self.bottom - count + 1:self.bottom + 1]
+        for _ in range(count):
+            blank_chars, blank_attrs = buf.blank_row(self.cols)
+            buf.chars.insert(row, blank_chars)
+            buf.attrs.insert(row, blank_attrs)
+
+    # ==================== ESC / CSI ====================
+
+    def _esc(self, sequence: str):
+        final = sequence[-1]
+        if len(sequence) > 2:
+            return  # Выбор кодировки (ESC ( B) и т.п.
+        buf = self.buf
+        if final == '7':
+            buf.saved = (buf.x, buf.y, self.attr)
+        elif final == '8':
+            self._restore_cursor()
+        elif final == 'D':
+            self._linefeed()
+        elif final == 'E':
+            buf.x = 0
+            self._linefeed()
+        elif final == 'M':
+            self._reverse_index()
+        elif final == 'c':
+            self.reset()
+
+    def _csi(self, params: str, final: str):
+        buf = self.buf
+        private = params.startswith('?')
+        if final == 'm':
+            if not private and '>' not in params:
+                self._set_sgr(params)
+            return
+        if final in 'hl':
+            self._set_modes(params, final == 'h')
+            return
+        if private or params.startswith(('>', '=')):
+            return
+
+        args = [int(p) if p.isdigit() else 0 for p in params.split(';')] if params else []
+        n = args[0] if args and args[0] > 0 else 1
+
+        if final != 'K' and final != 'J':
+            self.wrap_pending = False
+
+        if final == 'A':
+            buf.y = max(self.top if buf.y >= self.top else 0, buf.y - n)
+        elif final in 'Be':
+            buf.y = min(self.bottom if buf.y <= self.bottom else self.rows - 1, buf.y + n)
+        elif final in 'Ca':
+            buf.x = min(self.cols - 1, buf.x + n)
+        elif final == 'D':
+            buf.x = max(0, buf.x - n)
+        elif final == 'E':
+            buf.x = 0
+            buf.y = min(self.rows - 1, buf.y + n)
+        elif final == 'F':
+            buf.x = 0
+            buf.y = max(0, buf.y - n)
+        elif final in 'G`':
+            buf.x = min(self.cols - 1, n - 1)
+        elif final in 'Hf':
+            row = args[0] if args and args[0] > 0 else 1
+            col = args[1] if len(args) > 1 and args[1] > 0 else 1
+            buf.y = min(self.rows - 1, row - 1)
+            buf.x = min(self.cols - 1, col - 1)
+        elif final == 'd':
+            buf.y = min(self.rows - 1, n - 1)
+        elif final == 'J':
+            self._erase_display(args[0] if args else 0)
+        elif final == 'K':
+            self._erase_line(args[0] if args else 0)
+        elif final == 'L':
+            if self.top <= buf.y <= self.bottom:
+                self._insert_lines(buf.y, n)
+                buf.x = 0
+        elif final == 'M':
+            if self.top <= buf.y <= self.bottom:
+                self._delete_lines(buf.y, n)
+                buf.x = 0
+        elif final == 'P':
+            row_chars, row_attrs = buf.chars[buf.y], buf.attrs[buf.y]
+            del row_chars[buf.x:buf.x + n]
+            del row_attrs[buf.x:buf.x + n]
+            pad = self.cols - len(row_chars)
+            row_chars.extend([BLANK] * pad)
+            row_attrs.extend([''] * pad)
+        elif final == '@':
+            row_chars, row_attrs = buf.chars[buf.y], buf.attrs[buf.y]
+            row_chars[buf.x:buf.x] = [BLANK] * n
+            row_attrs[buf.x:buf.x] = [''] * n
+            del row_chars[self.cols:]
+            del row_attrs[self.cols:]
+        elif final == 'X':
+            end = min(self.cols, buf.x + n)
+            buf.chars[buf.y][buf.x:end] = [BLANK] * (end - buf.x)
+            buf.attrs[buf.y][buf.x:end] = [self.attr] * (end - buf.x)
+        elif final == 'S':
+            self._scroll_up(n)
+        elif final == 'T':
+            self._scroll_down(n)
+        elif final == 'r':
+            top = args[0] if args and args[0] > 0 else 1
+            bottom = args[1] if len(args) > 1 and args[1] > 0 else self.rows
+            if top < bottom <= self.rows:
+                self.top, self.bottom = top - 1, bottom - 1
+                buf.x, buf.y = 0, 0
+        elif final == 's':
+            buf.saved = (buf.x, buf.y, self.attr)
+        elif final == 'u':
+            self._restore_cursor()
+        # DSR (n), DA (c) и прочие запросы обслуживает терминал браузера
+
+    def _restore_cursor(self):
+        buf = self.buf
+        x, y, self.attr = buf.saved
+        buf.x, buf.y = min(x, self.cols - 1), min(y, self.rows - 1)
+        self._sgr = self._parse_attr(self.attr)
+        self.wrap_pending = False
+
+    def _erase_display(self, mode: int):
+        buf = self.buf
+        if mode == 0:
+            self._erase_line(0)
+            rows = range(buf.y + 1, self.rows)
+        elif mode == 1:
+            self._erase_line(1)
+            rows = range(0, buf.y)
+        else:
+            rows = range(self.rows)
+            if mode == 3:
+                self.scrollback.clear()
+                return
+        for row in rows:
+            buf.chars[row], buf.attrs[row] = buf.blank_row(self.cols, self.attr)
+
+    def _erase_line(self, mode: int):
+        buf = self.buf
+        if mode == 0:
+            start, end = buf.x, self.cols
+        elif mode == 1:
+            start, end = 0, buf.x + 1
+        else:
+            start, end = 0, self.cols
+        buf.chars[buf.y][start:end] = [BLANK] * (end - start)
+        buf.attrs[buf.y][start:end] = [self.attr] * (end - start)
+
+    def _set_modes(self, params: str, enable: bool):
+        for mode in params.split(';'):
+            if not mode.startswith('?') and params.startswith('?'):
+                mode = '?' + mode
+            if mode in ALT_SCREEN_MODES:
+                self._switch_alt(enable, save_cursor=mode == '?1049')
+            elif mode == '?25':
+                self.cursor_visible = enable
+            elif mode == '?7':
+                self.autowrap = enable
+
+    def _switch_alt(self, enable: bool, save_cursor: bool):
+        if enable and self.alt is None:
+            if save_cursor:
+                self.main.saved = (self.main.x, self.main.y, self.attr)
+            self.alt = _Buffer(self.cols, self.rows)
+            self.alt.x, self.alt.y = self.main.x, self.main.y
+            self.buf = self.alt
+        elif not enable and self.alt is not None:
+            self.alt = None
+            self.buf = self.main
+            if save_cursor:
+                self._restore_cursor()
+        self.wrap_pending = False
+
+    # ==================== SGR ====================
+
+    def _set_sgr(self, params: str):
+        """Обновление текущих атрибутов; храним их в канонической форме"""
+        codes = params.split(';') if params else ['0']
+        sgr = self._sgr
+        i = 0
+        while i < len(codes):
+            code = int(codes[i]) if codes[i].isdigit() else 0
+            if code == 0:
+                sgr.clear()
+            elif code in (38, 48, 58):
+                group = {38: 'fg', 48: 'bg', 58: 'ul'}[code]
+                if i + 2 < len(codes) and codes[i + 1] == '5':
+                    sgr[group] = ';'.join(codes[i:i + 3])
+                    i += 2
+                elif i + 4 < len(codes) and codes[i + 1] == '2':
+                    sgr[group] = ';'.join(codes[i:i + 5])
+                    i += 4
+            elif 30 <= code <= 37 or 90 <= code <= 97:
+                sgr['fg'] = str(code)
+            elif 40 <= code <= 47 or 100 <= code <= 107:
+                sgr['bg'] = str(code)
+            elif code == 39:
+                sgr.pop('fg', None)
+            elif code == 49:
+                sgr.pop('bg', None)
+            elif code == 59:
+                sgr.pop('ul', None)
+            elif 1 <= code <= 9:
+                sgr[str(code)] = str(code)
+            elif code == 22:
+                sgr.pop('1', None)
+                sgr.pop('2', None)
+            elif 23 <= code <= 29:
+                sgr.pop(str(code - 20), None)
+            i += 1
+
+        self.attr = ';'.join(sgr[key] for key in sorted(sgr))
+
+    @staticmethod
+    def _parse_attr(attr: str) -> dict[str, str]:
+        """Обратное преобразование канонической строки атрибутов"""
+        result: dict[str, str] = {}
+        codes = attr.split(';') if attr else []
+        i = 0
+        while i < len(codes):
+            code = codes[i]
+            if code in ('38', '48', '58'):
+                group = {'38': 'fg', '48': 'bg', '58': 'ul'}[code]
+                size = 3 if i + 1 < len(codes) and codes[i + 1] == '5' else 5
+                result[group] = ';'.join(codes[i:i + size])
+                i += size
+                continue
+            value = int(code)
+            if 30 <= value <= 37 or 90 <= value <= 97:
+                result['fg'] = code
+            elif 40 <= value <= 47 or 100 <= value <= 107:
+                result['bg'] = code
+            else:
+                result[code] = code
+            i += 1
+        return result
+
+    # ==================== УПРАВЛЕНИЕ ====================
+
+    def reset(self):
+        """Полный сброс (RIS)"""
+        self.scrollback.clear()
+        self.main = _Buffer(self.cols, self.rows)
+        self.alt = None
+        self.buf = self.main
+        self.attr = ''
+        self._sgr = {}
+        self.top, self.bottom = 0, self.rows - 1
+        self.wrap_pending = False
+        self.autowrap = True
+        self.cursor_visible = True
+
+    def resize(self, cols: int, rows: int):
+        """Изменение размера; строки, не влезающие сверху, уходят в scrollback"""
+        if cols <= 0 or rows <= 0 or (cols == self.cols and rows == self.rows):
+            return
+        for buf in filter(None, (self.main, self.alt)):
+            for row in range(len(buf.chars)):
+                chars, attrs = buf.chars[row], buf.attrs[row]
+                if cols < self.cols:
+                    del chars[cols:]
+                    del attrs[cols:]
+                else:
+                    chars.extend([BLANK] * (cols - self.cols))
+                    attrs.extend([''] * (cols - self.cols))
+
+            if rows < self.rows:
+                # Сначала отбрасываем пустое место под курсором, затем уводим верх
+                excess = self.rows - rows
+                below = self.rows - 1 - buf.y
+                drop_bottom = min(excess, below)
+                del buf.chars[self.rows - drop_bottom:]
+                del buf.attrs[self.rows - drop_bottom:]
+                drop_top = excess - drop_bottom
+                for _ in range(drop_top):
+                    chars = buf.chars.pop(0)
+                    attrs = buf.attrs.pop(0)
+                    if buf is self.main:
+                        self.scrollback.append((chars, attrs))
+                buf.y -= drop_top
+            else:
+                for _ in range(rows - self.rows):
+                    blank_chars, blank_attrs = buf.blank_row(cols)
+                    buf.chars.append(blank_chars)
+                    buf.attrs.append(blank_attrs)
+            buf.x = min(buf.x, cols - 1)
+            buf.y = max(0, min(buf.y, rows - 1))
+
+        self.cols, self.rows = cols, rows
+        self.top, self.bottom = 0, rows - 1
+        self.wrap_pending = False
+
+    # ==================== СНИМОК ====================
+
+    @staticmethod
+    def _render_row(chars: list[str], attrs: list[str]) -> str:
+        """Строка с минимальными SGR-переходами; хвостовые пробелы без фона отбрасываются"""
+        end = len(chars)
+        while end > 0 and chars[end - 1] == BLANK and not attrs[end - 1]:
+            end -= 1
+
+        out = []
+        current = ''
+        for i in range(end):
+            char = chars[i]
+            if not char:
+                continue
+            attr = attrs[i]
+            if attr != current:
+                out.append(f'\x1b[0;{attr}m' if attr else '\x1b[0m')
+                current = attr
+            out.append(char)
+        if current:
+            out.append('\x1b[0m')
+        return ''.join(out)
+
+    def _render_buffer(self, buf: _Buffer) -> str:
+        return '\r\n'.join(
+            self._render_row(chars, attrs)
+            for chars, attrs in zip(buf.chars, buf.attrs)
+        )
+
+    def snapshot(self) -> str:
+        """
+        Компактное представление: сброс терминала, scrollback, экран,
+        позиция курсора и текущие атрибуты.
+        """
+        out = ['\x1bc']
+        for chars, attrs in self.scrollback:
+            out.append(self._render_row(chars, attrs))
+            out.append('\r\n')
+        out.append(self._render_buffer(self.main))
+
+        if self.alt is not None:
+            # Курсор основного экрана восстановится терминалом при выходе из alt
+            x, y, _ = self.main.saved
+            out.append(f'\x1b[{y + 1};{x + 1}H\x1b[?1049h\x1b[H')
+            out.append(self._render_buffer(self.alt))
+
+        if self.top != 0 or self.bottom != self.rows - 1:
+            out.append(f'\x1b[{self.top + 1};{self.bottom + 1}r')
+        out.append(f'\x1b[{self.buf.y + 1};{self.buf.x + 1}H')
+        if self.attr:
+            out.append(f'\x1b[0;{self.attr}m')
+        if not self.cursor_visible:
+            out.append('\x1b[?25l')
+        if not self.autowrap:
+            out.append('\x1b[?7l')
+        return ''.join(out)
@@ -2,113 +2,200 @@
 Zeusovich Workspace Manager
 Создаёт и управляет junction-ссылками на все проекты
 """
+import asyncio
+import functools
 import os
 import subprocess
 from pathlib import Path
 from typing import Optional
 
-from .config import load_all_projects, CONFIG_DIR
+from .config import ProjectConfig, load_all_projects, CONFIG_DIR
 
 # Папка workspace рядом с config
 WORKSPACE_DIR = CONFIG_DIR.parent / "zeusovich-workspace"
 
+try:
+    # Junction без запуска cmd /c mklink (только CPython на Windows)
+    from _winapi import CreateJunction
+except ImportError:
+    CreateJunction = None
 
-def sync_zeusovich_workspace() -> dict:
+
+@functools.lru_cache(maxsize=1024)
+def _link_name(name: str) -> str:
+    return name.replace(" ", "_").replace("/", "_").replace("\\", "_")
+
+
+def link_name(project: ProjectConfig) -> str:
+    """Имя ссылки проекта в workspace"""
+    return _link_name(project.name)
+
+
+@functools.lru_cache(maxsize=1024)
+def _normalize(path: str) -> str:
+    """Путь для сравнения цели ссылки с папкой проекта"""
+    if path.startswith("\\\\?\\"):
+        path = path[4:]  # readlink junction на Windows
+    return os.path.normcase(os.path.abspath(path))
+
+
+def desired_links(projects: list[ProjectConfig]) -> dict[str, str]:
+    """Имя ссылки -> папка проекта (при совпадении имён - последний проект)"""
+    return {link_name(project): project.path for project in projects}
+
+
+class WorkspaceSync:
     """
-    Синхронизирует workspace с текущими проектами.
-    Создаёт junction-ссылки на все папки проектов.
-
-    Returns:
-        dict: {
-            "workspace_path": str,
-            "synced": [{"name": ..., "path": ...}, ...],
-            "failed": [{"name": ..., "path": ..., "error": ...}, ...]
-        }
+    Согласование workspace с проектами по разнице с запомненным состоянием.
+    Сравнение - только словари в памяти; ссылки создаются и удаляются в
+    потоке и лишь для изменившихся проектов (и не созданных ранее - их
+    папка могла появиться). Папка workspace сканируется один раз (при
+    первом согласовании) и по full=True.
     """
-    # Создаём папку workspace если нет
-    WORKSPACE_DIR.mkdir(parents=True, exist_ok=True)
-
-    projects = load_all_projects()
-    synced = []
-    failed = []
-
-    # Получаем текущие ссылки в workspace
-    existing_links = set()
-    if WORKSPACE_DIR.exists():
-        for item in WORKSPACE_DIR.iterdir():
-            existing_links.add(item.name)
-
-    # Создаём ссылки для проектов
-    project_names = set()
-    for project in projects:
-        project_path = Path(project.path)
-        # Используем имя проекта как имя ссылки
-        link_name = project.name.replace(" ", "_").replace("/", "_").replace("\\", "_")
-        project_names.add(link_name)
-        link_path = WORKSPACE_DIR / link_name
-
-        # Проверяем существует ли папка проекта
-        if not project_path.exists():
-            failed.append({
-                "name": project.name,
-                "path": str(project_path),
-                "error": "Project folder does not exist"
-            })
-            continue
-
-        # Если ссылка уже существует и указывает на правильную папку - пропускаем
-        if link_path.exists():
-            try:
-                # Проверяем куда указывает ссылка
-                if link_path.is_symlink() or link_path.is_junction():
-                    real_path = os.path.realpath(link_path)
-                    if Path(real_path) == project_path.resolve():
-                        synced.append({
-                            "name": project.name,
-                            "path": str(project_path)
-                        })
-                        continue
-                # Ссылка существует но указывает не туда - удаляем
-                remove_junction(link_path)
-            except Exception:
-                pass
-
-        # Создаём junction
-        result = create_junction(link_path, project_path)
-        if result["success"]:
-            synced.append({
-                "name": project.name,
-                "path": str(project_path)
-            })
-        else:
-            failed.append({
-                "name": project.name,
-                "path": str(project_path),
-                "error": result["error"]
-            })
-
-    # Удаляем старые ссылки на несуществующие проекты
-    for link_name in existing_links:
-        if link_name not in project_names:
-            try:
-                link_path = WORKSPACE_DIR / link_name
-                remove_junction(link_path)
-            except Exception:
-                pass
 
-    return {
-        "workspace_path": str(WORKSPACE_DIR),
-        "synced": synced,
-        "failed": failed
-    }
+    def __init__(self, workspace_dir: Path):
+        self.workspace_dir = workspace_dir
+        self._links: Optional[dict[str, Optional[str]]] = None  # Имя -> цель (None - не ссылка)
+        self._failed: dict[str, tuple[str, str]] = {}  # Имя -> (папка, ошибка)
+        self._desired: dict[str, str] = {}
+        self._reconciled: Optional[dict[str, str]] = None  # desired, с которым совпадает workspace
+        self._result: dict = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._again = False
+        self._full = False
+        # Счётчики
+        self.applied = 0
+
+    def plan(self, desired: dict[str, str]) -> tuple[dict[str, str], list[str]]:
+        """(ссылки для создания/перенаправления, лишние ссылки) относительно состояния"""
+        links = self._links or {}
+        create = {}
+        for name, target in desired.items():
+            if name not in links or links[name] != _normalize(target):
+                create[name] = target
+        remove = [name for name, target in links.items() if target is not None and name not in desired]
+        return create, remove
+
+    def result(self) -> dict:
+        """Итог последнего согласования: workspace_path, synced, failed"""
+        return {
+            "workspace_path": str(self.workspace_dir),
+            "synced": [
+                {"name": name, "path": path} for name, path in self._desired.items()
+                if name not in self._failed
+            ],
+            "failed": [
+                {"name": name, "path": path, "error": error}
+                for name, (path, error) in self._failed.items()
+            ],
+        }
+
+    async def sync(self, projects: Optional[list[ProjectConfig]] = None, full: bool = False) -> dict:
+        """Согласование с проектами; без изменений и ошибок - без обращения к диску"""
+        async with self._lock:
+            if projects is None:
+                projects = load_all_projects()
+            desired = desired_links(projects)
+            if not full and not self._failed and desired == self._reconciled:
+                return self._result
+            self._desired = desired
+            self._failed = {
+                name: failure for name, failure in self._failed.items()
+                if not full and desired.get(name) == failure[0]
+            }
+            if self._links is None or full:
+                self._links = await asyncio.to_thread(self._scan)
+            create, remove = self.plan(desired)
+            if create or remove:
+                await asyncio.to_thread(self._apply, create, remove)
+                self.applied += len(create) + len(remove)
+            self._reconciled = desired
+            self._result = self.result()
+            return self._result
+
+    def request(self, full: bool = False):
+        """Согласование в фоне (не ждём; запросы во время работы объединяются)"""
+        self._full = self._full or full
+        if self._task is not None and not self._task.done():
+            self._again = True
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._again = False
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._again = False
+            full, self._full = self._full, False
+            try:
+                result = await self.sync(full=full)
+            except Exception as e:
+                print(f"[Workspace] Sync failed: {e}")
+            else:
+                if full:
+                    print(f"[OK] Zeusovich workspace: {result['workspace_path']}")
+                    print(f"     Synced {len(result['synced'])} projects")
+                    if result['failed']:
+                        print(f"     [WARN] Failed to sync {len(result['failed'])} projects:")
+                        for f in result['failed']:
+                            print(f"       - {f['name']}: {f['error']}")
+            if not self._again:
+                return
+
+    def _scan(self) -> dict[str, Optional[str]]:
+        """Текущие элементы workspace (в потоке)"""
+        self.workspace_dir.mkdir(parents=True, exist_ok=True)
+        links: dict[str, Optional[str]] = {}
+        with os.scandir(self.workspace_dir) as entries:
+            for entry in entries:
+                try:
+                    links[entry.name] = _normalize(os.readlink(entry.path))
+                except (OSError, ValueError):
+                    links[entry.name] = None  # Обычная папка или файл - не трогаем
+        return links
+
+    def _apply(self, create: dict[str, str], remove: list[str]):
+        """Создание, перенаправление и удаление ссылок (в потоке)"""
+        for name in remove:
+            if remove_junction(self.workspace_dir / name):
+                del self._links[name]
+
+        for name, target in create.items():
+            link_path = self.workspace_dir / name
+            if not os.path.isdir(target):
+                self._failed[name] = (target, "Project folder does not exist")
+                continue
+            if name in self._links:
+                if self._links[name] is None:
+                    self._failed[name] = (target, "Workspace entry with this name is not a link")
+                    continue
+                # Ссылка указывает не туда - удаляем
+                if not remove_junction(link_path):
+                    self._failed[name] = (target, "Failed to remove outdated link")
+                    continue
+                del self._links[name]
+            result = create_junction(link_path, Path(target))
+            if result["success"]:
+                self._links[name] = _normalize(target)
+                self._failed.pop(name, None)
+            else:
+                self._failed[name] = (target, result["error"])
 
 
 def create_junction(link_path: Path, target_path: Path) -> dict:
     """Создаёт junction link (Windows) или symlink (Unix)"""
     try:
         if os.name == 'nt':
+            if CreateJunction is not None:
+                # Junction не требует прав администратора
+                CreateJunction(str(target_path), str(link_path))
+                return {"success": True}
             # Windows: используем mklink /J для junction
-            # Junction не требует прав администратора
             result = subprocess.run(
                 ['cmd', '/c', 'mklink', '/J', str(link_path), str(target_path)],
                 capture_output=True,
@@ -118,7 +205,7 @@ def create_junction(link_path: Path, target_path: Path) -> dict:
                 return {"success": False, "error": result.stderr or "mklink failed"}
         else:
             # Unix: обычный symlink
-            os.symlink(target_path, link_path)
+            os.symlink(target_path, link_path, target_is_directory=True)
 
         return {"success": True}
     except Exception as e:
@@ -146,16 +233,5 @@ def get_workspace_path() -> str:
     return str(WORKSPACE_DIR)
 
 
-# Расширение Path для проверки junction
-def _is_junction(path: Path) -> bool:
-    """Проверяет является ли путь junction point"""
-    try:
-        import ctypes
-        FILE_ATTRIBUTE_REPARSE_POINT = 0x400
-        attrs = ctypes.windll.kernel32.GetFileAttributesW(str(path))
-        return attrs != -1 and (attrs & FILE_ATTRIBUTE_REPARSE_POINT)
-    except Exception:
-        return False
-
-# Monkey-patch Path
-Path.is_junction = lambda self: _is_junction(self)
+# Глобальный экземпляр
+workspace_sync = WorkspaceSync(WORKSPACE_DIR)
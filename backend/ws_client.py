@@ -0,0 +1,250 @@
+"""
+WebSocket клиент с собственной очередью отправки.
+Чтение PTY никогда не ждёт сеть: вывод кладётся в ограниченную очередь,
+отдельная задача отправляет его пачками.
+
+Протокол: по умолчанию JSON (текстовые кадры). Если клиент предлагает
+подпротокол BINARY_SUBPROTOCOL, вывод и ввод идут бинарными кадрами:
+1 байт типа + UTF-8 данные. Управляющие сообщения остаются JSON.
+"""
+import asyncio
+import json
+import weakref
+from enum import Enum
+from typing import Callable, Optional, Union
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+
+BINARY_SUBPROTOCOL = "airganizator.bin"
+
+# Тип бинарного кадра (первый байт)
+FRAME_OUTPUT = 0x01  # сервер -> клиент: вывод терминала
+FRAME_INPUT = 0x02  # клиент -> сервер: ввод
+FRAME_HISTORY = 0x03  # сервер -> клиент: снимок экрана (reset + write)
+
+# Сообщения, которые в бинарном режиме уходят сырыми кадрами
+BINARY_FRAMES = {
+    "output": FRAME_OUTPUT,
+    "history": FRAME_HISTORY,
+}
+
+
+class SlowConsumerPolicy(str, Enum):
+    RESYNC = "resync"  # Сбросить очередь и прислать снимок экрана
+    DISCONNECT = "disconnect"  # Отключить клиента
+
+
+# Все активные клиенты (для статистики)
+_clients: "weakref.WeakSet[ClientConnection]" = weakref.WeakSet()
+
+
+async def accept_websocket(websocket: WebSocket) -> bool:
+    """Принять соединение; True если согласован бинарный подпротокол"""
+    offered = websocket.scope.get("subprotocols") or []
+    binary = BINARY_SUBPROTOCOL in offered
+    await websocket.accept(subprotocol=BINARY_SUBPROTOCOL if binary else None)
+    return binary
+
+
+async def receive_raw(websocket: WebSocket) -> Union[bytes, dict]:
+    """Следующее сообщение клиента: bytes для бинарного кадра, dict для JSON"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return json.loads(message["text"])
+
+
+async def receive_message(websocket: WebSocket) -> dict:
+    """Следующее сообщение клиента: JSON или бинарный кадр ввода"""
+    message = await receive_raw(websocket)
+    if isinstance(message, dict):
+        return message
+
+    if message[:1] != bytes((FRAME_INPUT,)):
+        raise ValueError(f"Unknown frame type: {message[:1].hex()}")
+    # Декодируем без копирования заголовка
+    return {"type": "input", "data": str(memoryview(message)[1:], "utf-8", "replace")}
+
+
+class ClientConnection:
+    """Очередь и задача отправки для одного WebSocket"""
+
+    QUEUE_SIZE = 256  # Максимум кадров в очереди
+    BATCH_INTERVAL = 0.016  # Склейка вывода в пачки ~16ms
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        label: str,
+        resync: Optional[Callable[[], list[dict]]] = None,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.RESYNC,
+        binary: bool = False
+    ):
+        self.websocket = websocket
+        self.label = label
+        self.binary = binary  # Согласован бинарный подпротокол
+        self.resync = resync  # Построение сообщений для пересинхронизации
+        self.policy = policy if resync else SlowConsumerPolicy.DISCONNECT
+        # (вид, данные, канал); канал - только у мультиплексированного соединения
+        self.queue: asyncio.Queue[tuple[str, object, Optional[str]]] = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self.closed = False
+        # Счётчики
+        self.sent_frames = 0
+        self.dropped_frames = 0
+        self.resyncs = 0
+        self._last_send = 0.0
+        self._task: Optional[asyncio.Task] = None
+        _clients.add(self)
+
+    def start(self):
+        """Запуск задачи отправки"""
+        self._task = asyncio.create_task(self._writer())
+
+    async def close(self):
+        """Остановка задачи отправки"""
+        self.closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        _clients.discard(self)
+
+    def send_output(self, data: str, channel: Optional[str] = None):
+        """Постановка вывода терминала в очередь (не блокирует)"""
+        self._put(("output", data, channel))
+
+    def send_json(self, message: dict):
+        """Постановка управляющего сообщения в очередь (не блокирует)"""
+        self._put(("json", message, None))
+
+    def _put(self, item: tuple[str, object, Optional[str]]):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self._on_overflow(item)
+
+    def _on_overflow(self, item: tuple[str, object, Optional[str]]):
+        """Клиент не успевает читать - применяем политику"""
+        if self.policy == SlowConsumerPolicy.DISCONNECT:
+            self.dropped_frames += self.queue.qsize() + 1
+            self.closed = True
+            if self._task:
+                self._task.cancel()
+            asyncio.create_task(self._close_socket(1013, "Client too slow"))
+            return
+
+        # Выбрасываем накопленный вывод, управляющие сообщения сохраняем
+        kept = [item] if item[0] == "json" else []
+        while not self.queue.empty():
+            queued = self.queue.get_nowait()
+            if queued[0] == "output":
+                self.dropped_frames += 1
+            elif queued[0] == "json":
+                kept.append(queued)
+        if item[0] == "output":
+            self.dropped_frames += 1
+        # Снимок строится в момент отправки и уже включает выброшенный вывод
+        self.queue.put_nowait(("resync", None, None))
+        for queued in kept[:self.QUEUE_SIZE - 1]:
+            self.queue.put_nowait(queued)
+
+    async def _close_socket(self, code: int, reason: str):
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    async def _writer(self):
+        """Задача отправки: пачки не чаще BATCH_INTERVAL"""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                item = await self.queue.get()
+
+                # Если недавно отправляли - даём выводу накопиться
+                delay = self._last_send + self.BATCH_INTERVAL - loop.time()
+                if item[0] == "output" and delay > 0:
+                    await asyncio.sleep(delay)
+
+                items = [item]
+                while not self.queue.empty():
+                    items.append(self.queue.get_nowait())
+
+                for message in self._coalesce(items):
+                    await self._send(message)
+                    self.sent_frames += 1
+                self._last_send = loop.time()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Соединение закрыто - дальше отправлять некуда
+            self.closed = True
+
+    async def _send(self, message: dict):
+        """Отправка сообщения: вывод и снимки - сырым кадром, остальное - JSON"""
+        frame = BINARY_FRAMES.get(message["type"]) if self.binary else None
+        if frame is None:
+            await self.websocket.send_json(message)
+            return
+        await self.websocket.send_bytes(bytes((frame,)) + message["data"].encode("utf-8"))
+
+    def _coalesce(self, items: list[tuple[str, object, Optional[str]]]) -> list[dict]:
+        """Склейка подряд идущих кадров вывода одного канала в один"""
+        messages: list[dict] = []
+        output: list[str] = []
+        output_channel: Optional[str] = None
+        resynced = False
+
+        def flush_output():
+            if output:
+                message = {"type": "output", "data": "".join(output)}
+                if output_channel is not None:
+                    message["channel"] = output_channel
+                messages.append(message)
+                output.clear()
+
+        for kind, payload, channel in items:
+            if kind == "output":
+                # Вывод после маркера пересинхронизации уже вошёл в снимок
+                if resynced:
+                    continue
+                if channel != output_channel:
+                    flush_output()
+                    output_channel = channel
+                output.append(payload)
+                continue
+            flush_output()
+            if kind == "resync":
+                resynced = True
+                self.resyncs += 1
+                messages.extend(message for message in self.resync() if message.get("data"))
+            else:
+                messages.append(payload)
+        flush_output()
+        return messages
+
+    def stats(self) -> dict:
+        return {
+            "label": self.label,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.QUEUE_SIZE,
+            "sent_frames": self.sent_frames,
+            "dropped_frames": self.dropped_frames,
+            "resyncs": self.resyncs,
+            "policy": self.policy.value,
+            "binary": self.binary,
+            "closed": self.closed,
+        }
+
+
+def client_stats() -> list[dict]:
+    """Статистика по всем подключённым клиентам"""
+    return [client.stats() for client in list(_clients)]
@@ -0,0 +1,90 @@
+"""
+Пропускная способность записи истории: N сессий параллельно пишут куски
+по 512 символов, время - до коммита всех записей.
+Было: соединение и коммит на каждую запись. Стало: Database (WAL,
+одно соединение на запись, групповой коммит).
+
+    python -m benchmarks.db_throughput [--sessions 1 8 32] [--seconds 2]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import aiosqlite
+
+from backend.database import Database
+from backend.migrations import Migration
+
+CHUNK = "x" * 510 + "\r\n"
+TABLE = (
+    """CREATE TABLE IF NOT EXISTS bench_output (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        output TEXT NOT NULL
+    )""",
+)
+INSERT = "INSERT INTO bench_output (session_id, output) VALUES (?, ?)"
+
+
+async def connection_per_call(path: Path, sessions: int, seconds: float) -> float:
+    """Старая схема: aiosqlite.connect + commit на каждую вставку; вставок/с"""
+    async with aiosqlite.connect(path) as conn:
+        await conn.execute(TABLE[0])
+        await conn.commit()
+
+    inserted = 0
+
+    async def session(session_id: int, deadline: float):
+        nonlocal inserted
+        while time.perf_counter() < deadline:
+            async with aiosqlite.connect(path) as conn:
+                await conn.execute(INSERT, (session_id, CHUNK))
+                await conn.commit()
+            inserted += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i, start + seconds) for i in range(sessions)))
+    return inserted / (time.perf_counter() - start)
+
+
+async def group_commit(path: Path, sessions: int, seconds: float) -> float:
+    """Database: запись в очередь без ожидания, групповой коммит; вставок/с"""
+    database = Database(path)
+    await database.open([Migration(1, "bench output", TABLE)])
+    inserted = 0
+
+    async def session(session_id: int, deadline: float):
+        nonlocal inserted
+        while time.perf_counter() < deadline:
+            # Цикл чтения PTY: пачка вывода, затем уступаем циклу
+            for _ in range(16):
+                database.write_nowait(INSERT, (session_id, CHUNK))
+            inserted += 16
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i, start + seconds) for i in range(sessions)))
+    await database.barrier()
+    elapsed = time.perf_counter() - start
+    await database.close()
+    return inserted / elapsed
+
+
+async def main(sessions: list[int], seconds: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'sessions':>8} {'per call, ins/s':>16} {'group commit, ins/s':>20}")
+        for count in sessions:
+            before = await connection_per_call(Path(tmp) / f"before-{count}.db", count, seconds)
+            after = await group_commit(Path(tmp) / f"after-{count}.db", count, seconds)
+            print(f"{count:>8} {before:>16,.0f} {after:>20,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.seconds))
@@ -0,0 +1,71 @@
+"""
+Микробенчмарк буфера истории вывода: append (+ tail) на кусок, нс.
+Сравнение со старой схемой - строка, `+=` и срез до бюджета.
+
+    python -m benchmarks.output_buffer
+"""
+import time
+
+from backend.output_buffer import OutputBuffer
+
+CASES = [  # (бюджет, размер куска, заполнение - во сколько раз вывода больше бюджета)
+    (50_000, 64, 0.5),
+    (50_000, 64, 20),
+    (100_000, 64, 20),
+    (100_000, 512, 20),
+]
+TAIL = 2000  # Хвост, который раньше анализировался на каждый кусок
+REPEATS = 5
+
+
+class StringHistory:
+    """Старая схема: output_history += data и срез при превышении"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.data = ""
+
+    def append(self, data: str):
+        self.data += data
+        if len(self.data) > self.max_size:
+            self.data = self.data[-self.max_size:]
+
+    def tail(self, size: int) -> str:
+        return self.data[-size:]
+
+
+def _chunks(chunk_size: int, total: int) -> list[str]:
+    line = "".join(chr(0x61 + i % 26) for i in range(chunk_size - 2)) + "\r\n"
+    return [line] * max(1, int(total / chunk_size))
+
+
+def _run(factory, chunks: list[str], max_size: int, tail: bool) -> float:
+    """Лучшее из REPEATS: нс на кусок"""
+    best = float("inf")
+    for _ in range(REPEATS):
+        history = factory(max_size)
+        start = time.perf_counter_ns()
+        if tail:
+            for chunk in chunks:
+                history.append(chunk)
+                history.tail(TAIL)
+        else:
+            for chunk in chunks:
+                history.append(chunk)
+        best = min(best, (time.perf_counter_ns() - start) / len(chunks))
+    return best
+
+
+def main():
+    print(f"{'budget':>8} {'chunk':>6} {'fill':>5} {'op':>12} {'old ns':>8} {'new ns':>8}")
+    for max_size, chunk_size, fill in CASES:
+        chunks = _chunks(chunk_size, max_size * fill)
+        for tail in (False, True):
+            old = _run(StringHistory, chunks, max_size, tail)
+            new = _run(OutputBuffer, chunks, max_size, tail)
+            op = "append+tail" if tail else "append"
+            print(f"{max_size:>8} {chunk_size:>6} {fill:>5} {op:>12} {old:>8.0f} {new:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Хранение вывода терминала: размер БД и скорость записи/чтения.
+Было: строка terminal_output на каждые 512+ символов без сжатия.
+Стало: сжатые сегменты ~64K через OutputRecorder.
+Вывод - синтетический вывод агента (перерисовки спиннера, списки файлов, текст).
+Запись через OutputRecorder включает и полнотекстовый индекс (search_text +
+FTS5) - его размер показан отдельно, сжатие считается по таблицам вывода.
+
+    python -m benchmarks.segments [--chars 20000000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from backend import database
+from backend.database import MIGRATIONS, Database
+from backend.recorder import OutputRecorder
+
+WORDS = (
+    "def class return import self value result error file path data "
+    "async await for in if else"
+).split()
+SPINNER = "⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏"
+OLD_TABLE = """CREATE TABLE IF NOT EXISTS terminal_output (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER NOT NULL,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    output TEXT NOT NULL
+)"""
+OLD_BATCH = 512  # Старый порог записи
+
+
+def agent_output(chars: int, seed: int = 1) -> list[str]:
+    """Куски вывода общим объёмом не меньше chars"""
+    rng = random.Random(seed)
+    chunks = []
+    total = 0
+    while total < chars:
+        i = len(chunks)
+        r = rng.random()
+        if r < 0.5:
+            chunk = f"\x1b[2K\r\x1b[36m{SPINNER[i % 10]}\x1b[0m Thinking… ({i // 10}s · esc to interrupt)"
+        elif r < 0.7:
+            chunk = "".join(
+                f"  src/module_{rng.randint(0, 40)}/file_{rng.randint(0, 200)}.py\r\n" for _ in range(8)
+            )
+        else:
+            chunk = " ".join(rng.choice(WORDS) for _ in range(30)) + "\r\n"
+        chunks.append(chunk)
+        total += len(chunk)
+    return chunks
+
+
+def _db_bytes(path: Path) -> dict[str, int]:
+    """Байт на диске: файл БД, таблицы вывода и поискового индекса (с их индексами)"""
+    wal = path.with_name(path.name + "-wal")
+    sizes = {"file": path.stat().st_size + (wal.stat().st_size if wal.exists() else 0)}
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute(
+            """SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s
+               JOIN sqlite_master m ON m.name = s.name GROUP BY m.tbl_name"""
+        ).fetchall()
+    tables = dict(rows)
+    sizes["output"] = tables.get("terminal_output", 0) + tables.get("terminal_segments", 0)
+    sizes["search"] = sum(size for name, size in tables.items() if name.startswith("search_"))
+    return sizes
+
+
+async def old_schema(path: Path, chunks: list[str]) -> tuple[float, float, dict[str, int]]:
+    """(запись с, чтение с, байт на диске)"""
+    database.db = Database(path)
+    await database.db.open(MIGRATIONS)
+    await database.db.write(OLD_TABLE)
+    session_id = await database.create_session("bench", "development", None)
+
+    start = time.perf_counter()
+    batch = ""
+    for chunk in chunks:
+        batch += chunk
+        if len(batch) > OLD_BATCH:
+            database.db.write_nowait(
+                "INSERT INTO terminal_output (session_id, output) VALUES (?, ?)", (session_id, batch)
+            )
+            batch = ""
+    if batch:
+        database.db.write_nowait(
+            "INSERT INTO terminal_output (session_id, output) VALUES (?, ?)", (session_id, batch)
+        )
+    await database.wait_for_writes()
+    write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows = await database.db.fetchall(
+        "SELECT output FROM terminal_output WHERE session_id = ? ORDER BY id", (session_id,)
+    )
+    output = "".join(row["output"] for row in rows)
+    read = time.perf_counter() - start
+    assert output == "".join(chunks)
+    await database.db.close()
+    return write, read, _db_bytes(path)
+
+
+async def segments(path: Path, chunks: list[str]) -> tuple[float, float, dict[str, int]]:
+    """(запись с, чтение с, байт на диске)"""
+    database.db = Database(path)
+    await database.db.open(MIGRATIONS)
+    recorder = OutputRecorder(path.with_name("spill.jsonl"))
+    recorder.start()
+    session_id = await database.create_session("bench", "development", None)
+
+    start = time.perf_counter()
+    for i, chunk in enumerate(chunks):
+        recorder.record(session_id, chunk)
+        if i % 2000 == 0:
+            await asyncio.sleep(0)  # Цикл чтения PTY уступает event loop
+    recorder.end_session(session_id)
+    await recorder.close()
+    write = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output = await database.get_session_output(session_id)
+    read = time.perf_counter() - start
+    assert output == "".join(chunks)
+    await database.db.close()
+    return write, read, _db_bytes(path)
+
+
+async def main(chars: int):
+    chunks = agent_output(chars)
+    raw = sum(len(chunk) for chunk in chunks)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, run in (("old schema", old_schema), ("segments", segments)):
+            directory = Path(tmp) / name.replace(" ", "-")
+            os.makedirs(directory)
+            results[name] = await run(directory / "history.db", chunks)
+
+    print(f"{raw / 1e6:.1f}M characters of agent output, one session")
+    print(f"{'':>12} {'DB file':>10} {'output':>10} {'search':>10} {'write':>14} {'full read':>14}")
+    for name, (write, read, sizes) in results.items():
+        print(
+            f"{name:>12} {sizes['file'] / 1e6:>7.1f} MB {sizes['output'] / 1e6:>7.1f} MB "
+            f"{sizes['search'] / 1e6:>7.1f} MB {raw / write / 1e6:>7.1f} Mchar/s {raw / read / 1e6:>7.1f} Mchar/s"
+        )
+    ratio = results["old schema"][2]["output"] / results["segments"][2]["output"]
+    print(f"output stored {ratio:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chars", type=int, default=20_000_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.chars))
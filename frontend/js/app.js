@@ -7,7 +7,8 @@ document.addEventListener('DOMContentLoaded', () => {
     let currentProject = null;
     let settings = {};
     let draggedCard = null;
-    let statusPollInterval = null;
+    let statusEvents = null;
+    let llmStatuses = {};  // projectId -> typing/idle/attention (from status events)
     let selectProjectTimeout = null;
 
     // Elements
@@ -38,8 +39,8 @@ document.addEventListener('DOMContentLoaded', () => {
     loadProjects();
     loadSettings();
 
-    // Start status polling for all projects
-    startStatusPolling();
+    // Subscribe to status events for all projects
+    startStatusEvents();
 
     // Console status handler
     consoleManager.onStatusChange = (running) => {
@@ -147,8 +148,15 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
-    // Handle LLM typing/idle/attention status
-    terminalManager.onLLMStatus = (projectId, status) => {
+    // LLM typing/idle/attention status on a project card
+    // (notify=false - state from a snapshot, don't highlight idle projects as new responses)
+    function setCardLLMStatus(projectId, status, notify = true) {
+        if (status) {
+            llmStatuses[projectId] = status;
+        } else {
+            delete llmStatuses[projectId];
+        }
+
         const card = document.querySelector(`.project-card[data-id="${projectId}"]`);
         if (!card) return;
 
@@ -160,13 +168,13 @@ document.addEventListener('DOMContentLoaded', () => {
         } else if (status === 'attention') {
             // Требует внимания - ошибка или ждёт решения (y/n)
             card.classList.add('attention');
-        } else if (status === 'idle') {
+        } else if (status === 'idle' && notify) {
             // Ждёт ввода - подсвечиваем если не активный проект
             if (!currentProject || currentProject.id !== projectId) {
                 card.classList.add('has-response');
             }
         }
-    };
+    }
 
     // Load projects
     async function loadProjects() {
@@ -197,6 +205,38 @@ document.addEventListener('DOMContentLoaded', () => {
         localStorage.setItem('projectsOrder', JSON.stringify(orderMap));
     }
 
+    // Git badge of a project card (git info comes from the server cache and may be null)
+    function renderGitBadge(git) {
+        if (!git?.has_git) return '';
+        const branch = git.branch || (git.head ? git.head.slice(0, 7) : '');
+        const title = [git.remote_url || 'Git repo'];
+        if (git.last_commit) {
+            title.push(`${new Date(git.last_commit_at).toLocaleString()}: ${git.last_commit}`);
+        }
+        if (git.dirty) title.push(`${git.changes} uncommitted change(s)`);
+        return `
+            <a href="${git.web_url || '#'}" target="_blank" class="project-git ${git.dirty ? 'dirty' : ''}" title="${escapeHtml(title.join('\n')).replace(/"/g, '&quot;')}" onclick="event.stopPropagation()">
+                <span class="git-icon">⎇</span>
+                ${branch ? `<span class="git-branch">${escapeHtml(branch)}${git.dirty ? '*' : ''}</span>` : ''}
+                ${git.ahead ? `<span class="git-sync">↑${git.ahead}</span>` : ''}
+                ${git.behind ? `<span class="git-sync">↓${git.behind}</span>` : ''}
+            </a>
+        `;
+    }
+
+    function setProjectGit(projectId, git) {
+        const project = projects.find(p => p.id === projectId);
+        if (!project) return;
+        project.git = git;
+
+        const card = document.querySelector(`.project-card[data-id="${projectId}"]`);
+        const meta = card && card.querySelector('.project-meta');
+        if (!meta) return;
+        const badge = meta.querySelector('.project-git');
+        if (badge) badge.remove();
+        meta.insertAdjacentHTML('beforeend', renderGitBadge(git));
+    }
+
     // Render projects list
     function renderProjects() {
         if (projects.length === 0) {
@@ -211,7 +251,7 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         projectsList.innerHTML = projects.map(p => `
-            <div class="project-card ${currentProject?.id === p.id ? 'active' : ''}" data-id="${p.id}" draggable="true">
+            <div class="project-card ${currentProject?.id === p.id ? 'active' : ''} ${['typing', 'attention'].includes(llmStatuses[p.id]) ? llmStatuses[p.id] : ''}" data-id="${p.id}" draggable="true">
                 <div class="drag-handle"><span></span><span></span><span></span></div>
                 <div class="project-card-header">
                     <span class="project-name">${escapeHtml(p.name)}</span>
@@ -220,12 +260,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 <div class="project-meta">
                     <span class="project-llm">${p.llm}</span>
                     <span class="project-mode ${p.mode}">${p.mode}</span>
-                    ${p.git?.has_git ? `
-                        <a href="${p.git.web_url || '#'}" target="_blank" class="project-git" title="${p.git.remote_url || 'Git repo'}" onclick="event.stopPropagation()">
-                            <span class="git-icon">⎇</span>
-                            ${p.git.branch ? `<span class="git-branch">${escapeHtml(p.git.branch)}</span>` : ''}
-                        </a>
-                    ` : ''}
+                    ${renderGitBadge(p.git)}
                 </div>
                 <div class="project-actions">
                     <button class="btn btn-sm btn-icon" onclick="openFolder('${p.id}')" title="Open folder">📁</button>
@@ -734,54 +769,65 @@ document.addEventListener('DOMContentLoaded', () => {
         }, 300);
     });
 
-    // ==================== STATUS POLLING ====================
+    // ==================== STATUS EVENTS ====================
+
+    function startStatusEvents() {
+        // Snapshot on connect, then deltas; EventSource reconnects on its own
+        statusEvents = new EventSource('/api/events');
+        statusEvents.onmessage = (event) => {
+            const msg = JSON.parse(event.data);
+
+            if (msg.type === 'snapshot') {
+                const running = new Map();
+                msg.sessions
+                    .filter(s => s.kind === 'project')
+                    .forEach(s => running.set(s.id, s));
+                // Projects may not be loaded yet - keep statuses for renderProjects
+                llmStatuses = {};
+                running.forEach(session => { llmStatuses[session.id] = session.status; });
+                projects.forEach(p => {
+                    const session = running.get(p.id);
+                    setProjectRunning(p.id, Boolean(session && session.running));
+                    setCardLLMStatus(p.id, session ? session.status : null, false);
+                });
+                return;
+            }
 
-    function startStatusPolling() {
-        // Poll every 2 seconds
-        statusPollInterval = setInterval(updateProjectStatuses, 2000);
-        // Also run immediately
-        updateProjectStatuses();
+            if (msg.kind !== 'project') return;
+            if (msg.type === 'git') {
+                setProjectGit(msg.id, msg.git);
+            } else if (msg.type === 'started' || msg.type === 'stopped') {
+                setProjectRunning(msg.id, msg.type === 'started');
+                if (msg.type === 'stopped') setCardLLMStatus(msg.id, null);
+            } else {
+                setCardLLMStatus(msg.id, msg.type);
+            }
+        };
     }
 
-    async function updateProjectStatuses() {
-        try {
-            const response = await fetch('/api/projects/running/list');
-            const data = await response.json();
-            const runningIds = new Set(data.running || []);
-
-            // Update all project cards
-            document.querySelectorAll('.project-card').forEach(card => {
-                const projectId = card.dataset.id;
-                const statusDot = card.querySelector('.project-status');
-                if (!statusDot) return;
-
-                const isRunning = runningIds.has(projectId);
-
-                if (isRunning) {
-                    statusDot.classList.add('running');
-                } else {
-                    statusDot.classList.remove('running');
-                }
-            });
+    function setProjectRunning(projectId, isRunning) {
+        const project = projects.find(p => p.id === projectId);
+        if (project) project.running = isRunning;
 
-            // Also update projects array
-            projects.forEach(p => {
-                p.running = runningIds.has(p.id);
-            });
+        const card = document.querySelector(`.project-card[data-id="${projectId}"]`);
+        const statusDot = card && card.querySelector('.project-status');
+        if (!statusDot) return;
 
-        } catch (err) {
-            // Silent fail - polling will retry
+        if (isRunning) {
+            statusDot.classList.add('running');
+        } else {
+            statusDot.classList.remove('running');
         }
     }
 
     // Clean up on page unload
     window.addEventListener('beforeunload', () => {
-        if (statusPollInterval) {
-            clearInterval(statusPollInterval);
+        if (statusEvents) {
+            statusEvents.close();
         }
     });
 
-    // ==================== END STATUS POLLING ====================
+    // ==================== END STATUS EVENTS ====================
 
     // Utility
     function escapeHtml(text) {
@@ -0,0 +1,163 @@
+/**
+ * Multiplexed terminal connection.
+ * One long-lived WebSocket for the page; terminals subscribe to channels
+ * (project:<id>, console:<id>, zeusovich). Switching project is an
+ * unsubscribe/subscribe on the same socket, not a new handshake.
+ * Binary frames carry a 3-byte header: frame type + channel id (uint16 BE).
+ */
+class MuxChannel {
+    constructor(mux, name, size) {
+        this.mux = mux;
+        this.name = name;
+        this.size = size;   // () => ({cols, rows}) for the screen snapshot
+        this.id = null;     // Assigned by the server in 'subscribed'
+
+        // Handlers, set by the owner
+        this.onopen = null;
+        this.onmessage = null;
+        this.onclose = null;
+    }
+
+    isOpen() {
+        return this.id !== null && this.mux.isOpen();
+    }
+
+    send(msg) {
+        if (this.isOpen()) {
+            this.mux.sendJSON({ ...msg, channel: this.name });
+        }
+    }
+
+    sendInput(data) {
+        if (!this.isOpen()) return;
+        if (TermProtocol.isBinary(this.mux.ws)) {
+            const header = [TermProtocol.FRAME_INPUT, this.id >> 8, this.id & 0xff];
+            this.mux.ws.send(TermProtocol.inputFrame(header, data));
+        } else {
+            this.send({ type: 'input', data: data });
+        }
+    }
+
+    close() {
+        this.mux.unsubscribe(this);
+    }
+}
+
+class MuxConnection {
+    constructor(url) {
+        this.url = url;
+        this.ws = null;
+        this.channels = new Map();  // name -> MuxChannel
+        this.byId = new Map();      // channel id -> MuxChannel
+        this.reconnectAttempts = 0;
+        this.reconnectDelay = 1000;
+        this.maxReconnectDelay = 10000;
+    }
+
+    isOpen() {
+        return this.ws !== null && this.ws.readyState === WebSocket.OPEN;
+    }
+
+    sendJSON(msg) {
+        this.ws.send(JSON.stringify(msg));
+    }
+
+    subscribe(name, size) {
+        const previous = this.channels.get(name);
+        if (previous) {
+            this.unsubscribe(previous);
+        }
+
+        const channel = new MuxChannel(this, name, size);
+        this.channels.set(name, channel);
+        if (this.isOpen()) {
+            this._sendSubscribe(channel);
+        } else {
+            this._open();
+        }
+        return channel;
+    }
+
+    unsubscribe(channel) {
+        if (this.channels.get(channel.name) !== channel) return;
+        this.channels.delete(channel.name);
+        if (channel.id !== null) {
+            this.byId.delete(channel.id);
+        }
+        channel.onopen = channel.onmessage = channel.onclose = null;
+        if (this.isOpen()) {
+            this.sendJSON({ type: 'unsubscribe', channel: channel.name });
+        }
+    }
+
+    _sendSubscribe(channel) {
+        this.sendJSON({ type: 'subscribe', channel: channel.name, ...channel.size() });
+    }
+
+    _open() {
+        if (this.ws) return;
+
+        this.ws = TermProtocol.open(this.url);
+
+        this.ws.onopen = () => {
+            this.reconnectAttempts = 0;
+            this.channels.forEach(channel => this._sendSubscribe(channel));
+        };
+
+        this.ws.onmessage = (event) => this._dispatch(event);
+
+        this.ws.onclose = () => {
+            this.ws = null;
+            this.byId.clear();
+            this.channels.forEach(channel => {
+                channel.id = null;
+                if (channel.onclose) channel.onclose();
+            });
+
+            // Reconnect with backoff while someone is subscribed
+            if (this.channels.size === 0) return;
+            this.reconnectAttempts++;
+            const delay = Math.min(this.reconnectDelay * this.reconnectAttempts, this.maxReconnectDelay);
+            setTimeout(() => {
+                if (this.channels.size > 0) this._open();
+            }, delay);
+        };
+
+        this.ws.onerror = (error) => {
+            console.error('Mux WebSocket error:', error);
+        };
+    }
+
+    _dispatch(event) {
+        let channel;
+        let msg;
+
+        if (typeof event.data === 'string') {
+            msg = JSON.parse(event.data);
+            channel = this.channels.get(msg.channel);
+            if (!channel) return;  // Already unsubscribed
+
+            if (msg.type === 'subscribed') {
+                if (channel.id !== null) this.byId.delete(channel.id);
+                channel.id = msg.id;
+                this.byId.set(msg.id, channel);
+                if (channel.onopen) channel.onopen();
+                return;
+            }
+            if (msg.type === 'error') {
+                console.warn(`Mux channel ${msg.channel}: ${msg.message}`);
+                return;
+            }
+        } else {
+            const frame = new Uint8Array(event.data);
+            channel = this.byId.get((frame[1] << 8) | frame[2]);
+            if (!channel) return;
+            msg = { type: TermProtocol.FRAME_TYPES[frame[0]] || 'unknown', data: frame.subarray(3) };
+        }
+
+        if (channel.onmessage) channel.onmessage(msg);
+    }
+}
+
+// Shared by all terminals on the page
+const mux = new MuxConnection(`ws://${window.location.host}/api/mux`);
@@ -0,0 +1,56 @@
+/**
+ * Terminal WebSocket protocol.
+ * Offers the binary subprotocol: output and input travel as raw UTF-8
+ * frames with a one-byte type header, control messages stay JSON.
+ * If the server doesn't accept it, everything falls back to JSON.
+ */
+const TermProtocol = {
+    SUBPROTOCOL: 'airganizator.bin',
+
+    // Frame type (first byte)
+    FRAME_OUTPUT: 0x01,
+    FRAME_INPUT: 0x02,
+    FRAME_HISTORY: 0x03,
+
+    // Server frame type -> message type
+    FRAME_TYPES: { 0x01: 'output', 0x03: 'history' },
+
+    encoder: new TextEncoder(),
+
+    open(url) {
+        const ws = new WebSocket(url, [this.SUBPROTOCOL]);
+        ws.binaryType = 'arraybuffer';
+        return ws;
+    },
+
+    isBinary(ws) {
+        return ws.protocol === this.SUBPROTOCOL;
+    },
+
+    // Parse an incoming frame into {type, data}.
+    // Binary payloads are returned as a Uint8Array view - xterm.js writes bytes directly
+    parse(event) {
+        if (typeof event.data === 'string') {
+            return JSON.parse(event.data);
+        }
+        const frame = new Uint8Array(event.data);
+        return { type: this.FRAME_TYPES[frame[0]] || 'unknown', data: frame.subarray(1) };
+    },
+
+    // Input frame: header bytes followed by UTF-8 text
+    inputFrame(header, data) {
+        // UTF-8 takes at most 3 bytes per UTF-16 code unit
+        const frame = new Uint8Array(data.length * 3 + header.length);
+        frame.set(header);
+        const { written } = this.encoder.encodeInto(data, frame.subarray(header.length));
+        return frame.subarray(0, written + header.length);
+    },
+
+    sendInput(ws, data) {
+        if (!this.isBinary(ws)) {
+            ws.send(JSON.stringify({ type: 'input', data: data }));
+            return;
+        }
+        ws.send(this.inputFrame([this.FRAME_INPUT], data));
+    }
+};
@@ -6,13 +6,9 @@ class TerminalManager {
         this.container = document.getElementById(containerId);
         this.terminal = null;
         this.fitAddon = null;
-        this.ws = null;
+        this.channel = null;  // Subscription on the shared mux connection
         this.projectId = null;
         this.isRunning = false;
-        this.connectionId = null;
-        this.reconnectAttempts = 0;
-        this.maxReconnectAttempts = 3;
-        this.reconnectDelay = 1000;
         this.lastSelection = '';  // Сохраняем выделение для Ctrl+C
     }
 
@@ -69,11 +65,8 @@ class TerminalManager {
 
         // Handle input
         this.terminal.onData(data => {
-            if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-                this.ws.send(JSON.stringify({
-                    type: 'input',
-                    data: data
-                }));
+            if (this.channel) {
+                this.channel.sendInput(data);
             }
         });
 
@@ -96,11 +89,8 @@ class TerminalManager {
             // Ctrl+V - paste
             if (e.ctrlKey && e.key === 'v' && e.type === 'keydown') {
                 navigator.clipboard.readText().then(text => {
-                    if (text && this.ws && this.ws.readyState === WebSocket.OPEN) {
-                        this.ws.send(JSON.stringify({
-                            type: 'input',
-                            data: text
-                        }));
+                    if (text && this.channel) {
+                        this.channel.sendInput(text);
                     }
                 }).catch(() => {});  // Игнорируем ошибки доступа к clipboard
                 return false; // Prevent default
@@ -121,68 +111,49 @@ class TerminalManager {
         this.terminal.writeln('');
     }
 
+    // Размер терминала для снимка экрана при подписке
+    size() {
+        return { cols: this.terminal.cols, rows: this.terminal.rows };
+    }
+
     fit() {
         if (this.fitAddon) {
             this.fitAddon.fit();
             // Send resize to server
-            if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-                this.ws.send(JSON.stringify({
+            if (this.channel) {
+                this.channel.send({
                     type: 'resize',
                     cols: this.terminal.cols,
                     rows: this.terminal.rows
-                }));
+                });
             }
         }
     }
 
     connect(projectId) {
-        // Disconnect previous
+        // Unsubscribe previous project - the socket itself stays open
         this.disconnect();
 
         this.projectId = projectId;
         this.hasHistory = false;
-        this.reconnectAttempts = 0;
-
-        // Generate unique connection ID to prevent race conditions
-        this.connectionId = Date.now() + Math.random();
-        const currentConnectionId = this.connectionId;
 
         // Clear terminal
         this.terminal.clear();
 
-        // Connect WebSocket
-        const wsUrl = `ws://${window.location.host}/api/terminal/${projectId}`;
-        this.ws = new WebSocket(wsUrl);
+        const channel = mux.subscribe(`project:${projectId}`, () => this.size());
+        this.channel = channel;
 
-        this.ws.onopen = () => {
-            // Ignore if connection changed
-            if (this.connectionId !== currentConnectionId) return;
-            this.reconnectAttempts = 0;
+        channel.onopen = () => {
             this.fit();
         };
 
-        this.ws.onmessage = (event) => {
-            // Ignore messages from old connections
-            if (this.connectionId !== currentConnectionId) return;
-
-            const msg = JSON.parse(event.data);
-
+        channel.onmessage = (msg) => {
             if (msg.type === 'output') {
                 this.terminal.write(msg.data);
             } else if (msg.type === 'history') {
-                // Очищаем и показываем историю
-                this.terminal.clear();
-                // Фильтруем служебные escape-последовательности
-                const cleaned = msg.data
-                    .replace(/\x1b\[\?1;2c/g, '')  // Device attributes response
-                    .replace(/\x1b\[[\?0-9;]*[a-zA-Z]/g, (match) => {
-                        // Сохраняем цвета и форматирование, убираем служебные
-                        if (/\x1b\[[0-9;]*m/.test(match)) return match; // colors
-                        if (/\x1b\[[0-9]*[ABCD]/.test(match)) return match; // cursor movement
-                        if (/\x1b\[[0-9]*[JK]/.test(match)) return match; // clear
-                        return '';
-                    });
-                this.terminal.write(cleaned);
+                // Сервер присылает снимок экрана - полный сброс и отрисовка
+                this.terminal.reset();
+                this.terminal.write(msg.data);
                 this.hasHistory = true;
             } else if (msg.type === 'status') {
                 this.isRunning = msg.running;
@@ -193,68 +164,36 @@ class TerminalManager {
             }
         };
 
-        this.ws.onclose = (event) => {
-            // Ignore if connection changed
-            if (this.connectionId !== currentConnectionId) return;
-
+        channel.onclose = () => {
+            // The mux reconnects and resubscribes on its own
             this.isRunning = false;
             this.onStatusChange(false);
-
-            // Don't reconnect if closed normally or max attempts reached
-            if (event.code === 1000 || this.reconnectAttempts >= this.maxReconnectAttempts) {
-                this.terminal.writeln('');
-                this.terminal.writeln('\x1b[1;31mDisconnected\x1b[0m');
-                this.reconnectAttempts = 0;
-                return;
-            }
-
-            // Auto-reconnect with backoff
-            this.reconnectAttempts++;
-            const delay = this.reconnectDelay * this.reconnectAttempts;
             this.terminal.writeln('');
-            this.terminal.writeln(`\x1b[1;33mConnection lost. Reconnecting in ${delay/1000}s...\x1b[0m`);
-
-            setTimeout(() => {
-                // Only reconnect if still on same project
-                if (this.projectId === projectId && this.connectionId === currentConnectionId) {
-                    this.connect(projectId);
-                }
-            }, delay);
-        };
-
-        this.ws.onerror = (error) => {
-            // Ignore if connection changed
-            if (this.connectionId !== currentConnectionId) return;
-            this.terminal.writeln(`\x1b[1;31mWebSocket error\x1b[0m`);
-            console.error('WebSocket error:', error);
+            this.terminal.writeln('\x1b[1;33mConnection lost. Reconnecting...\x1b[0m');
         };
     }
 
     disconnect() {
-        // Prevent auto-reconnect
-        this.reconnectAttempts = this.maxReconnectAttempts;
-        this.connectionId = null;
-
-        if (this.ws) {
-            this.ws.close(1000);  // Normal closure code
-            this.ws = null;
+        if (this.channel) {
+            this.channel.close();
+            this.channel = null;
         }
         this.projectId = null;
         this.isRunning = false;
     }
 
     start() {
-        if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+        if (this.channel && this.channel.isOpen()) {
             this.terminal.clear();
             this.terminal.writeln('\x1b[1;33mStarting process...\x1b[0m');
             this.terminal.writeln('');
-            this.ws.send(JSON.stringify({ type: 'start' }));
+            this.channel.send({ type: 'start' });
         }
     }
 
     stop() {
-        if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-            this.ws.send(JSON.stringify({ type: 'stop' }));
+        if (this.channel && this.channel.isOpen()) {
+            this.channel.send({ type: 'stop' });
             this.terminal.writeln('');
             this.terminal.writeln('\x1b[1;31mProcess stopped\x1b[0m');
         }
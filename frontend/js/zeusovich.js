@@ -6,7 +6,7 @@ class ZeusovichManager {
         this.container = document.getElementById(containerId);
         this.terminal = null;
         this.fitAddon = null;
-        this.ws = null;
+        this.channel = null;  // Subscription on the shared mux connection
         this.isRunning = false;
         this.newProjects = [];
         this._checkInterval = null;
@@ -65,11 +65,8 @@ class ZeusovichManager {
 
         // Handle input
         this.terminal.onData(data => {
-            if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-                this.ws.send(JSON.stringify({
-                    type: 'input',
-                    data: data
-                }));
+            if (this.channel) {
+                this.channel.sendInput(data);
             }
         });
 
@@ -91,11 +88,8 @@ class ZeusovichManager {
             // Ctrl+V - paste
             if (e.ctrlKey && e.key === 'v' && e.type === 'keydown') {
                 navigator.clipboard.readText().then(text => {
-                    if (text && this.ws && this.ws.readyState === WebSocket.OPEN) {
-                        this.ws.send(JSON.stringify({
-                            type: 'input',
-                            data: text
-                        }));
+                    if (text && this.channel) {
+                        this.channel.sendInput(text);
                     }
                 }).catch(() => {});  // Игнорируем ошибки доступа к clipboard
                 return false;
@@ -121,16 +115,21 @@ class ZeusovichManager {
         this.connect();
     }
 
+    // Размер терминала для снимка экрана при подписке
+    size() {
+        return { cols: this.terminal.cols, rows: this.terminal.rows };
+    }
+
     fit() {
         if (this.fitAddon && this.container.offsetWidth > 0 && this.container.offsetHeight > 0) {
             try {
                 this.fitAddon.fit();
-                if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-                    this.ws.send(JSON.stringify({
+                if (this.channel) {
+                    this.channel.send({
                         type: 'resize',
                         cols: this.terminal.cols,
                         rows: this.terminal.rows
-                    }));
+                    });
                 }
             } catch (e) {
                 // Ignore fit errors when panel is hidden
@@ -139,62 +138,49 @@ class ZeusovichManager {
     }
 
     connect() {
-        if (this.ws) {
-            this.ws.close();
+        if (this.channel) {
+            this.channel.close();
         }
 
-        const wsUrl = `ws://${window.location.host}/api/zeusovich/terminal`;
-        this.ws = new WebSocket(wsUrl);
+        const channel = mux.subscribe('zeusovich', () => this.size());
+        this.channel = channel;
 
-        this.ws.onopen = () => {
+        channel.onopen = () => {
             setTimeout(() => this.fit(), 100);
         };
 
-        this.ws.onmessage = (event) => {
-            const msg = JSON.parse(event.data);
-
+        channel.onmessage = (msg) => {
             if (msg.type === 'output') {
                 this.terminal.write(msg.data);
             } else if (msg.type === 'history') {
-                this.terminal.clear();
-                const cleaned = msg.data
-                    .replace(/\x1b\[\?1;2c/g, '')
-                    .replace(/\x1b\[[\?0-9;]*[a-zA-Z]/g, (match) => {
-                        if (/\x1b\[[0-9;]*m/.test(match)) return match;
-                        if (/\x1b\[[0-9]*[ABCD]/.test(match)) return match;
-                        if (/\x1b\[[0-9]*[JK]/.test(match)) return match;
-                        return '';
-                    });
-                this.terminal.write(cleaned);
+                // Сервер присылает снимок экрана - полный сброс и отрисовка
+                this.terminal.reset();
+                this.terminal.write(msg.data);
             } else if (msg.type === 'status') {
                 this.isRunning = msg.running;
                 this.onStatusChange(msg.running);
             }
         };
 
-        this.ws.onclose = () => {
+        channel.onclose = () => {
             this.isRunning = false;
             this.onStatusChange(false);
         };
-
-        this.ws.onerror = (error) => {
-            console.error('Zeusovich WebSocket error:', error);
-        };
     }
 
     start() {
-        if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+        if (this.channel && this.channel.isOpen()) {
             this.terminal.clear();
             this.terminal.writeln('\x1b[1;35m⚡ Starting Zeusovich...\x1b[0m');
             this.terminal.writeln('\x1b[90mLaunching Claude Code in projects directory\x1b[0m');
             this.terminal.writeln('');
-            this.ws.send(JSON.stringify({ type: 'start' }));
+            this.channel.send({ type: 'start' });
         }
     }
 
     stop() {
-        if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-            this.ws.send(JSON.stringify({ type: 'stop' }));
+        if (this.channel && this.channel.isOpen()) {
+            this.channel.send({ type: 'stop' });
             this.terminal.writeln('');
             this.terminal.writeln('\x1b[1;31mZeusovich stopped\x1b[0m');
         }
@@ -0,0 +1,121 @@
+"""
+Event loop не блокируется файловыми операциями роутеров: вывод терминала
+идёт по WebSocket, пока env, settings и projects пишут на медленный диск
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from backend import config
+from backend.config import ConfigStore, ProjectConfig
+from backend.process_manager import process_manager
+from backend.routers import env_editor, projects, settings, terminal
+
+DISK_DELAY = 0.1  # Каждое чтение и запись конфигов и .env
+LAG_LIMIT = DISK_DELAY * 0.8  # Одна блокирующая операция в цикле задержит его на DISK_DELAY
+TICK = 0.005
+ROUNDS = 5
+PROJECT_ID = "lag"
+
+
+def _slow(func):
+    def slow(*args, **kwargs):
+        time.sleep(DISK_DELAY)
+        return func(*args, **kwargs)
+    return slow
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    store = ConfigStore(tmp_path / "projects", tmp_path / "settings.yaml")
+    monkeypatch.setattr(config, "config_store", store)
+    (tmp_path / "project").mkdir()
+    store.save_project(ProjectConfig(id=PROJECT_ID, name=PROJECT_ID, path=str(tmp_path / "project")))
+
+    monkeypatch.setattr(config, "_read_yaml", _slow(config._read_yaml))
+    monkeypatch.setattr(config, "_write_yaml", _slow(config._write_yaml))
+    monkeypatch.setattr(env_editor, "read_env_file", _slow(env_editor.read_env_file))
+    monkeypatch.setattr(env_editor, "write_env_file", _slow(env_editor.write_env_file))
+    monkeypatch.setattr(settings, "set_history_layout", lambda layout: None)
+
+    app = FastAPI()
+    app.include_router(projects.router, prefix="/api/projects")
+    app.include_router(terminal.router, prefix="/api/terminal")
+    app.include_router(settings.router, prefix="/api/settings")
+    app.include_router(env_editor.router, prefix="/api/env")
+    return app
+
+
+async def _stream_terminal(app: FastAPI, stop: asyncio.Event) -> int:
+    """WebSocket терминала проекта, в который непрерывно идёт вывод; кадров получено"""
+    received = 0
+    connected = False
+
+    async def receive():
+        nonlocal connected
+        if not connected:
+            connected = True
+            return {"type": "websocket.connect"}
+        await stop.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "websocket.send":
+            received += 1
+
+    scope = {
+        "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws",
+        "path": f"/api/terminal/{PROJECT_ID}", "raw_path": f"/api/terminal/{PROJECT_ID}".encode(),
+        "query_string": b"", "headers": [], "subprotocols": [],
+        "server": ("test", 80), "client": ("test", 1), "root_path": "",
+    }
+    socket = asyncio.create_task(app(scope, receive, send))
+    # Процесса нет - вывод получают callback'и, ожидающие его запуска
+    while not process_manager.pending_callbacks.get(PROJECT_ID):
+        await asyncio.sleep(TICK)
+    while not stop.is_set():
+        for callback in list(process_manager.pending_callbacks.get(PROJECT_ID, [])):
+            await callback("output line\r\n" * 8)
+        await asyncio.sleep(0.001)
+    await socket
+    return received
+
+
+async def _measure(app: FastAPI) -> tuple[float, int]:
+    stop = asyncio.Event()
+    lag = 0.0
+
+    async def ticker():
+        nonlocal lag
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lag = max(lag, time.perf_counter() - start - TICK)
+
+    async def hammer(client: httpx.AsyncClient, i: int):
+        await client.put(f"/api/env/{PROJECT_ID}/var", json={"key": f"K{i}", "value": str(i)})
+        await client.get(f"/api/env/{PROJECT_ID}")
+        await client.put("/api/settings/", json={"base_projects_path": f"/projects{i}"})
+        await client.post(f"/api/projects/{PROJECT_ID}/mode", json={"mode": "planning"})
+
+    ticking = asyncio.create_task(ticker())
+    streaming = asyncio.create_task(_stream_terminal(app, stop))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await asyncio.gather(*(hammer(client, i) for i in range(ROUNDS)))
+        variables = (await client.get(f"/api/env/{PROJECT_ID}")).json()["variables"]
+    stop.set()
+    await ticking
+    frames = await streaming
+    assert len(variables) == ROUNDS
+    return lag, frames
+
+
+def test_file_endpoints_do_not_block_terminal_output(app):
+    lag, frames = asyncio.run(_measure(app))
+    assert frames > 0
+    assert lag < LAG_LIMIT, f"event loop blocked for {lag * 1000:.0f} ms"
@@ -0,0 +1,31 @@
+"""
+Общий поток SSE поверх EventBus
+"""
+import asyncio
+
+from backend.events import RESYNC, EventBus, sse, sse_stream
+
+
+def test_sse_stream_snapshot_filter_and_resync():
+    async def scenario():
+        bus = EventBus()
+        snapshots = iter([{"type": "snapshot", "n": 1}, {"type": "snapshot", "n": 2}])
+        stream = sse_stream(bus, lambda: next(snapshots), lambda event: event["id"] == "a")
+        frames = [await stream.__anext__(), await stream.__anext__()]
+        bus.publish({"id": "b"})
+        bus.publish({"id": "a"})
+        frames.append(await stream.__anext__())
+        for queue in list(bus._subscribers):
+            queue.put_nowait(RESYNC)
+        frames.append(await stream.__anext__())
+        await stream.aclose()
+        return frames, len(bus)
+
+    frames, subscribers = asyncio.run(scenario())
+    assert frames == [
+        "retry: 2000\n\n",
+        sse({"type": "snapshot", "n": 1}),
+        sse({"id": "a"}),
+        sse({"type": "snapshot", "n": 2}),
+    ]
+    assert subscribers == 0
@@ -0,0 +1,29 @@
+"""
+Общие паттерны ошибок срабатывают для всех CLI без учёта регистра
+"""
+import pytest
+
+from backend.config import LLMType
+from backend.llm_state import LLMStateAnalyzer
+
+
+@pytest.mark.parametrize("llm", list(LLMType))
+@pytest.mark.parametrize("line", [
+    "ERROR connecting to server",
+    "Build FAILED",
+    "Failed to read file",
+    "Cannot open config",
+    "Not found: src/app.py",
+    "Permission denied (publickey)",
+    "fatal error while compiling",
+])
+def test_error_lines_need_attention(llm, line):
+    analyzer = LLMStateAnalyzer(llm)
+    analyzer.feed(f"\x1b[31m{line}\x1b[0m\r\n")
+    assert analyzer.state() == "attention"
+
+
+def test_plain_output_is_typing():
+    analyzer = LLMStateAnalyzer(LLMType.CLAUDE_CODE)
+    analyzer.feed("Reading src/app.py\r\n")
+    assert analyzer.state() == "typing"
@@ -0,0 +1,29 @@
+"""
+OutputBuffer ведёт себя как строка, обрезанная до последних max_size символов
+"""
+import random
+
+import pytest
+
+from backend.output_buffer import OutputBuffer
+
+
+@pytest.mark.parametrize("max_size", [1, 7, 100, 5000, 50000])
+def test_matches_sliced_string(max_size):
+    rng = random.Random(max_size)
+    buffer = OutputBuffer(max_size)
+    expected = ""
+    for _ in range(2000):
+        if rng.random() < 0.5:
+            data = "x" * rng.choice([0, 1, 5, 60, 700, 5000, 60000])
+        else:
+            data = "".join(chr(0x61 + rng.randrange(26)) for _ in range(rng.randrange(1, 80)))
+        buffer.append(data)
+        expected = (expected + data)[-max_size:]
+        assert len(buffer) == len(expected)
+        size = rng.randrange(0, max_size + 10)
+        assert buffer.tail(size) == (expected[-size:] if size else "")
+        if rng.random() < 0.05:
+            assert buffer.snapshot() == expected
+    buffer.clear()
+    assert not buffer and buffer.snapshot() == ""
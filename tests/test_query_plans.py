@@ -0,0 +1,146 @@
+"""
+Запросы истории, поиска и статистики идут по индексам (EXPLAIN QUERY PLAN):
+ни полного обхода таблиц истории, ни FTS без MATCH - в основной БД и в партиции
+"""
+import asyncio
+import re
+
+import aiosqlite
+import pytest
+
+from backend import database
+from backend.database import MIGRATIONS, PARTITION_MIGRATIONS, STATS_ROLLUP, Database
+from backend.partitions import PartitionSet
+
+# Таблицы, растущие с историей (и их псевдонимы в запросах)
+HISTORY_TABLES = {
+    "sessions", "s", "messages", "m", "terminal_segments", "t",
+    "terminal_resizes", "search_text", "search_index", "f",
+}
+SESSION_ID = 1
+PARTITION_SESSION_ID = 2
+
+
+class RecordingDatabase(Database):
+    """Database, запоминающая выполненные запросы"""
+
+    def __init__(self, path, readers: int = 1):
+        super().__init__(path, readers)
+        self.queries: list[tuple[str, tuple]] = []
+
+    async def fetchall(self, sql: str, params: tuple = ()) -> list[dict]:
+        self.queries.append((sql, params))
+        return await super().fetchall(sql, params)
+
+    async def fetchone(self, sql: str, params: tuple = ()):
+        self.queries.append((sql, params))
+        return await super().fetchone(sql, params)
+
+
+def full_scans(plan: list[str]) -> list[str]:
+    """Строки плана с обходом таблицы истории без индекса"""
+    bad = []
+    for detail in plan:
+        match = re.match(r"SCAN (\w+)( .*)?$", detail)
+        if not match or match.group(1) not in HISTORY_TABLES:
+            continue
+        rest = match.group(2) or ""
+        if "USING INDEX" in rest or "USING COVERING INDEX" in rest:
+            continue  # Обход по индексу в порядке ORDER BY (до LIMIT)
+        if "VIRTUAL TABLE INDEX" in rest and ":M" in rest:
+            continue  # FTS5 с MATCH
+        bad.append(detail)
+    return bad
+
+
+async def _run_queries(tmp_path) -> list[tuple[Database, str, tuple]]:
+    main = RecordingDatabase(tmp_path / "history.db")
+    await main.open(MIGRATIONS)
+    opened: list[RecordingDatabase] = []
+
+    async def open_partition(path):
+        partition = RecordingDatabase(path)
+        await partition.open(PARTITION_MIGRATIONS)
+        opened.append(partition)
+        return partition
+
+    partitions = PartitionSet(tmp_path / "partitions", open_partition)
+    database.db = main
+    database.partitions = partitions
+    try:
+        await main.write("INSERT INTO partitions (name, project_id) VALUES ('p-beta', 'beta')")
+        await main.write("INSERT INTO sessions (id, project_id) VALUES (?, 'alpha')", (SESSION_ID,))
+        await main.write(
+            "INSERT INTO sessions (id, project_id, partition) VALUES (?, 'beta', 'p-beta')",
+            (PARTITION_SESSION_ID,)
+        )
+        cursor = database._encode_cursor
+
+        await database.get_session(SESSION_ID)
+        await database.get_session_history(SESSION_ID)
+        await database.get_project_sessions("alpha")
+        await database.get_all_sessions()
+        await database.list_sessions()
+        await database.list_sessions("alpha", cursor=cursor("2024-01-01 00:00:00", 5))
+        await database.get_recent_terminal_output()
+        await database.get_recent_terminal_output("beta")
+        await database.search_messages("hello")
+        await database.search_history("hello")
+        await database.search_history(
+            "hello", project_id="beta", kind="output", since=1, until=2,
+            cursor=cursor(10, {"": 100, "p-beta": 100})
+        )
+        await database.get_session_sizes()
+        await database.get_stats()
+        await database.get_project_stats()
+        await database.get_project_daily_stats("alpha", "2024-01-01")
+        await database.get_partition_sessions()
+        for session_id in (SESSION_ID, PARTITION_SESSION_ID):
+            await database.get_output_page(session_id, cursor=cursor(3))
+            await database.find_segment_by_offset(session_id, 100)
+            await database.find_segment_by_time(session_id, 100)
+            await database.get_session_resizes(session_id)
+            await database.get_segment_tail(session_id)
+            async for _ in database.iter_session_segments(session_id):
+                pass
+        main.queries.append((STATS_ROLLUP, ("2024-01-01", "2024-01-03")))
+
+        assert opened, "queries did not reach the partition"
+        return [
+            (source, sql, params)
+            for source in [main, *opened] for sql, params in source.queries
+        ]
+    finally:
+        database._routes.clear()
+        await partitions.close()
+        await main.close()
+
+
+async def _plans(tmp_path) -> list[tuple[str, list[str]]]:
+    queries = await _run_queries(tmp_path)
+    plans = []
+    for source, sql, params in queries:
+        async with aiosqlite.connect(source.path) as conn:
+            cursor = await conn.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plans.append((" ".join(sql.split()), [row[3] for row in await cursor.fetchall()]))
+    return plans
+
+
+@pytest.fixture
+def plans(tmp_path, monkeypatch):
+    # Глобальные экземпляры подменяются в _run_queries - monkeypatch вернёт их после теста
+    monkeypatch.setattr(database, "db", database.db)
+    monkeypatch.setattr(database, "partitions", database.partitions)
+    return asyncio.run(_plans(tmp_path))
+
+
+def test_history_queries_use_indexes(plans):
+    failures = [(sql, full_scans(plan)) for sql, plan in plans if full_scans(plan)]
+    assert not failures
+
+
+def test_session_sizes_subqueries_search_by_session(plans):
+    plan = next(plan for sql, plan in plans if "CORRELATED" in " ".join(plan) and "SUM(length(data)" in sql)
+    searches = [detail for detail in plan if detail.startswith("SEARCH")]
+    assert [detail.split()[1] for detail in searches] == ["terminal_segments", "messages", "search_text"]
+    assert all("(session_id=?)" in detail for detail in searches)
@@ -0,0 +1,67 @@
+"""
+Перенос spill-файла рекордера: закрытие сегментов и продолжение после падения
+"""
+import asyncio
+import json
+
+import pytest
+
+from backend import recorder as recorder_module
+from backend.recorder import OutputRecorder
+
+
+@pytest.fixture
+def segments(monkeypatch):
+    """Вместо БД: (session_id, seq) -> текст сегмента"""
+    stored: dict[tuple[int, int], str] = {}
+
+    def queue_segment(session_id, segment):
+        stored[(session_id, segment.seq)] = "".join(segment.parts)
+
+    async def get_segment_tail(session_id):
+        seqs = [seq for sid, seq in stored if sid == session_id]
+        return (max(seqs) + 1, 0) if seqs else (0, 0)
+
+    async def wait_for_writes():
+        pass
+
+    monkeypatch.setattr(recorder_module, "queue_segment", queue_segment)
+    monkeypatch.setattr(recorder_module, "get_segment_tail", get_segment_tail)
+    monkeypatch.setattr(recorder_module, "wait_for_writes", wait_for_writes)
+    monkeypatch.setattr(recorder_module, "queue_output_size", lambda *args: None)
+    monkeypatch.setattr(recorder_module, "queue_search_text", lambda *args: None)
+    return stored
+
+
+def test_session_ended_while_spilling_is_closed_after_replay(tmp_path, segments):
+    async def scenario():
+        recorder = OutputRecorder(tmp_path / "spill.jsonl")
+        recorder.MAX_MEMORY = 8
+        recorder.record(1, "abc")
+        await recorder._flush()  # Открытый сегмент сессии
+        recorder.record(1, "defghijklm")  # Сверх лимита - в spill-файл
+        recorder.end_session(1)
+        assert 1 in recorder.active_sessions()
+        await recorder._replay_spill()
+        return recorder
+
+    recorder = asyncio.run(scenario())
+    assert segments == {(1, 0): "abcdefghijklm"}
+    assert recorder.active_sessions() == set()
+    assert recorder._positions == {}
+    assert not (tmp_path / "spill.replay").exists()
+
+
+def test_replay_resumes_from_committed_offset(tmp_path, segments):
+    replay_path = tmp_path / "spill.replay"
+    lines = [json.dumps({"s": 1, "t": 1000, "d": text}) + "\n" for text in ("one ", "two ", "three")]
+    replay_path.write_text("".join(lines))
+    # До падения первая строка уже была закоммичена
+    (tmp_path / "spill.offset").write_text(str(len(lines[0].encode())))
+
+    recorder = OutputRecorder(tmp_path / "spill.jsonl")
+    asyncio.run(recorder._replay_spill(recover=True))
+    assert segments == {(1, 0): "two three"}
+    assert recorder.active_sessions() == set()
+    assert not replay_path.exists()
+    assert not (tmp_path / "spill.offset").exists()
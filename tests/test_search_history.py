@@ -0,0 +1,64 @@
+"""
+Страницы поиска по истории не теряют и не повторяют результаты,
+пока индексируется новый вывод
+"""
+import asyncio
+
+import pytest
+
+from backend import database
+from backend.database import MIGRATIONS, Database
+from backend.partitions import PartitionSet
+
+SESSION_ID = 1
+
+
+async def _pages(tmp_path) -> tuple[list[int], list[int]]:
+    main = Database(tmp_path / "history.db", readers=1)
+    await main.open(MIGRATIONS)
+    database.db = main
+    database.partitions = PartitionSet(tmp_path / "partitions", None)
+    try:
+        await main.write("INSERT INTO sessions (id, project_id) VALUES (?, 'alpha')", (SESSION_ID,))
+        # Разная длина строк - разный bm25
+        for i in range(30):
+            database.queue_search_text(SESSION_ID, i, 1000, "needle " + "hay " * i)
+        await database.wait_for_writes()
+
+        seen = []
+        page = await database.search_history("needle", limit=10)
+        while True:
+            seen.extend(result["ref"] for result in page["results"])
+            # Новый вывод между страницами меняет статистику индекса
+            for i in range(5):
+                database.queue_search_text(SESSION_ID, 1000 + len(seen) + i, 2000, "needle needle")
+            await database.wait_for_writes()
+            if not page["next_cursor"]:
+                break
+            page = await database.search_history("needle", limit=10, cursor=page["next_cursor"])
+        return seen, list(range(30))
+    finally:
+        await main.close()
+
+
+def test_pages_stable_while_indexing(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "db", database.db)
+    monkeypatch.setattr(database, "partitions", database.partitions)
+    seen, expected = asyncio.run(_pages(tmp_path))
+    assert sorted(seen) == expected
+
+
+def test_invalid_cursor_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "db", database.db)
+    cursor = database._encode_cursor(10, {"": "x"})
+
+    async def search():
+        database.db = Database(tmp_path / "history.db", readers=1)
+        await database.db.open(MIGRATIONS)
+        try:
+            await database.search_history("needle", cursor=cursor)
+        finally:
+            await database.db.close()
+
+    with pytest.raises(ValueError):
+        asyncio.run(search())
@@ -0,0 +1,40 @@
+"""
+Построение полнотекстового индекса по истории, сохранённой до миграции 4
+"""
+import asyncio
+
+import aiosqlite
+
+from backend.database import MIGRATIONS, SEGMENT_UPSERT, _segment_params
+from backend.migrations import run_migrations
+from backend.segments import OpenSegment
+
+
+def _segment(text: str) -> OpenSegment:
+    segment = OpenSegment(seq=0, start_offset=0, started_at=1000)
+    segment.append(1000, text)
+    return segment
+
+
+async def _backfill(path) -> list[tuple]:
+    conn = await aiosqlite.connect(path, isolation_level=None)
+    try:
+        await run_migrations(conn, MIGRATIONS[:3])
+        await conn.execute("INSERT INTO sessions (id, project_id) VALUES (1, 'alpha'), (2, 'beta')")
+        # Вывод первой сессии обрывается без перевода строки
+        await conn.execute(SEGMENT_UPSERT, _segment_params(1, _segment("alphahead\nalphatail")))
+        await conn.execute(SEGMENT_UPSERT, _segment_params(2, _segment("betaline\n")))
+        await run_migrations(conn, MIGRATIONS[:4])
+        cursor = await conn.execute(
+            "SELECT text, session_id, project_id, ref FROM search_text WHERE kind = 'output' ORDER BY id"
+        )
+        return await cursor.fetchall()
+    finally:
+        await conn.close()
+
+
+def test_trailing_output_indexed_under_own_session(tmp_path):
+    rows = asyncio.run(_backfill(tmp_path / "history.db"))
+    by_text = {text.strip(): (session_id, project_id, ref) for text, session_id, project_id, ref in rows}
+    assert by_text["alphatail"] == (1, "alpha", 10)
+    assert by_text["betaline"] == (2, "beta", 0)
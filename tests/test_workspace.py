@@ -0,0 +1,36 @@
+"""
+Согласование ссылок workspace Zeusovich с проектами
+"""
+import asyncio
+import os
+
+from backend.config import ProjectConfig
+from backend.workspace import WorkspaceSync
+
+
+def _project(name: str, path) -> ProjectConfig:
+    return ProjectConfig(id=name, name=name, path=str(path))
+
+
+def test_failed_link_retried_when_folder_appears(tmp_path):
+    workspace = WorkspaceSync(tmp_path / "workspace")
+    projects = [_project("alpha", tmp_path / "alpha")]
+
+    result = asyncio.run(workspace.sync(projects))
+    assert [f["name"] for f in result["failed"]] == ["alpha"]
+
+    (tmp_path / "alpha").mkdir()
+    result = asyncio.run(workspace.sync(projects))
+    assert result["failed"] == []
+    assert os.path.isdir(tmp_path / "workspace" / "alpha")
+
+
+def test_full_sync_restores_link_deleted_outside(tmp_path):
+    (tmp_path / "alpha").mkdir()
+    workspace = WorkspaceSync(tmp_path / "workspace")
+    projects = [_project("alpha", tmp_path / "alpha")]
+    asyncio.run(workspace.sync(projects))
+
+    os.unlink(tmp_path / "workspace" / "alpha")
+    asyncio.run(workspace.sync(projects, full=True))
+    assert os.path.isdir(tmp_path / "workspace" / "alpha")